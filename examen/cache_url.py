@@ -0,0 +1,29 @@
+"""
+Настройка кэша из переменной окружения CACHE_URL.
+
+* redis://host:6379/0 (rediss:// - с TLS) - Redis, общий для всех процессов сервера;
+* memcached://host:11211[,host2:11211] - memcached через pymemcache;
+* locmem:// - память процесса: только для разработки и тестов, с ним сессии, пользователи
+  и лента в одном процессе не видят изменений из других, и manage.py serve запускает один воркер.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+
+def parse(url):
+    """
+    Функция, превращающая CACHE_URL в настройку кэша для CACHES
+    :param url: адрес кэша
+    :return: словарь с BACKEND и LOCATION
+    """
+    scheme, _, location = url.partition('://')
+    if scheme == 'locmem':
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': location or 'examen',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if scheme == 'memcached' and location:
+        return {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': location.split(',')}
+    raise ImproperlyConfigured(f'Неизвестный CACHE_URL {url!r}: ожидается redis://, memcached:// или locmem://')
@@ -0,0 +1,333 @@
+"""
+Сервер с предварительной загрузкой приложения и форком воркеров.
+
+Мастер один раз загружает Django, прогревает резолвер URL, сериализаторы и шаблоны
+и прогоняет несколько анонимных запросов, после чего замораживает сборщик мусора (gc.freeze)
+и форкает воркеры. Воркеры получают уже готовое приложение вместе с прогретым кэшем
+(например, лентой публичных заметок) и делят его память с мастером по copy-on-write,
+поэтому стартуют за миллисекунды.
+
+Воркер обслуживает запросы по одному с общего слушающего сокета и после max_requests
+запросов завершается, а мастер запускает новый. Сигналы мастера:
+
+* SIGTERM, SIGINT - воркеры дообслуживают текущий запрос и завершаются;
+* SIGHUP - мастер перезапускает себя через exec с тем же pid, передавая слушающий сокет
+  и список старых воркеров через окружение: новый код загружается и прогревается,
+  запускаются новые воркеры, и только потом старые получают SIGTERM.
+  Сокет при этом не закрывается, и соединения не теряются.
+"""
+import gc
+import importlib
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import URLPattern, URLResolver, get_resolver
+
+LISTEN_FD_ENV = 'PREFORK_LISTEN_FD'
+OLD_WORKERS_ENV = 'PREFORK_OLD_WORKERS'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class WorkerServer(WSGIServer):
+    """
+    WSGIServer, принимающий соединения с унаследованного от мастера сокета
+    """
+    def __init__(self, sock, application):
+        super().__init__(sock.getsockname(), QuietRequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.server_name, self.server_port = self.server_address[:2]
+        self.setup_environ()
+        self.set_app(application)
+
+    def get_request(self):
+        request, address = self.socket.accept()
+        request.setblocking(True)
+        return request, address
+
+
+def iter_views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def warm_up(application, urls, log):
+    """
+    Функция, прогревающая приложение в мастере до форка
+    :param application: WSGI-приложение
+    :param urls: пути, которые нужно один раз запросить
+    :param log: функция для сообщений
+    """
+    start = time.perf_counter()
+    resolver = get_resolver()
+    resolver.reverse_dict
+
+    for app_config in apps.get_app_configs():
+        for module in ('views', 'serializers', 'admin'):
+            try:
+                importlib.import_module(f'{app_config.name}.{module}')
+            except ImportError:
+                pass
+
+    for callback in iter_views(resolver.url_patterns):
+        serializer_class = getattr(getattr(callback, 'view_class', None), 'serializer_class', None)
+        if serializer_class is not None:
+            serializer_class().fields
+
+    template_dirs = [Path(path) for engine in settings.TEMPLATES for path in engine.get('DIRS', [])]
+    template_dirs += [Path(app_config.path) / 'templates' for app_config in apps.get_app_configs()]
+    for template_dir in template_dirs:
+        for path in template_dir.rglob('*.html') if template_dir.is_dir() else ():
+            try:
+                get_template(path.relative_to(template_dir).as_posix())
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                pass
+
+    # Хост запроса должен пройти проверку ALLOWED_HOSTS, иначе прогрев получит 400
+    host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')),
+                'localhost')
+    # Запросы без кук: в кэш попадают только общие для всех данные, а не сессии и пользователи
+    for url in urls:
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': url, 'QUERY_STRING': '', 'SERVER_NAME': host,
+            'SERVER_PORT': '80', 'HTTP_HOST': host, 'HTTP_ACCEPT': 'application/json',
+            'wsgi.input': sys.stdin.buffer, 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+        }
+        statuses = []
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        b''.join(body)
+        getattr(body, 'close', lambda: None)()
+        log(f'Прогрев {url}: {statuses[0] if statuses else "?"}')
+
+    # Соединения с базой нельзя делить между процессами
+    connections.close_all()
+    log(f'Прогрев занял {(time.perf_counter() - start) * 1000:.0f} мс')
+
+
+def process_local_caches():
+    """
+    Функция, возвращающая настройки, которые указывают на кэш в памяти процесса, хотя хранят
+    состояние, общее для всех воркеров: сессии, пользователей сессий и ленту публичных заметок
+    :return: список имен настроек
+    """
+    aliases = {'AUTH_USER_CACHE_ALIAS': getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default'),
+               'PUBLIC_FEED_CACHE_ALIAS': getattr(settings, 'PUBLIC_FEED_CACHE_ALIAS', 'default')}
+    if settings.SESSION_ENGINE in ('django.contrib.sessions.backends.cache',
+                                   'django.contrib.sessions.backends.cached_db'):
+        aliases['SESSION_CACHE_ALIAS'] = settings.SESSION_CACHE_ALIAS
+    return [name for name, alias in sorted(aliases.items()) if isinstance(caches[alias], LocMemCache)]
+
+
+def rss_kb(pid):
+    """
+    Функция, возвращающая RSS и PSS процесса в килобайтах (только Linux)
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as rollup:
+            values = dict(line.split(':', 1) for line in rollup if ':' in line and not line.startswith(' '))
+    except OSError:
+        return None, None
+    return int(values.get('Rss', '0 kB').split()[0]), int(values.get('Pss', '0 kB').split()[0])
+
+
+class PreforkServer:
+    """
+    Класс мастера, который держит слушающий сокет, форкает и перезапускает воркеры
+    """
+    def __init__(self, bind, workers, max_requests, max_requests_jitter, graceful_timeout, warm_urls, log):
+        self.bind = bind
+        self.worker_count = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.warm_urls = warm_urls
+        self.log = log
+        self.workers = {}
+        self.stopping = False
+        self.reloading = False
+        self.report_stats = False
+
+    def listen(self):
+        fd = os.environ.pop(LISTEN_FD_ENV, None)
+        if fd is not None:
+            sock = socket.socket(fileno=int(fd))
+        else:
+            host, _, port = self.bind.rpartition(':')
+            sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host.strip('[]') or '0.0.0.0', int(port)))
+            sock.listen(socket.SOMAXCONN)
+        sock.setblocking(False)
+        return sock
+
+    def run(self):
+        """
+        Функция, запускающая мастер: загрузка, прогрев, форк воркеров и их перезапуск
+        """
+        gc.disable()
+        self.socket = self.listen()
+        old_workers = [int(pid) for pid in os.environ.pop(OLD_WORKERS_ENV, '').split(',') if pid]
+
+        self.application = get_wsgi_application()
+        warm_up(self.application, self.warm_urls, self.log)
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        signal.signal(signal.SIGUSR1, self.handle_stats)
+
+        host, port = self.socket.getsockname()[:2]
+        self.log(f'Мастер {os.getpid()} слушает {host}:{port}, воркеров: {self.worker_count}')
+        for _ in range(self.worker_count):
+            self.spawn()
+        for pid in old_workers:
+            self.kill(pid, signal.SIGTERM)
+
+        while not self.stopping and not self.reloading:
+            if self.report_stats:
+                self.report_stats = False
+                self.log_stats()
+            self.reap()
+            for _ in range(self.worker_count - len(self.workers)):
+                self.spawn()
+            time.sleep(0.2)
+
+        if self.reloading:
+            self.reexec()
+        self.shutdown()
+
+    def spawn(self):
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = started
+            return
+        # Воркер не должен возвращаться в код мастера и выполнять его atexit
+        code = 1
+        try:
+            code = self.worker(started)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+
+    def worker(self, started):
+        """
+        Функция цикла воркера: обслуживает запросы, пока не получит SIGTERM или не исчерпает лимит
+        :param started: время форка по perf_counter
+        """
+        gc.enable()
+        state = {'stopping': False}
+
+        def stop(signum, frame):
+            state['stopping'] = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+        server = WorkerServer(self.socket, self.application)
+        self.log(f'Воркер {os.getpid()} готов за {(time.perf_counter() - started) * 1000:.1f} мс')
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+        handled = 0
+        while not state['stopping'] and (not limit or handled < limit):
+            try:
+                readable, _, _ = select.select([self.socket], [], [], 1.0)
+            except InterruptedError:
+                continue
+            if readable:
+                try:
+                    request, address = server.get_request()
+                except (BlockingIOError, InterruptedError):
+                    continue
+                try:
+                    server.process_request(request, address)
+                except Exception:
+                    server.handle_error(request, address)
+                    server.shutdown_request(request)
+                handled += 1
+        return 0
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if self.workers.pop(pid, None) is not None and not self.stopping:
+                self.log(f'Воркер {pid} завершился (код {os.waitstatus_to_exitcode(status)}), запускается новый')
+
+    def kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reloading = True
+
+    def handle_stats(self, signum, frame):
+        self.report_stats = True
+
+    def reexec(self):
+        """
+        Функция, перезапускающая мастер с новым кодом: старые воркеры продолжают обслуживать
+        запросы, пока новый мастер не прогреется и не запустит своих
+        """
+        self.log('Перезагрузка: мастер перезапускается с новым кодом')
+        self.socket.set_inheritable(True)
+        os.environ[LISTEN_FD_ENV] = str(self.socket.fileno())
+        os.environ[OLD_WORKERS_ENV] = ','.join(str(pid) for pid in self.workers)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def shutdown(self):
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGKILL)
+        self.socket.close()
+        self.log('Сервер остановлен')
+
+    def log_stats(self):
+        """
+        Функция, печатающая RSS и PSS мастера и воркеров (по SIGUSR1).
+        PSS делит общие страницы между процессами и показывает, сколько памяти воркер занимает на самом деле
+        """
+        for pid in [os.getpid(), *self.workers]:
+            rss, pss = rss_kb(pid)
+            role = 'мастер' if pid == os.getpid() else 'воркер'
+            self.log(f'{role} {pid}: RSS {rss} kB, PSS {pss} kB')
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
-# import os
+import os
 from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+from examen import cache_url
 # from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,10 +53,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'login.middleware.PrecompressedStaticMiddleware',
+    'note_todo_api.profiling.ProfilingMiddleware',
+    'note_todo_api.coalescing.CoalescingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'login.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,6 +96,77 @@ DATABASES = {
     }
 }
 
+# Шардирование заметок и комментариев по автору (note_todo.sharding):
+# NOTE_TODO_SHARDS=4 создает базы shard_0..shard_3 в отдельных файлах SQLite.
+# Каждую базу нужно создать командой migrate --database shard_N, а существующие
+# заметки перенести командой rebalance_shards. Пустой список - без шардирования
+NOTE_TODO_SHARDS = [f'shard_{i}' for i in range(int(os.environ.get('NOTE_TODO_SHARDS', 0)))]
+for _alias in NOTE_TODO_SHARDS:
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_{_alias}.sqlite3',
+        'OPTIONS': {'timeout': 20},
+    }
+
+DATABASE_ROUTERS = ['note_todo.sharding.AuthorShardRouter']
+
+
+# Кэш задается переменной окружения CACHE_URL (examen/cache_url.py): для развертывания -
+# общий кэш (redis://, memcached://), иначе выход или смена пароля в одном процессе
+# не сбросят сессию и пользователя, закэшированных другими. Без CACHE_URL кэш в памяти
+# процесса берется только при DEBUG, а без DEBUG запуск завершается ошибкой
+CACHE_URL = os.environ.get('CACHE_URL', 'locmem://' if DEBUG else '')
+if not CACHE_URL:
+    raise ImproperlyConfigured('Задайте CACHE_URL общего кэша (redis://, memcached://) или включите DEBUG')
+CACHES = {'default': cache_url.parse(CACHE_URL)}
+
+# Сессии читаются из кэша, а записываются и в кэш, и в базу
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Пользователь сессии кэшируется login.middleware.CachedAuthenticationMiddleware
+AUTH_USER_CACHE_ALIAS = 'default'
+# Время жизни пользователя в кэше, с. Для кэша в памяти процесса - AUTH_USER_LOCAL_CACHE_TIMEOUT:
+# столько другие процессы могут принимать сессию после смены пароля или блокировки
+AUTH_USER_CACHE_TIMEOUT = 300
+AUTH_USER_LOCAL_CACHE_TIMEOUT = 5
+
+# Готовые страницы ленты публичных заметок (note_todo_api.snapshots)
+PUBLIC_FEED_CACHE_ALIAS = 'default'
+# Лента обновляется перестройкой страниц при изменениях. Раз в PUBLIC_FEED_REFRESH секунд
+# она дополнительно перестраивается целиком в фоне, а страницы живут в кэше PUBLIC_FEED_TIMEOUT
+PUBLIC_FEED_TIMEOUT = 86400
+PUBLIC_FEED_REFRESH = 3600
+
+# Списки заметок и комментариев отдаются потоково (note_todo_api.streaming)
+NOTE_LIST_STREAMING = True
+
+# Групповая запись комментариев (note_todo_api.batching): пакет пишется одной транзакцией,
+# когда в нем набралось COMMENT_BATCH_MAX_SIZE комментариев или прошло COMMENT_BATCH_MAX_DELAY
+# секунд с первого. Задержка добавляется к ответу на каждую оценку
+COMMENT_BATCHING = True
+COMMENT_BATCH_MAX_SIZE = 100
+COMMENT_BATCH_MAX_DELAY = 0.005
+
+# Одинаковые одновременные GET-запросы к представлениям с coalesce_scope
+# выполняются один раз (note_todo_api.coalescing)
+REQUEST_COALESCING = True
+
+# Бюджет холодного старта в секундах (examen.startup): manage.py check и первый запрос
+# нового процесса. Тест test_startup падает, если старт дольше (проверяется только при
+# STARTUP_BUDGET_CHECK=1 в окружении, на стабильной машине); профиль - manage.py startup_profile
+STARTUP_BUDGET = {
+    'check': 1.0,
+    'request': 1.0,
+}
+
+
+# Профилирование API (note_todo_api.profiling): API_PROFILING_ENABLED включает сэмплер,
+# дальше - доля запросов для сэмплера и интервал снятия стеков в секундах. Запросы с подписанным
+# заголовком X-Profile профилируются cProfile независимо от этих настроек
+API_PROFILING_ENABLED = False
+API_PROFILING_SAMPLE_RATE = 0.01
+API_PROFILING_INTERVAL = 0.005
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -126,6 +204,17 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# collectstatic собирает сюда только используемую статику login (login.finders),
+# с хэшами в именах и сжатыми вариантами .gz/.br; отдает ее login.middleware
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STATICFILES_STORAGE = 'login.storage.CompressedManifestStaticFilesStorage'
+
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'login.finders.LoginAssetsFinder',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
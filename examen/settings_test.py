@@ -0,0 +1,49 @@
+"""
+Настройки для быстрого прогона тестов.
+
+manage.py подключает их автоматически для команды test:
+база в памяти с общим кэшем, быстрый хэшер паролей,
+параллельные процессы и отчет о самых медленных тестах.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DATABASES['default']['TEST'] = {
+    'NAME': 'file:memorydb_default?mode=memory&cache=shared',
+}
+
+# Шарды для тестов шардирования: сами тесты включают их через override_settings
+NOTE_TODO_SHARDS = []
+for _alias in ('shard_0', 'shard_1'):
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'NAME': f'file:memorydb_{_alias}?mode=memory&cache=shared'},
+    }
+
+# PBKDF2 намеренно медленный, в тестах стойкость хэша не нужна
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+# Тесты не зависят от того, запускался ли collectstatic
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+# Кэш не переживает откат транзакции теста, поэтому между тестами не кэшируем ничего;
+# тесты кэширования включают LocMemCache через override_settings
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+# Поток записи комментариев не видит незакоммиченных данных теста, поэтому в тестах
+# комментарии пишутся в потоке запроса; тесты пакетов включают его через override_settings
+COMMENT_BATCHING = False
+
+TEST_RUNNER = 'examen.test_runner.TimedTestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+}
@@ -0,0 +1,135 @@
+"""
+Время запуска: отложенная загрузка представлений и замер холодного старта.
+
+Каждый manage.py и каждый воркер при запуске загружают настройки, приложения и URLconf.
+Если URLconf импортирует модули представлений, вместе с ними грузятся DRF, сериализаторы
+и фильтры - даже для команды, которая не обслуживает ни одного запроса.
+lazy_view подставляет в URLconf обертку, которая импортирует представление
+при первом обращении к нему.
+
+measure запускает этап старта в отдельном холодном процессе и возвращает время
+до его завершения, а с profile=True - еще и дерево импортов из python -X importtime.
+Этапы:
+
+* setup - django.setup();
+* check - manage.py check;
+* request - django.setup() и первый запрос через WSGI-приложение, как у воркера.
+
+-X importtime не записывает модули, загруженные через importlib.import_module
+(URLconf, модули admin, команды), - их импорты видны на уровне ближайшего записанного родителя.
+"""
+import importlib
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+STAGES = {
+    'setup': 'import django\ndjango.setup()\n',
+    'check': (
+        'from django.core.management import execute_from_command_line\n'
+        "execute_from_command_line(['manage.py', 'check'])\n"
+    ),
+    'request': (
+        'import sys\n'
+        'from django.core.wsgi import get_wsgi_application\n'
+        'application = get_wsgi_application()\n'
+        'environ = {{\n'
+        "    'REQUEST_METHOD': 'GET', 'PATH_INFO': {url!r}, 'QUERY_STRING': '', 'SERVER_NAME': {host!r},\n"
+        "    'SERVER_PORT': '80', 'HTTP_HOST': {host!r}, 'HTTP_ACCEPT': 'application/json',\n"
+        "    'wsgi.input': sys.stdin.buffer, 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,\n"
+        '}}\n'
+        'statuses = []\n'
+        "b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))\n"
+        'print(statuses[0])\n'
+    ),
+}
+# Первый запрос без базы: анонимная лента пользователя загружает представление, DRF
+# и сериализаторы и отвечает 403, не открывая соединение
+DEFAULT_URL = '/api/note/mine/'
+
+
+class LazyView:
+    """
+    Класс представления для URLconf, которое импортируется при первом обращении.
+    Атрибуты, которые Django читает у представления (view_class, csrf_exempt и т.п.),
+    берутся у настоящего представления и тоже загружают его
+    """
+    def __init__(self, path, **initkwargs):
+        self.path = path
+        self.initkwargs = initkwargs
+        self._view = None
+
+    def load(self):
+        if self._view is None:
+            module, name = self.path.rsplit('.', 1)
+            view = getattr(importlib.import_module(module), name)
+            self._view = view.as_view(**self.initkwargs) if hasattr(view, 'as_view') else view
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.load()(request, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Вызывается только для отсутствующих атрибутов; _view есть всегда
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        return f'<LazyView {self.path}>'
+
+
+def lazy_view(path, **initkwargs):
+    """
+    Функция, возвращающая представление для path(), которое импортируется при первом запросе
+    :param path: путь к классу или функции представления
+    :param initkwargs: аргументы as_view()
+    """
+    return LazyView(path, **initkwargs)
+
+
+def parse_importtime(stderr):
+    """
+    Функция, разбирающая вывод python -X importtime в дерево.
+    Модуль печатается после всех импортированных им модулей, с отступом по глубине
+    :return: список корней [(модуль, собственное время, суммарное время, дети)], время в мкс
+    """
+    pending = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        children = []
+        while pending and pending[-1][0] > depth:
+            children.append(pending.pop()[1])
+        children.reverse()
+        pending.append((depth, (name.strip(), int(self_us), int(cumulative_us), children)))
+    return [node for _, node in pending]
+
+
+def measure(stage, profile=False, url=DEFAULT_URL, host='localhost', settings_module=None):
+    """
+    Функция, запускающая этап старта в новом процессе
+    :param stage: setup, check или request
+    :param profile: запустить с -X importtime
+    :param settings_module: модуль настроек, по умолчанию текущий DJANGO_SETTINGS_MODULE
+    :return: (время от запуска до выхода процесса в c, дерево импортов или None, stdout)
+    """
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = settings_module or env.get('DJANGO_SETTINGS_MODULE', 'examen.settings')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(BASE_DIR), env.get('PYTHONPATH')]))
+    script = STAGES[stage].format(url=url, host=host)
+    command = [sys.executable, *(['-X', 'importtime'] if profile else []), '-c', script]
+    start = time.perf_counter()
+    result = subprocess.run(command, env=env, cwd=BASE_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f'Этап {stage} завершился с ошибкой:\n{result.stderr[-2000:]}')
+    return elapsed, parse_importtime(result.stderr) if profile else None, result.stdout
@@ -0,0 +1,96 @@
+"""
+Тестовый раннер, который по умолчанию запускает тесты в нескольких процессах
+и в конце выводит самые медленные тесты.
+"""
+import time
+import unittest
+
+from django.test.runner import DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner, \
+    get_max_test_processes
+
+
+class TimedTestResultMixin:
+    """
+    Миксин результата, замеряющий время каждого теста.
+    Событие addDuration совпадает по имени с unittest из Python 3.12
+    """
+    def startTest(self, test):
+        self._test_started_at = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.addDuration(test, time.perf_counter() - self._test_started_at)
+
+    def addDuration(self, test, elapsed):
+        if not hasattr(self, 'durations'):
+            self.durations = {}
+        self.durations[test.id()] = elapsed
+
+
+class TimedTextTestResult(TimedTestResultMixin, unittest.TextTestResult):
+    pass
+
+
+class TimedRemoteTestResult(RemoteTestResult):
+    """
+    Результат для дочерних процессов: время теста передается в родительский процесс
+    отдельным событием, потому что события startTest и stopTest там только воспроизводятся
+    """
+    def startTest(self, test):
+        self._test_started_at = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.events.append(('addDuration', self.test_index, time.perf_counter() - self._test_started_at))
+
+
+class TimedRemoteTestRunner(RemoteTestRunner):
+    resultclass = TimedRemoteTestResult
+
+
+class TimedParallelTestSuite(ParallelTestSuite):
+    runner_class = TimedRemoteTestRunner
+
+
+class TimedTestRunner(DiscoverRunner):
+    """
+    Раннер тестов: без --parallel запускает по процессу на ядро,
+    после прогона печатает --slowest самых медленных тестов
+    и помечает те, что дольше --slow-threshold секунд
+    """
+    parallel_test_suite = TimedParallelTestSuite
+
+    def __init__(self, slowest=10, slow_threshold=0.5, parallel=0, **kwargs):
+        if not parallel:
+            parallel = get_max_test_processes()
+        super().__init__(parallel=parallel, **kwargs)
+        self.slowest = slowest
+        self.slow_threshold = slow_threshold
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--slowest', type=int, default=10,
+                            help='Сколько самых медленных тестов показать после прогона')
+        parser.add_argument('--slow-threshold', type=float, default=0.5,
+                            help='Тесты дольше этого числа секунд помечаются как медленные')
+
+    def get_resultclass(self):
+        return super().get_resultclass() or TimedTextTestResult
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        self.report_durations(getattr(result, 'durations', {}))
+        return result
+
+    def report_durations(self, durations):
+        if not self.slowest or not durations:
+            return
+
+        slowest = sorted(durations.items(), key=lambda item: item[1], reverse=True)[:self.slowest]
+        self.log(f'\nСамые медленные тесты (всего {len(durations)}, {sum(durations.values()):.2f} c):')
+        for test_id, elapsed in slowest:
+            mark = ' МЕДЛЕННЫЙ' if elapsed >= self.slow_threshold else ''
+            self.log(f'{elapsed:8.3f} c  {test_id}{mark}')
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class LoginConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'login'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.signals import user_logged_out
+        from django.db.models.signals import post_delete, post_save
+
+        from . import auth
+
+        user_model = get_user_model()
+        post_save.connect(auth.user_changed, sender=user_model, dispatch_uid='login_user_saved')
+        post_delete.connect(auth.user_changed, sender=user_model, dispatch_uid='login_user_deleted')
+        user_logged_out.connect(auth.user_logged_out, dispatch_uid='login_user_logged_out')
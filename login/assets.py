@@ -0,0 +1,74 @@
+"""
+Поиск статических файлов, которые действительно нужны страницам приложения login.
+
+Берутся пути из {% static %} в шаблонах login и все, на что они ссылаются:
+url() и @import в CSS, sourceMappingURL в JS. Остальные файлы вендорных пакетов
+(исходники less/scss, несжатые версии библиотек) в сборку не попадают.
+"""
+import posixpath
+import re
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+APP_DIR = Path(__file__).resolve().parent
+TEMPLATES_DIR = APP_DIR / 'templates' / 'login'
+STATIC_DIR = APP_DIR / 'static'
+
+STATIC_TAG_RE = re.compile(r"""{%\s*static\s+["']([^"']+)["']\s*%}""")
+CSS_URL_RE = re.compile(r"""url\(\s*['"]?\s*([^'")]+?)\s*['"]?\s*\)|@import\s*["']\s*([^"']+?)["']""")
+JS_SOURCE_MAP_RE = re.compile(r'(?m)^//# sourceMappingURL=(\S+)\s*$')
+
+
+def template_references(templates_dir=TEMPLATES_DIR):
+    """
+    Функция, собирающая пути из тегов {% static %} всех шаблонов приложения
+    """
+    paths = set()
+    for template in templates_dir.glob('*.html'):
+        paths.update(STATIC_TAG_RE.findall(template.read_text(encoding='utf-8')))
+    return paths
+
+
+def file_references(path, content):
+    """
+    Функция, возвращающая пути файлов, на которые ссылается CSS или JS файл,
+    относительно корня статики. Ссылки data:, абсолютные адреса и якоря пропускаются
+    """
+    if path.endswith('.css'):
+        urls = [url or imported for url, imported in CSS_URL_RE.findall(content)]
+    elif path.endswith('.js'):
+        urls = JS_SOURCE_MAP_RE.findall(content)
+    else:
+        return set()
+
+    references = set()
+    for url in urls:
+        if url.startswith(('#', 'data:', '/', 'http:', 'https:', '//')):
+            continue
+        url_path = unquote(urlsplit(url).path)
+        if url_path:
+            references.add(posixpath.normpath(posixpath.join(posixpath.dirname(path), url_path)))
+    return references
+
+
+@lru_cache(maxsize=None)
+def referenced_assets(static_dir=STATIC_DIR, templates_dir=TEMPLATES_DIR):
+    """
+    Функция, возвращающая множество статических путей, нужных шаблонам login,
+    вместе с транзитивными ссылками из CSS и JS. Несуществующие файлы отбрасываются
+    """
+    pending = list(template_references(templates_dir))
+    found = set()
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        file_path = static_dir / path
+        if not file_path.is_file():
+            continue
+        found.add(path)
+        if path.endswith(('.css', '.js')):
+            content = file_path.read_text(encoding='utf-8', errors='replace')
+            pending.extend(file_references(path, content) - found)
+    return frozenset(found)
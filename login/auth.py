@@ -0,0 +1,85 @@
+"""
+Кэширование пользователя, найденного по сессии.
+
+Стандартный AuthenticationMiddleware на каждый запрос читает пользователя из базы.
+Здесь пользователь хранится в кэше AUTH_USER_CACHE_ALIAS по id, а из базы читается
+только при промахе. Сессия при этом по-прежнему проверяется по хэшу пароля
+(get_session_auth_hash), а запись в кэше удаляется при сохранении или удалении
+пользователя (смена пароля, блокировка) и при выходе.
+
+Удаление видно только процессам, которые читают тот же кэш. Если кэш в памяти процесса,
+другие процессы узнают о смене пароля или блокировке только по истечении срока записи,
+поэтому для него срок короткий - AUTH_USER_LOCAL_CACHE_TIMEOUT.
+"""
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model, load_backend,
+)
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.crypto import constant_time_compare
+
+USER_CACHE_KEY = 'auth:user:%s'
+
+
+def user_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def user_cache_timeout(cache):
+    """
+    Функция, возвращающая время жизни пользователя в кэше
+    """
+    if isinstance(cache, LocMemCache):
+        return getattr(settings, 'AUTH_USER_LOCAL_CACHE_TIMEOUT', 5)
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300)
+
+
+def invalidate_user(user_id):
+    """
+    Функция, удаляющая пользователя из кэша
+    :param user_id: id пользователя
+    """
+    user_cache().delete(USER_CACHE_KEY % user_id)
+
+
+def get_user(request):
+    """
+    Функция, возвращающая пользователя текущей сессии из кэша или базы.
+    Повторяет django.contrib.auth.get_user, но без запроса к базе при попадании в кэш
+    :param request: запрос с сессией
+    :return: пользователь или AnonymousUser
+    """
+    try:
+        user_id = get_user_model()._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    cache = user_cache()
+    key = USER_CACHE_KEY % user_id
+    user = cache.get(key)
+    if user is None:
+        user = load_backend(backend_path).get_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        cache.set(key, user, user_cache_timeout(cache))
+
+    if hasattr(user, 'get_session_auth_hash'):
+        session_hash = request.session.get(HASH_SESSION_KEY)
+        if not (session_hash and constant_time_compare(session_hash, user.get_session_auth_hash())):
+            request.session.flush()
+            return AnonymousUser()
+    return user
+
+
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+def user_logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
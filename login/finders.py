@@ -0,0 +1,20 @@
+from django.contrib.staticfiles.finders import AppDirectoriesFinder
+
+from .assets import referenced_assets
+
+
+class LoginAssetsFinder(AppDirectoriesFinder):
+    """
+    Поиск статики в приложениях, который для приложения login отдает collectstatic
+    только файлы, на которые ссылаются его шаблоны. Поиск отдельного файла (find)
+    не ограничивается, чтобы runserver по-прежнему отдавал любую статику
+    """
+    def list(self, ignore_patterns):
+        assets = None
+        for path, storage in super().list(ignore_patterns):
+            if storage is self.storages.get('login'):
+                if assets is None:
+                    assets = referenced_assets()
+                if path.replace('\\', '/') not in assets:
+                    continue
+            yield path, storage
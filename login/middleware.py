@@ -0,0 +1,121 @@
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import auth
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(header):
+    """
+    Функция, разбирающая заголовок Accept-Encoding с учетом q=0
+    :param header: значение заголовка
+    :return: множество допустимых кодировок
+    """
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Middleware, отдающее собранную collectstatic статику прямо из процесса приложения.
+    Выбирает заранее сжатый вариант .br или .gz по Accept-Encoding, для файлов
+    с хэшем в имени ставит кэширование на год, остальные просит перепроверять.
+    Без STATIC_ROOT не подключается
+    """
+    def __init__(self, get_response):
+        if not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.root = Path(settings.STATIC_ROOT)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self._hashed_names = None
+
+    @property
+    def hashed_names(self):
+        if self._hashed_names is None:
+            self._hashed_names = frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return self._hashed_names
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        """
+        Функция, отдающая файл статики или None, если такого файла нет
+        :param request: запрос
+        :param name: путь файла относительно STATIC_URL
+        """
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path) or path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+            return None
+
+        stat = os.stat(path)
+        immutable = name in self.hashed_names
+        if not immutable and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = None
+        for candidate, suffix in ENCODINGS:
+            if candidate in encodings and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        if 'Content-Disposition' in response:
+            del response['Content-Disposition']
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Замена AuthenticationMiddleware, которая берет пользователя сессии из кэша (login.auth),
+    поэтому запрос авторизованного пользователя не читает таблицу пользователей
+    """
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: self.get_cached_user(request))
+
+    @staticmethod
+    def get_cached_user(request):
+        if not hasattr(request, '_cached_user'):
+            request._cached_user = auth.get_user(request)
+        return request._cached_user
@@ -0,0 +1,65 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.ico', '.txt', '.json', '.html')
+# Файлы меньше этого размера не сжимаются: выигрыш меньше накладных расходов на заголовки
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Хранилище статики, которое помимо хэшированных имен файлов
+    заранее записывает рядом сжатые варианты .gz и .br (если установлен brotli),
+    чтобы при отдаче не тратить время на сжатие
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        compressed = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not dry_run and hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                compressed[hashed_name] = True
+            yield name, hashed_name, processed
+
+        for hashed_name in compressed:
+            self.compress(hashed_name)
+
+    def compress(self, name):
+        """
+        Функция, записывающая сжатые варианты файла, если они меньше оригинала
+        :param name: хэшированное имя файла
+        """
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+
+        variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content, quality=11)
+
+        for suffix, data in variants.items():
+            if len(data) < len(content):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(data))
+
+    def url_converter(self, name, hashed_files, template=None):
+        """
+        Ссылки на отсутствующие файлы (например, sourceMappingURL на карту,
+        которую вендор не положил в пакет) остаются как есть, а не прерывают сборку
+        """
+        converter = super().url_converter(name, hashed_files, template)
+
+        def safe_converter(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj['matched']
+
+        return safe_converter
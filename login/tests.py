@@ -1,3 +1,151 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from note_todo.models import NoteToDo
+from . import auth
+from .assets import referenced_assets
+
+
+class TestReferencedAssets(SimpleTestCase):
+    """
+    Тестирование отбора статики, на которую ссылаются шаблоны login
+    """
+    def test_template_and_css_references(self):
+        """
+        Функция тестирования того, что в сборку попадают файлы из шаблонов и шрифты из CSS
+        """
+        assets = referenced_assets()
+        self.assertIn('login/css/main.css', assets)
+        self.assertIn('login/vendor/jquery/jquery-3.2.1.min.js', assets)
+        self.assertIn('login/fonts/poppins/Poppins-Regular.ttf', assets)
+        self.assertIn('login/fonts/font-awesome-4.7.0/fonts/fontawesome-webfont.woff2', assets)
+
+    def test_unused_vendor_files_excluded(self):
+        """
+        Функция тестирования того, что исходники и неиспользуемые версии библиотек не собираются
+        """
+        assets = referenced_assets()
+        self.assertNotIn('login/vendor/bootstrap/css/bootstrap.css', assets)
+        self.assertNotIn('login/fonts/font-awesome-4.7.0/less/core.less', assets)
+        self.assertNotIn('login/fonts/poppins/Poppins-Black.ttf', assets)
+
+
+class TestPrecompressedStaticMiddleware(SimpleTestCase):
+    """
+    Тестирование отдачи собранной статики со сжатыми вариантами
+    """
+    hashed_name = 'login/css/main.0123456789ab.css'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        content = b'body { color: red; }\n' * 100
+
+        (root / 'login' / 'css').mkdir(parents=True)
+        (root / 'login/css/main.css').write_bytes(content)
+        (root / self.hashed_name).write_bytes(content)
+        (root / (self.hashed_name + '.gz')).write_bytes(gzip.compress(content))
+        (root / 'staticfiles.json').write_text(json.dumps({
+            'paths': {'login/css/main.css': self.hashed_name},
+            'version': '1.0',
+        }))
+
+        settings_override = override_settings(
+            STATIC_ROOT=root,
+            STATICFILES_STORAGE='login.storage.CompressedManifestStaticFilesStorage',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_gzip_variant_immutable(self):
+        """
+        Функция тестирования отдачи gzip варианта файла с хэшем и долгого кэширования
+        """
+        resp = self.client.get(f'/static/{self.hashed_name}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual('gzip', resp['Content-Encoding'])
+        self.assertEqual('text/css', resp['Content-Type'])
+        self.assertEqual('Accept-Encoding', resp['Vary'])
+        self.assertIn('immutable', resp['Cache-Control'])
+
+    def test_identity_when_gzip_refused(self):
+        """
+        Функция тестирования отдачи несжатого файла, если клиент не принимает gzip
+        """
+        resp = self.client.get(f'/static/{self.hashed_name}', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertEqual(200, resp.status_code)
+        self.assertFalse(resp.has_header('Content-Encoding'))
+
+    def test_unhashed_name_revalidates(self):
+        """
+        Функция тестирования того, что файл без хэша в имени не кэшируется надолго
+        """
+        resp = self.client.get('/static/login/css/main.css')
+        self.assertEqual(200, resp.status_code)
+        self.assertIn('must-revalidate', resp['Cache-Control'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestCachedAuthentication(TestCase):
+    """
+    Тестирование кэширования сессии и пользователя между запросами
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cached_user', password='password')
+        NoteToDo.objects.create(title='public', author=cls.user, public=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.client.get('/api/note/public/')
+
+    def test_authenticated_request_only_data_queries(self):
+        """
+        Функция тестирования того, что сессия и пользователь не читаются из базы повторно
+        """
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/note/mine/')
+        self.assertEqual(200, resp.status_code)
+
+        # лента публичных заметок отдается из снимка
+        with self.assertNumQueries(0):
+            self.client.get('/api/note/public/')
+
+    def test_password_change_invalidates(self):
+        """
+        Функция тестирования того, что после смены пароля старая сессия перестает работать
+        """
+        self.user.set_password('new_password')
+        self.user.save()
+
+        resp = self.client.get('/api/note/mine/')
+        self.assertEqual(403, resp.status_code)
+
+    def test_logout_invalidates(self):
+        """
+        Функция тестирования того, что после выхода сессия не берется из кэша
+        """
+        session_key = self.client.session.session_key
+        self.client.logout()
+
+        self.assertFalse(cache.has_key(auth.USER_CACHE_KEY % self.user.pk))
+        self.assertFalse(cache.has_key(f'django.contrib.sessions.cached_db{session_key}'))
+
+    @override_settings(AUTH_USER_LOCAL_CACHE_TIMEOUT=7)
+    def test_local_cache_short_timeout(self):
+        """
+        Функция тестирования того, что в кэше процесса пользователь живет AUTH_USER_LOCAL_CACHE_TIMEOUT
+        """
+        cache.clear()
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.client.get('/api/note/mine/')
+        cache_set.assert_any_call(auth.USER_CACHE_KEY % self.user.pk, mock.ANY, 7)
@@ -1,25 +1,161 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Min
+from django.utils.functional import cached_property
 from .models import NoteToDo, Comment
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, который для большой таблицы без фильтров берет оценку количества строк
+    вместо SELECT COUNT(*) по всей таблице. Для отфильтрованных запросов и таблиц
+    не больше EXACT_COUNT_LIMIT строк считает точно. Если количество оценено, estimated=True,
+    и админка показывает его как приблизительное
+    """
+    EXACT_COUNT_LIMIT = 10000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+
+        estimate = self.statistics_count(queryset)
+        if estimate is None:
+            # COUNT(*) не больше чем по EXACT_COUNT_LIMIT + 1 строкам
+            bounded = queryset.order_by()[:self.EXACT_COUNT_LIMIT + 1].count()
+            if bounded <= self.EXACT_COUNT_LIMIT:
+                return bounded
+            # Размер диапазона ключей: после удалений это лишь верхняя граница.
+            # MIN и MAX по отдельности, иначе SQLite не берет их из краев индекса
+            max_pk = queryset.aggregate(max_pk=Max('pk'))['max_pk']
+            estimate = max_pk - queryset.aggregate(min_pk=Min('pk'))['min_pk'] + 1
+        elif estimate <= self.EXACT_COUNT_LIMIT:
+            return super().count
+        self.estimated = True
+        return estimate
+
+    @staticmethod
+    def statistics_count(queryset):
+        """
+        Функция, возвращающая количество строк таблицы из статистики планировщика
+        :return: количество или None, если статистики нет
+        """
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            query = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+        elif connection.vendor == 'sqlite':
+            # Статистика ANALYZE: первое число в stat любого индекса - количество строк таблицы
+            query = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+        else:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query, [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            # sqlite_stat1 появляется только после ANALYZE
+            return None
+        if not row:
+            return None
+        estimate = int(float(str(row[0]).split()[0]))
+        return estimate if estimate > 0 else None
+
+
+class AutocompleteListFilter(admin.SimpleListFilter):
+    """
+    Фильтр боковой панели по внешнему ключу с полем автодополнения.
+    В отличие от стандартного фильтра не загружает все связанные объекты,
+    а ищет их через autocomplete view админки
+    """
+    template = 'admin/note_todo/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.title = self.field.verbose_name
+        self.parameter_name = f'{self.field_name}__id__exact'
+        super().__init__(request, params, model, model_admin)
+        self.widget = AutocompleteSelect(self.field, model_admin.admin_site)
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f'{self.field_name}_id': self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        form_field = self.field.formfield(widget=self.widget, required=False)
+        params = changelist.get_filters_params()
+        params.pop(self.parameter_name, None)
+        yield {
+            'params': params.items(),
+            'widget': form_field.widget.render(self.parameter_name, self.value(),
+                                               attrs={'onchange': 'this.form.submit()'}),
+        }
+
+
+class NoteAuthorListFilter(AutocompleteListFilter):
+    field_name = 'author'
+
+
+class CommentNoteListFilter(AutocompleteListFilter):
+    field_name = 'note_todo'
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Базовый класс админки для больших таблиц: оценка количества строк вместо COUNT(*)
+    и подключение статики фильтров с автодополнением
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, type) and issubclass(list_filter, AutocompleteListFilter):
+                field = self.model._meta.get_field(list_filter.field_name)
+                media += AutocompleteSelect(field, self.admin_site).media
+        return media
+
+
 @admin.register(NoteToDo)
-class NoteToDoAdmin(admin.ModelAdmin):
+class NoteToDoAdmin(LargeTableAdmin):
     """
     Класс, регистрирующий модель в админке, с настроеннфми полями
     """
     list_display = ('title', 'note_status', 'importance', 'public', 'created_at', 'due_to', 'author')
+    list_select_related = ('author',)
 
     fields = (('title', 'public', 'importance'), 'note_status', 'content', 'created_at', 'due_to', 'author')
     readonly_fields = ('created_at',)
+    autocomplete_fields = ('author',)
 
     search_fields = ('title', 'content', 'due_to')
-    list_filter = ('public', 'author', 'importance')
+    list_filter = ('public', NoteAuthorListFilter, 'importance')
     ordering = ('-created_at', 'importance')
+    date_hierarchy = 'created_at'
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     """
     Класс, регистрирующий модель комментариев в админке с настроенными полями
     """
     list_display = ('author', 'note_todo', 'rating')
+    list_select_related = ('author', 'note_todo')
+    autocomplete_fields = ('author', 'note_todo')
+
+    list_filter = ('rating', CommentNoteListFilter, NoteAuthorListFilter)
+    ordering = ('-pk',)
@@ -2,9 +2,18 @@ from django.apps import AppConfig
 from django.utils.translation import gettext_lazy as _
 
 
-
 class NoteTodoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'note_todo'
 
     verbose_name = _("Заметки")
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_migrate, post_save
+
+        from . import sharding
+
+        post_save.connect(sharding.user_saved, sender=get_user_model(), dispatch_uid='shard_user_saved')
+        post_delete.connect(sharding.user_deleted, sender=get_user_model(), dispatch_uid='shard_user_deleted')
+        post_migrate.connect(sharding.shard_migrated, sender=self, dispatch_uid='shard_migrated')
@@ -0,0 +1,36 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from note_todo import purge
+
+
+class Command(BaseCommand):
+    """
+    Команда, быстро удаляющая пользователя вместе со всеми его заметками и комментариями
+    """
+    help = 'Пакетное удаление заметок и комментариев пользователя'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--batch-size', type=int, default=purge.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--keep-user', action='store_true',
+                            help='Удалить только заметки и комментарии, пользователя оставить')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['username']} не найден")
+
+        start = time.perf_counter()
+
+        def progress(stage, deleted):
+            self.stderr.write(f'\r{stage}: {deleted} ({time.perf_counter() - start:.1f} c)', ending='')
+
+        totals = purge.purge_user(user, batch_size=options['batch_size'], progress=progress,
+                                  delete_user=not options['keep_user'])
+        self.stderr.write('')
+        self.stdout.write(f"Удалено заметок: {totals['notes']}, комментариев: {totals['comments']} "
+                          f"за {time.perf_counter() - start:.2f} c")
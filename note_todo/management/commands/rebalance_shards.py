@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from note_todo import sharding
+from note_todo.models import NoteToDo
+
+
+class Command(BaseCommand):
+    """
+    Команда, переносящая заметки и комментарии в шарды их авторов после изменения NOTE_TODO_SHARDS.
+    Просматривает все базы из DATABASES, где есть таблица заметок: default с данными до шардирования,
+    текущие шарды и выведенные из NOTE_TODO_SHARDS, но еще не удаленные из DATABASES
+    """
+    help = 'Перенос заметок в шарды их авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, что будет перенесено')
+
+    def handle(self, *args, **options):
+        if not sharding.is_enabled():
+            raise CommandError('Шардирование выключено: задайте NOTE_TODO_SHARDS')
+
+        for alias in sharding.shards():
+            copied = sharding.mirror_users(alias)
+            if copied:
+                self.stdout.write(f'{alias}: скопировано пользователей {copied}')
+
+        start = time.perf_counter()
+        total = 0
+        for source in connections:
+            if NoteToDo._meta.db_table not in connections[source].introspection.table_names():
+                continue
+            moved = sharding.rebalance(source, batch_size=options['batch_size'], dry_run=options['dry_run'])
+            for target, count in sorted(moved.items()):
+                self.stdout.write(f'{source} -> {target}: {count}')
+            total += sum(moved.values())
+
+        verb = 'Будет перенесено' if options['dry_run'] else 'Перенесено'
+        self.stdout.write(f'{verb} заметок: {total} за {time.perf_counter() - start:.2f} c')
@@ -0,0 +1,98 @@
+import random
+import sys
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import dateparse, timezone
+
+from note_todo import seed
+from note_todo.models import NoteToDo, Comment
+
+
+class Command(BaseCommand):
+    """
+    Команда, генерирующая пользователей, заметки и комментарии для нагрузочного тестирования.
+    Данные детерминированы параметром --seed. Вместо генерации может потоково загрузить
+    jsonl дамп (--load) или записать сгенерированные данные в дамп (--dump)
+    """
+    help = 'Генерация и быстрая загрузка тестовых данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--notes', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--now', type=dateparse.parse_datetime,
+                            help='Момент, от которого отсчитываются даты (ISO 8601). '
+                                 'Вместе с --seed делает данные полностью воспроизводимыми')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--password', default='loadtest',
+                            help='Пароль всех сгенерированных пользователей')
+        parser.add_argument('--fast', action='store_true',
+                            help='Загружать через executemany в обход ORM (только SQLite)')
+        parser.add_argument('--load', metavar='PATH',
+                            help='Загрузить jsonl дамп, "-" для stdin')
+        parser.add_argument('--dump', metavar='PATH',
+                            help='Записать сгенерированные данные в jsonl, "-" для stdout')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        loader = seed.raw_load if options['fast'] else seed.bulk_load
+        start = time.perf_counter()
+
+        if options['load']:
+            stream = sys.stdin if options['load'] == '-' else open(options['load'], encoding='utf-8')
+            with stream:
+                totals = seed.load_ndjson(stream, loader, options['chunk_size'], options['database'])
+        else:
+            totals = self._generate(loader, options)
+
+        elapsed = time.perf_counter() - start
+        rows = sum(totals.values())
+        for label, count in totals.items():
+            self.stderr.write(f'{label}: {count}')
+        self.stderr.write(f'{rows} строк за {elapsed:.2f} c, {rows / elapsed if elapsed else 0:.0f} строк/с')
+
+    def _generate(self, loader, options):
+        if options['users'] < 1 and (options['notes'] or options['comments']):
+            raise CommandError('Для заметок и комментариев нужен хотя бы один пользователь')
+
+        using = options['database']
+        rnd = random.Random(options['seed'])
+        now = options['now'] or timezone.now()
+        if timezone.is_naive(now):
+            now = timezone.make_aware(now)
+        # Хэш считается один раз: PBKDF2 на каждого пользователя занял бы больше, чем вся загрузка
+        password = make_password(options['password'], salt=f"seed{options['seed']}")
+
+        user_start = seed.next_id(User, using)
+        note_start = seed.next_id(NoteToDo, using)
+        author_ids = range(user_start, user_start + options['users'])
+        note_ids = range(note_start, note_start + options['notes'])
+
+        batches = (
+            ('auth.user', seed.user_rows(rnd, user_start, options['users'], password, now)),
+            ('note_todo.notetodo', seed.note_rows(rnd, note_start, options['notes'], author_ids, now)),
+            ('note_todo.comment', seed.comment_rows(rnd, seed.next_id(Comment, using), options['comments'],
+                                                    note_ids, author_ids) if note_ids else ()),
+        )
+
+        if options['dump']:
+            stream = sys.stdout if options['dump'] == '-' else open(options['dump'], 'w', encoding='utf-8')
+            try:
+                return {label: seed.dump_ndjson(stream, label, seed.SEED_MODELS[label][1], rows)
+                        for label, rows in batches}
+            finally:
+                if stream is not sys.stdout:
+                    stream.close()
+
+        totals = {}
+        for label, rows in batches:
+            model, columns = seed.SEED_MODELS[label]
+            try:
+                totals[label] = loader(model, columns, rows, options['chunk_size'], using)
+            except NotImplementedError as exc:
+                raise CommandError(str(exc))
+        return totals
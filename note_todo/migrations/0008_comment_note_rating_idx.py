@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-19 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note_todo', '0007_alter_notetodo_due_to'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['note_todo', 'rating'], name='comment_note_rating_idx'),
+        ),
+    ]
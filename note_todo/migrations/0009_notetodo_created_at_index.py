@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note_todo', '0008_comment_note_rating_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notetodo',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания'),
+        ),
+    ]
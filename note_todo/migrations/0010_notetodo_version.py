@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-19 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note_todo', '0009_notetodo_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notetodo',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия'),
+        ),
+    ]
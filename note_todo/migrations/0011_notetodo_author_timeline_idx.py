@@ -0,0 +1,21 @@
+# Generated by Django 4.0.4 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note_todo', '0010_notetodo_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notetodo',
+            index=models.Index(fields=['author', 'note_status', 'created_at'], name='note_author_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notetodo',
+            index=models.Index(fields=['author', 'note_status', 'due_to'], name='note_author_status_due_idx'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import User
 from datetime import timedelta
 
+from .sharding import ShardedQuerySet
+
 
 def get_next_day():
     now = datetime.datetime.now()
@@ -24,7 +26,7 @@ class NoteToDo(models.Model):
 
     title = models.CharField(max_length=255, verbose_name='Заголовок')
     content = models.TextField(default='', verbose_name='Заметка')
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')
     due_to = models.DateTimeField(default=get_next_day, verbose_name='До какого числа исполнить')
     public = models.BooleanField(default=False, verbose_name='Публичная')
     importance = models.BooleanField(default=True, verbose_name='Важно')
@@ -32,6 +34,9 @@ class NoteToDo(models.Model):
     note_status = models.IntegerField(default=NoteStatus.ACTIVE,
                                       choices=NoteStatus.choices,
                                       verbose_name='Статус состояния')
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия')
+
+    objects = ShardedQuerySet.as_manager()
 
     def __str__(self):
         return f"Заметка {self.title}"
@@ -39,6 +44,10 @@ class NoteToDo(models.Model):
     class Meta:
         verbose_name = _("заметка")
         verbose_name_plural = _("заметки")
+        indexes = [
+            models.Index(fields=['author', 'note_status', 'created_at'], name='note_author_status_created_idx'),
+            models.Index(fields=['author', 'note_status', 'due_to'], name='note_author_status_due_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -62,9 +71,14 @@ class Comment(models.Model):
                                  choices=Rating.choices,
                                  verbose_name='Оценка')
 
+    objects = ShardedQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.get_rating_display()} : {self.author}"
 
     class Meta:
         verbose_name = _("комментарий")
         verbose_name_plural = _("комментарии")
+        indexes = [
+            models.Index(fields=['note_todo', 'rating'], name='comment_note_rating_idx'),
+        ]
@@ -0,0 +1,121 @@
+"""
+Быстрое удаление заметок и комментариев пакетами.
+
+Обычный delete() собирает все связанные объекты в память и отправляет сигналы
+для каждого из них. Здесь строки удаляются пакетами по первичному ключу
+(keyset: WHERE pk > последний удаленный ORDER BY pk LIMIT batch_size),
+каждый пакет в своей короткой транзакции, без загрузки моделей.
+Вместо pre_delete/post_delete после каждого пакета отправляются
+note_todo.signals.notes_purged и comments_purged.
+"""
+from django.db import router, transaction
+
+from . import sharding
+from .models import NoteToDo, Comment
+from .signals import notes_purged, comments_purged
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _batches(queryset, batch_size, fields=('pk',)):
+    """
+    Функция, перебирающая queryset пакетами по возрастанию первичного ключа
+    """
+    last_pk = None
+    while True:
+        batch_queryset = queryset.order_by('pk')
+        if last_pk is not None:
+            batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+        batch = list(batch_queryset.values_list(*fields)[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        yield batch
+
+
+def _write_db(queryset):
+    return queryset._db or router.db_for_write(queryset.model)
+
+
+def _delete_range(queryset, first_pk, last_pk, using):
+    """
+    Функция, удаляющая одним DELETE строки queryset в диапазоне первичных ключей пакета
+    """
+    with transaction.atomic(using=using):
+        return queryset.filter(pk__gte=first_pk, pk__lte=last_pk)._raw_delete(using)
+
+
+def purge_comments(queryset, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Функция, удаляющая комментарии пакетами
+    :param queryset: комментарии для удаления
+    :param batch_size: размер пакета
+    :param progress: функция progress(stage, deleted), вызывается после каждого пакета
+    :return: количество удаленных комментариев
+    """
+    using = _write_db(queryset)
+    queryset = queryset.using(using)
+    deleted = 0
+    for batch in _batches(queryset, batch_size, ('pk', 'note_todo_id')):
+        deleted += _delete_range(queryset, batch[0][0], batch[-1][0], using)
+        comments_purged.send(sender=Comment, note_ids={note_id for _, note_id in batch}, using=using)
+        if progress:
+            progress('comments', deleted)
+    return deleted
+
+
+def purge_notes(queryset, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Функция, удаляющая заметки вместе со всеми их комментариями пакетами
+    :param queryset: заметки для удаления
+    :param batch_size: размер пакета
+    :param progress: функция progress(stage, deleted), вызывается после каждого пакета
+    :return: словарь с количеством удаленных заметок и комментариев
+    """
+    using = _write_db(queryset)
+    queryset = queryset.using(using)
+    totals = {'notes': 0, 'comments': 0}
+    for batch in _batches(queryset, batch_size):
+        note_ids = [note_id for note_id, in batch]
+        comments = Comment.objects.using(using).filter(note_todo_id__in=note_ids)
+        for comment_batch in _batches(comments, batch_size):
+            totals['comments'] += _delete_range(comments, comment_batch[0][0], comment_batch[-1][0], using)
+            if progress:
+                progress('comments', totals['comments'])
+        with transaction.atomic(using=using):
+            # Комментарии, оставленные после удаления пакетов выше, удаляются в одной транзакции
+            # с заметками: иначе они нарушат внешний ключ или останутся без заметки
+            totals['comments'] += comments._raw_delete(using)
+            totals['notes'] += queryset.filter(pk__gte=note_ids[0], pk__lte=note_ids[-1])._raw_delete(using)
+        notes_purged.send(sender=NoteToDo, note_ids=note_ids, using=using)
+        if progress:
+            progress('notes', totals['notes'])
+    return totals
+
+
+def purge_author_comments(user, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Функция, удаляющая все комментарии пользователя: при шардировании они лежат
+    в шардах заметок, к которым оставлены, поэтому удаляются в каждой базе
+    :return: количество удаленных комментариев
+    """
+    return sum(purge_comments(Comment.objects.using(alias).filter(author=user), batch_size, progress)
+               for alias in sharding.databases())
+
+
+def purge_user(user, batch_size=DEFAULT_BATCH_SIZE, progress=None, delete_user=True):
+    """
+    Функция, удаляющая все комментарии и заметки пользователя, а затем и самого пользователя.
+    После удаления заметок и комментариев каскад в user.delete() уже ничего не загружает
+    :param user: пользователь
+    :param batch_size: размер пакета
+    :param progress: функция progress(stage, deleted)
+    :param delete_user: удалить ли пользователя после его данных
+    :return: словарь с количеством удаленных заметок и комментариев
+    """
+    comments = purge_author_comments(user, batch_size, progress)
+    totals = purge_notes(sharding.for_author(NoteToDo.objects.filter(author=user), user.pk), batch_size, progress)
+    totals['comments'] += comments
+    if delete_user:
+        user.delete()
+    return totals
@@ -0,0 +1,327 @@
+"""
+Генерация и загрузка больших объемов тестовых данных для нагрузочного тестирования.
+
+Строки генерируются кортежами в порядке колонок USER_COLUMNS, NOTE_COLUMNS и COMMENT_COLUMNS,
+первичные ключи назначаются заранее, поэтому комментарии можно генерировать,
+не читая из базы только что вставленные заметки.
+"""
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from bisect import bisect
+from itertools import accumulate, groupby, islice
+from operator import itemgetter
+
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+
+from .models import NoteToDo, Comment
+
+USER_COLUMNS = ('id', 'username', 'password', 'first_name', 'last_name', 'email',
+                'is_staff', 'is_active', 'is_superuser', 'date_joined', 'last_login')
+NOTE_COLUMNS = ('id', 'title', 'content', 'created_at', 'due_to', 'public',
+                'importance', 'author_id', 'note_status', 'version')
+COMMENT_COLUMNS = ('id', 'author_id', 'note_todo_id', 'rating')
+
+NOTE_STATUS_WEIGHTS = {
+    NoteToDo.NoteStatus.ACTIVE: 60,
+    NoteToDo.NoteStatus.EXECUTE: 30,
+    NoteToDo.NoteStatus.POSTPONED: 10,
+}
+RATING_WEIGHTS = {
+    Comment.Rating.WITHOUT_RATING: 30,
+    Comment.Rating.TERRIBLE: 4,
+    Comment.Rating.BADLY: 6,
+    Comment.Rating.FINE: 15,
+    Comment.Rating.GOOD: 25,
+    Comment.Rating.EXCELLENT: 20,
+}
+IMPORTANCE_SHARE = 0.3
+PUBLIC_SHARE = 0.2
+HISTORY_DAYS = 365
+DUE_TO_MEAN_DAYS = 7
+TEXT_POOL_SIZE = 4096
+
+WORDS = ('купить', 'позвонить', 'отчет', 'встреча', 'проект', 'молоко', 'врач', 'код',
+         'ревью', 'письмо', 'билеты', 'спорт', 'книга', 'счет', 'ремонт', 'экзамен')
+
+SEED_MODELS = {
+    'auth.user': (User, USER_COLUMNS),
+    'note_todo.notetodo': (NoteToDo, NOTE_COLUMNS),
+    'note_todo.comment': (Comment, COMMENT_COLUMNS),
+}
+
+
+def chunked(iterable, size):
+    """
+    Функция, разбивающая поток строк на списки не длиннее size
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def skewed_choice(rnd, items):
+    """
+    Функция, выбирающая элемент с перекосом к началу списка:
+    несколько активных авторов пишут большую часть заметок
+    """
+    return items[int(len(items) * rnd.random() ** 3)]
+
+
+def weighted_picker(rnd, weights):
+    """
+    Функция, возвращающая быстрый выбор ключа по весам: накопленные веса считаются один раз
+    """
+    keys = list(weights)
+    cumulative = list(accumulate(weights.values()))
+    total = cumulative[-1]
+    random = rnd.random
+    return lambda: keys[bisect(cumulative, random() * total)]
+
+
+def text_pool(rnd, size, min_words, max_words):
+    """
+    Функция, заранее генерирующая набор текстов, из которого потом выбираются заголовки и заметки
+    """
+    return [' '.join(rnd.choices(WORDS, k=rnd.randint(min_words, max_words))) for _ in range(size)]
+
+
+def user_rows(rnd, start_id, count, password, now):
+    for user_id in range(start_id, start_id + count):
+        joined = now - timedelta(days=rnd.uniform(0, HISTORY_DAYS))
+        yield (user_id, f'seed_user_{user_id}', password, '', '', f'seed_user_{user_id}@example.com',
+               False, True, False, joined, None)
+
+
+def note_rows(rnd, start_id, count, author_ids, now):
+    """
+    Даты создания растут вместе с идентификатором, как при обычной работе с auto_now_add,
+    интервалы между заметками распределены экспоненциально
+    """
+    random = rnd.random
+    expovariate = rnd.expovariate
+    pick_status = weighted_picker(rnd, NOTE_STATUS_WEIGHTS)
+    titles = text_pool(rnd, TEXT_POOL_SIZE, 1, 4)
+    contents = text_pool(rnd, TEXT_POOL_SIZE, 0, 30)
+    authors = len(author_ids)
+    mean_gap = HISTORY_DAYS * 86400 / max(count, 1)
+    created_at = now - timedelta(days=HISTORY_DAYS)
+    for note_id in range(start_id, start_id + count):
+        created_at = min(created_at + timedelta(seconds=expovariate(1 / mean_gap)), now)
+        due_to = created_at + timedelta(days=expovariate(1 / DUE_TO_MEAN_DAYS))
+        yield (note_id, titles[int(random() * TEXT_POOL_SIZE)], contents[int(random() * TEXT_POOL_SIZE)],
+               created_at, due_to, random() < PUBLIC_SHARE, random() < IMPORTANCE_SHARE,
+               author_ids[int(authors * random() ** 3)], pick_status(), 0)
+
+
+def comment_rows(rnd, start_id, count, note_ids, author_ids, block_size=100000):
+    """
+    Комментарии внутри блока упорядочены по заметке: идентификаторы растут вместе с note_todo_id,
+    и вставка в индексы по заметке идет почти последовательно, а не в случайные страницы
+    """
+    random = rnd.random
+    pick_rating = weighted_picker(rnd, RATING_WEIGHTS)
+    notes_count = len(note_ids)
+    authors = len(author_ids)
+    comment_id = start_id
+    for block_start in range(0, count, block_size):
+        block = min(block_size, count - block_start)
+        notes = sorted(note_ids[int(notes_count * random() ** 3)] for _ in range(block))
+        for note_id in notes:
+            yield (comment_id, author_ids[int(authors * random())], note_id, pick_rating())
+            comment_id += 1
+
+
+def next_id(model, using='default'):
+    last = model.objects.using(using).order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+@contextmanager
+def preserve_auto_now_add(model):
+    """
+    Контекстный менеджер, который временно отключает auto_now_add,
+    чтобы bulk_create сохранил сгенерированные даты создания
+    """
+    fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def bulk_load(model, columns, rows, chunk_size, using='default'):
+    """
+    Функция, загружающая строки через bulk_create, по транзакции на чанк
+    :return: количество загруженных строк
+    """
+    total = 0
+    with preserve_auto_now_add(model):
+        for chunk in chunked(rows, chunk_size):
+            objects = [model(**dict(zip(columns, row))) for row in chunk]
+            with transaction.atomic(using=using):
+                model.objects.using(using).bulk_create(objects, batch_size=chunk_size)
+            total += len(chunk)
+    return total
+
+
+def raw_load(model, columns, rows, chunk_size, using='default'):
+    """
+    Функция, загружающая строки напрямую через DB-API executemany, минуя ORM.
+    Работает только с SQLite. Даты хранятся так же, как их пишет Django: UTC без зоны.
+    Вся загрузка идет одной транзакцией: как и loaddata, функция отключает проверку внешних ключей
+    и проверяет их один раз в конце, а при ошибке откатывает все строки.
+    В пустую таблицу строки пишутся без вторичных индексов, индексы строятся после загрузки
+    :return: количество загруженных строк
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise NotImplementedError('Быстрая загрузка поддерживается только для SQLite')
+
+    opts = model._meta
+    db_columns = ', '.join(connection.ops.quote_name(opts.get_field(column).column) for column in columns)
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f'INSERT INTO {connection.ops.quote_name(opts.db_table)} ({db_columns}) VALUES ({placeholders})'
+    datetime_indexes = [index for index, column in enumerate(columns)
+                        if opts.get_field(column).get_internal_type() == 'DateTimeField']
+
+    total = 0
+    with _sqlite_bulk_pragmas(connection), connection.constraint_checks_disabled():
+        with transaction.atomic(using=using), _indexes_deferred(connection, opts.db_table):
+            for chunk in chunked(rows, chunk_size):
+                if datetime_indexes:
+                    chunk = [_adapt_datetimes(row, datetime_indexes) for row in chunk]
+                connection.connection.executemany(sql, chunk)
+                total += len(chunk)
+            connection.check_constraints(table_names=[opts.db_table])
+    return total
+
+
+@contextmanager
+def _indexes_deferred(connection, table):
+    """
+    Контекстный менеджер, который удаляет вторичные индексы пустой таблицы и создает их заново на выходе:
+    один проход по готовым данным быстрее, чем вставка каждой строки в несколько B-деревьев.
+    Для непустой таблицы перестройка индексов стоила бы дороже самой загрузки, и индексы не трогаются.
+    Должен работать внутри транзакции, чтобы при ошибке SQLite откатил и удаление индексов
+    """
+    raw = connection.connection
+    quoted = connection.ops.quote_name(table)
+    indexes = []
+    if raw.execute(f'SELECT 1 FROM {quoted} LIMIT 1').fetchone() is None:
+        # У индексов ограничений (unique, primary key) sql пустой, их удалить нельзя
+        indexes = raw.execute("SELECT name, sql FROM sqlite_master "
+                              "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)).fetchall()
+    for name, _ in indexes:
+        raw.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    yield
+    for _, sql in indexes:
+        raw.execute(sql)
+
+
+@contextmanager
+def _sqlite_bulk_pragmas(connection):
+    """
+    Контекстный менеджер, который на время загрузки отключает fsync после каждой транзакции,
+    держит журнал отката в памяти вместо файла и увеличивает кэш страниц,
+    чтобы индексы обновлялись в памяти
+    """
+    connection.ensure_connection()
+    if connection.in_atomic_block:
+        # Внутри внешней транзакции SQLite не дает менять synchronous и journal_mode
+        yield
+        return
+
+    raw = connection.connection
+    synchronous = raw.execute('PRAGMA synchronous').fetchone()[0]
+    cache_size = raw.execute('PRAGMA cache_size').fetchone()[0]
+    journal_mode = raw.execute('PRAGMA journal_mode').fetchone()[0]
+    raw.execute('PRAGMA synchronous = OFF')
+    raw.execute('PRAGMA cache_size = -131072')
+    # Из WAL выходить нельзя, пока базу открывают другие процессы
+    if journal_mode.lower() != 'wal':
+        raw.execute('PRAGMA journal_mode = MEMORY')
+    try:
+        yield
+    finally:
+        if journal_mode.lower() != 'wal':
+            raw.execute(f'PRAGMA journal_mode = {journal_mode}')
+        raw.execute(f'PRAGMA synchronous = {int(synchronous)}')
+        raw.execute(f'PRAGMA cache_size = {int(cache_size)}')
+
+
+def _adapt_datetimes(row, indexes):
+    row = list(row)
+    for index in indexes:
+        value = row[index]
+        if value is not None:
+            offset = value.utcoffset()
+            if offset is None:
+                row[index] = value.isoformat(' ')
+            else:
+                # Отрезаем суффикс +00:00 вместо дорогого replace(tzinfo=None);
+                # сгенерированные даты уже в UTC, и вычитать нулевое смещение не нужно
+                row[index] = (value - offset if offset else value).isoformat(' ')[:-6]
+    return row
+
+
+def dump_ndjson(stream, label, columns, rows):
+    """
+    Функция, записывающая строки в формате jsonl, совместимом с dumpdata --format jsonl
+    :return: количество записанных строк
+    """
+    model = SEED_MODELS[label][0]
+    names = [model._meta.get_field(column).name for column in columns]
+    total = 0
+    for row in rows:
+        fields = {name: value.isoformat() if isinstance(value, datetime) else value
+                  for name, value in zip(names[1:], row[1:])}
+        stream.write(json.dumps({'model': label, 'pk': row[0], 'fields': fields}, ensure_ascii=False))
+        stream.write('\n')
+        total += 1
+    return total
+
+
+def iter_ndjson(stream):
+    """
+    Функция, построчно читающая jsonl дамп и возвращающая пары (label, row)
+    без загрузки всего файла в память. Модели вне SEED_MODELS пропускаются
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        label = record['model']
+        if label not in SEED_MODELS:
+            continue
+        model, columns = SEED_MODELS[label]
+        fields = record['fields']
+        row = [record['pk']]
+        for column in columns[1:]:
+            field = model._meta.get_field(column)
+            row.append(field.to_python(fields.get(field.name, field.get_default())))
+        yield label, tuple(row)
+
+
+def load_ndjson(stream, loader, chunk_size, using='default'):
+    """
+    Функция, загружающая jsonl дамп чанками. Дамп должен идти в порядке зависимостей
+    (пользователи, заметки, комментарии), как его пишет dumpdata.
+    Строки подряд идущих записей одной модели передаются загрузчику одним потоком,
+    чтобы он загрузил их одной транзакцией, а не по транзакции на чанк
+    :return: словарь {label: количество строк}
+    """
+    totals = {}
+    for label, records in groupby(iter_ndjson(stream), key=itemgetter(0)):
+        model, columns = SEED_MODELS[label]
+        rows = (row for _, row in records)
+        totals[label] = totals.get(label, 0) + loader(model, columns, rows, chunk_size, using)
+    return totals
@@ -0,0 +1,349 @@
+"""
+Шардирование заметок и комментариев по автору.
+
+Включается настройкой NOTE_TODO_SHARDS - списком псевдонимов баз из DATABASES.
+Заметка живет в шарде своего автора (author_id % количество шардов), комментарий -
+в шарде своей заметки, поэтому каждая запись в NoteToDo и Comment идет в один файл
+SQLite и блокирует только его. Пользователи хранятся в default и копируются в каждый шард,
+чтобы работали внешние ключи и select_related('author').
+
+Чтение по автору идет в один шард (for_author), чтение по первичному ключу - сначала
+в "домашний" шард из диапазона ключа (у каждого шарда свой диапазон по PK_RANGE),
+а чтение по всем авторам (scatter) выполняет запрос в каждом шарде
+и сливает уже отсортированные результаты в порядке order_by запроса.
+
+После изменения списка шардов записи переносит команда rebalance_shards.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.db.models import F, OrderBy
+from django.http import Http404
+from django.shortcuts import get_object_or_404 as django_get_object_or_404
+
+SHARDED_MODELS = {'note_todo.NoteToDo', 'note_todo.Comment'}
+# Приложения, таблицы которых создаются в шардах
+SHARD_APPS = {'auth', 'contenttypes', 'note_todo'}
+# Ключи шарда i начинаются с (i + 1) * PK_RANGE; ключи ниже PK_RANGE остаются
+# у заметок, созданных до шардирования в default
+PK_RANGE = 10 ** 12
+
+
+def shards():
+    return list(getattr(settings, 'NOTE_TODO_SHARDS', None) or [])
+
+
+def is_enabled():
+    return bool(getattr(settings, 'NOTE_TODO_SHARDS', None))
+
+
+def databases():
+    """
+    Функция, возвращающая базы, в которых хранятся заметки
+    """
+    return shards() or [DEFAULT_DB_ALIAS]
+
+
+def shard_for_author(author_id):
+    aliases = shards()
+    return aliases[author_id % len(aliases)]
+
+
+def candidates_for_pk(pk):
+    """
+    Функция, возвращающая шарды в порядке поиска записи по первичному ключу:
+    сначала шард, выдавший этот ключ, затем остальные (запись могла переехать при ребалансировке)
+    """
+    aliases = shards()
+    home = pk // PK_RANGE - 1
+    if 0 <= home < len(aliases):
+        return [aliases[home]] + aliases[:home] + aliases[home + 1:]
+    return aliases
+
+
+def for_author(queryset, author_id):
+    """
+    Функция, направляющая queryset в шард автора
+    """
+    return queryset.using(shard_for_author(author_id)) if is_enabled() else queryset
+
+
+def find(queryset, pk):
+    """
+    Функция, ищущая запись по первичному ключу во всех шардах
+    :param queryset: queryset заметок или комментариев
+    :param pk: первичный ключ
+    :return: запись, загруженная из своего шарда, или None
+    """
+    for alias in candidates_for_pk(pk):
+        obj = queryset.using(alias).filter(pk=pk).first()
+        if obj is not None:
+            return obj
+    return None
+
+
+def get_object_or_404(queryset, pk):
+    if not is_enabled():
+        return django_get_object_or_404(queryset, pk=pk)
+    try:
+        obj = find(queryset, int(pk))
+    except (TypeError, ValueError):
+        obj = None
+    if obj is None:
+        raise Http404
+    return obj
+
+
+class _Descending:
+    """
+    Класс, обращающий сравнение значения для слияния по убыванию
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def _ordering(queryset):
+    if queryset.query.order_by:
+        return list(queryset.query.order_by)
+    if queryset.query.default_ordering:
+        return list(queryset.model._meta.ordering)
+    return []
+
+
+def scatter(queryset):
+    """
+    Функция, выполняющая queryset в каждом шарде и сливающая результаты.
+    Каждое выражение order_by добавляется в запрос аннотацией, по значениям которой
+    результаты сливаются; NULL сравниваются так же, как в SQLite (первыми по возрастанию).
+    Срез queryset применяется к каждому шарду и к результату слияния
+    :param queryset: queryset моделей
+    :return: итератор по объектам
+    """
+    if not is_enabled():
+        return iter(queryset)
+
+    low, high = queryset.query.low_mark, queryset.query.high_mark
+    queryset = queryset._chain()
+    queryset.query.clear_limits()
+
+    keys = []
+    for position, item in enumerate(_ordering(queryset)):
+        if item == '?':
+            continue
+        if isinstance(item, str):
+            descending = item.startswith('-')
+            expression, nulls_first = F(item.lstrip('-')), not descending
+        else:
+            item = item if isinstance(item, OrderBy) else item.asc()
+            descending, expression = item.descending, item.expression
+            nulls_first = item.nulls_first or (not descending and not item.nulls_last)
+        name = f'_scatter_order_{position}'
+        queryset = queryset.annotate(**{name: expression})
+        keys.append((name, descending, nulls_first != descending))
+
+    def key(obj):
+        values = []
+        for name, descending, none_low in keys:
+            value = getattr(obj, name)
+            value = ((0 if none_low else 2) if value is None else 1, value)
+            values.append(_Descending(value) if descending else value)
+        return values
+
+    if high is not None:
+        queryset = queryset[:high]
+    results = [list(queryset.using(alias)) for alias in shards()]
+    merged = heapq.merge(*results, key=key) if keys else (obj for result in results for obj in result)
+    return islice(merged, low, high)
+
+
+class ShardedQuerySet(models.QuerySet):
+    """
+    Класс queryset заметок и комментариев: create() и bulk_create() без явной базы
+    раскладывают записи по шардам роутером, как save()
+    """
+    def create(self, **kwargs):
+        if self._db is not None or not is_enabled():
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if self._db is not None or not is_enabled():
+            return super().bulk_create(objs, *args, **kwargs)
+        objs = list(objs)
+        grouped = {}
+        for obj in objs:
+            grouped.setdefault(router.db_for_write(self.model, instance=obj), []).append(obj)
+        for alias, group in grouped.items():
+            super(ShardedQuerySet, self.using(alias)).bulk_create(group, *args, **kwargs)
+        return objs
+
+
+class AuthorShardRouter:
+    """
+    Класс роутера, направляющий заметки в шард автора, а комментарии - в шард заметки.
+    Без NOTE_TODO_SHARDS ни во что не вмешивается
+    """
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        labels = {obj1._meta.label, obj2._meta.label}
+        if is_enabled() and labels <= SHARDED_MODELS | {settings.AUTH_USER_MODEL}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in shards():
+            return app_label in SHARD_APPS
+        return None
+
+    def _route(self, model, instance):
+        if instance is None or model._meta.label not in SHARDED_MODELS or not is_enabled():
+            return None
+        if instance._state.db in shards() and not instance._state.adding:
+            return instance._state.db
+        label = instance._meta.label
+        if label == 'note_todo.NoteToDo':
+            return shard_for_author(instance.author_id) if instance.author_id is not None else None
+        if label == 'note_todo.Comment':
+            note_field = instance._meta.get_field('note_todo')
+            if note_field.is_cached(instance):
+                return self._route(model, note_field.get_cached_value(instance))
+            if instance.note_todo_id is not None:
+                note = find(note_field.related_model._base_manager.all(), instance.note_todo_id)
+                return note._state.db if note is not None else None
+            return None
+        if label == settings.AUTH_USER_MODEL and model._meta.label == 'note_todo.NoteToDo':
+            return shard_for_author(instance.pk)
+        return None
+
+
+def _user_fields(user):
+    return {field.attname: getattr(user, field.attname) for field in user._meta.concrete_fields}
+
+
+def mirror_users(alias, batch_size=500):
+    """
+    Функция, копирующая в шард пользователей, которых там еще нет
+    :param alias: шард
+    :return: количество скопированных пользователей
+    """
+    User = get_user_model()
+    existing = set(User.objects.using(alias).values_list('pk', flat=True))
+    missing = [user for user in User.objects.using(DEFAULT_DB_ALIAS).order_by('pk') if user.pk not in existing]
+    User.objects.using(alias).bulk_create([User(**_user_fields(user)) for user in missing],
+                                          batch_size=batch_size, ignore_conflicts=True)
+    return len(missing)
+
+
+def seed_pk_range(alias):
+    """
+    Функция, сдвигающая автоинкремент таблиц заметок и комментариев шарда в его диапазон ключей.
+    Нужна только SQLite: в других базах диапазоны задаются последовательностями вручную
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite' or alias not in shards():
+        return
+    floor = (shards().index(alias) + 1) * PK_RANGE
+    from .models import NoteToDo, Comment
+    with connection.cursor() as cursor:
+        for model in (NoteToDo, Comment):
+            table = model._meta.db_table
+            cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s', [floor, table, floor])
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                           'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)', [table, floor, table])
+
+
+def user_saved(sender, instance, using, update_fields=None, raw=False, **kwargs):
+    # Время входа в шардах не нужно, а меняется при каждом логине
+    if using != DEFAULT_DB_ALIAS or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    fields = _user_fields(instance)
+    for alias in shards():
+        if not sender.objects.using(alias).filter(pk=instance.pk).update(**fields):
+            sender.objects.using(alias).bulk_create([sender(**fields)], ignore_conflicts=True)
+
+
+def user_deleted(sender, instance, using, **kwargs):
+    # delete() в шарде искал бы связанные записи в таблицах, которых в шарде нет,
+    # поэтому данные пользователя удаляются пакетами, а сам он - одним DELETE
+    if using != DEFAULT_DB_ALIAS:
+        return
+    from . import purge
+    from .models import NoteToDo, Comment
+    for alias in shards():
+        purge.purge_comments(Comment.objects.using(alias).filter(author_id=instance.pk))
+        purge.purge_notes(NoteToDo.objects.using(alias).filter(author_id=instance.pk))
+        sender.objects.using(alias).filter(pk=instance.pk)._raw_delete(alias)
+
+
+def shard_migrated(sender, using, **kwargs):
+    if using in shards():
+        seed_pk_range(using)
+        mirror_users(using)
+
+
+def _copy(model, objs, alias):
+    """
+    Функция, вставляющая записи в базу как есть: с теми же первичными ключами и без pre_save,
+    который перезаписал бы auto_now_add. Уже существующие ключи пропускаются,
+    поэтому прерванный перенос можно повторить
+    """
+    fields = model._meta.local_concrete_fields
+    batch_size = max(connections[alias].ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), batch_size):
+        model._base_manager._insert(objs[start:start + batch_size], fields=fields, using=alias,
+                                    raw=True, ignore_conflicts=True)
+
+
+def rebalance(source, batch_size=500, dry_run=False):
+    """
+    Функция, переносящая из базы source заметки, чей шард по автору - другой, вместе с комментариями.
+    Пакет сначала копируется в новый шард в транзакции, а затем удаляется из source
+    :param source: псевдоним базы, в которой лежат заметки
+    :param batch_size: размер пакета
+    :param dry_run: только посчитать
+    :return: словарь шард -> количество перенесенных в него заметок
+    """
+    from . import purge
+    from .models import NoteToDo, Comment
+
+    moved = {}
+    notes = NoteToDo._base_manager.using(source).order_by('pk')
+    last_pk = None
+    while True:
+        batch_queryset = notes if last_pk is None else notes.filter(pk__gt=last_pk)
+        batch = list(batch_queryset.values_list('pk', 'author_id')[:batch_size])
+        if not batch:
+            return moved
+        last_pk = batch[-1][0]
+
+        grouped = {}
+        for pk, author_id in batch:
+            target = shard_for_author(author_id)
+            if target != source:
+                grouped.setdefault(target, []).append(pk)
+        for target, pks in grouped.items():
+            moved[target] = moved.get(target, 0) + len(pks)
+            if dry_run:
+                continue
+            with transaction.atomic(using=target):
+                _copy(NoteToDo, list(NoteToDo._base_manager.using(source).filter(pk__in=pks)), target)
+                _copy(Comment, list(Comment._base_manager.using(source).filter(note_todo_id__in=pks)), target)
+            purge.purge_notes(NoteToDo.objects.using(source).filter(pk__in=pks), batch_size)
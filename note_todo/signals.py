@@ -0,0 +1,14 @@
+from django.dispatch import Signal
+
+# Отправляются после каждого пакета быстрого удаления (note_todo.purge).
+# Обычные pre_delete/post_delete при этом не вызываются, поэтому кэши и агрегаты,
+# зависящие от заметок и комментариев, должны подписываться и на эти сигналы.
+# Аргументы: note_ids - идентификаторы удаленных заметок или заметок, у которых удалены комментарии,
+# using - алиас базы данных
+notes_purged = Signal()
+comments_purged = Signal()
+
+# Отправляется после изменения заметок или комментариев в обход post_save
+# (QuerySet.update, bulk_create). Аргументы: note_ids - заметки, которые могли измениться
+# в публичной ленте, или None, если они неизвестны; using - алиас базы данных
+notes_changed = Signal()
@@ -1,3 +1,198 @@
+import io
+import os
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.db.models import F
+from . import admin, purge, seed
+from .models import NoteToDo, Comment
+from .signals import notes_purged
 
-# Create your tests here.
+
+class TestNoteToDoAdmin(TestCase):
+    """
+    Тестирование страниц списков заметок и комментариев в админке
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(username="admin", password="admin")
+        for index in range(5):
+            author = User.objects.create(username=f"author_{index}")
+            note = NoteToDo.objects.create(title=f"Test_title_{index}", author=author)
+            Comment.objects.create(author=author, note_todo=note, rating=Comment.Rating.GOOD)
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """
+        Функция тестирования того, что авторы подгружаются одним запросом, а не по одному на строку
+        """
+        url = "/admin/note_todo/notetodo/"
+        queries = self._count_queries(url)
+
+        for index in range(5):
+            NoteToDo.objects.create(title=f"extra_{index}", author=User.objects.create(username=f"extra_{index}"))
+        self.assertEqual(queries, self._count_queries(url))
+
+    def test_author_filter(self):
+        """
+        Функция тестирования фильтра по автору с автодополнением
+        """
+        author = User.objects.get(username="author_1")
+        resp = self.client.get(f"/admin/note_todo/notetodo/?author__id__exact={author.pk}")
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(1, resp.context['cl'].result_count)
+        self.assertContains(resp, 'admin-autocomplete')
+
+    def test_comment_changelist(self):
+        """
+        Функция тестирования списка комментариев с фильтрами по заметке и автору
+        """
+        note = NoteToDo.objects.get(title="Test_title_2")
+        resp = self.client.get(f"/admin/note_todo/comment/?note_todo__id__exact={note.pk}")
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(1, resp.context['cl'].result_count)
+
+    def test_estimated_count(self):
+        """
+        Функция тестирования точного количества для небольшой таблицы и приблизительного для большой
+        """
+        NoteToDo.objects.filter(title="Test_title_2").delete()
+        url = "/admin/note_todo/notetodo/"
+        resp = self.client.get(url)
+        self.assertEqual(4, resp.context['cl'].result_count)
+        self.assertFalse(resp.context['cl'].paginator.estimated)
+
+        with mock.patch.object(admin.EstimatedCountPaginator, 'EXACT_COUNT_LIMIT', 2):
+            resp = self.client.get(url)
+        self.assertEqual(5, resp.context['cl'].result_count)
+        self.assertContains(resp, '~5 ')
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            resp = self.client.get(url)
+        self.assertEqual(200, resp.status_code)
+        return len(context.captured_queries)
+
+
+class TestSeedNotesCommand(TestCase):
+    """
+    Тестирование команды генерации тестовых данных
+    """
+    def test_fast_and_orm_loaders(self):
+        """
+        Функция тестирования загрузки через ORM и через быстрый путь
+        """
+        call_command('seed_notes', users=3, notes=20, comments=50, stderr=io.StringIO())
+        call_command('seed_notes', users=3, notes=20, comments=50, fast=True, stderr=io.StringIO())
+
+        self.assertEqual(6, User.objects.filter(username__startswith='seed_user_').count())
+        self.assertEqual(40, NoteToDo.objects.count())
+        self.assertEqual(100, Comment.objects.count())
+        self.assertFalse(NoteToDo.objects.filter(created_at__gt=F('due_to')).exists())
+
+    def test_dump_is_deterministic_and_loadable(self):
+        """
+        Функция тестирования детерминированного дампа и его потоковой загрузки
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f'dump_{index}.jsonl') for index in range(2)]
+            for path in paths:
+                call_command('seed_notes', users=2, notes=10, comments=30, seed=7, dump=path,
+                             now=datetime(2022, 6, 1, tzinfo=timezone.utc), stderr=io.StringIO())
+            with open(paths[0], encoding='utf-8') as first, open(paths[1], encoding='utf-8') as second:
+                first_lines, second_lines = first.readlines(), second.readlines()
+            self.assertEqual(first_lines, second_lines)
+
+            call_command('seed_notes', load=paths[0], fast=True, stderr=io.StringIO())
+
+        self.assertEqual(10, NoteToDo.objects.count())
+        self.assertEqual(30, Comment.objects.count())
+
+    def test_fast_load_is_atomic_and_keeps_indexes(self):
+        """
+        Функция тестирования быстрой загрузки: битый внешний ключ откатывает все строки,
+        а индексы, снятые на время загрузки, возвращаются
+        """
+        table = Comment._meta.db_table
+        indexes = self._indexes(table)
+        user = User.objects.create(username='seed_author')
+        note = NoteToDo.objects.create(title='note', author=user)
+        rows = [(1, user.pk, note.pk, 0), (2, user.pk, note.pk + 1000, 0)]
+
+        with self.assertRaises(IntegrityError):
+            seed.raw_load(Comment, seed.COMMENT_COLUMNS, rows, chunk_size=1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(indexes, self._indexes(table))
+
+        self.assertEqual(1, seed.raw_load(Comment, seed.COMMENT_COLUMNS, rows[:1], chunk_size=1))
+        self.assertEqual(1, Comment.objects.count())
+        self.assertEqual(indexes, self._indexes(table))
+
+    def _indexes(self, table):
+        with connection.cursor() as cursor:
+            return sorted(connection.introspection.get_constraints(cursor, table))
+
+
+class TestPurge(TestCase):
+    """
+    Тестирование пакетного удаления данных пользователя
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="heavy_user")
+        other = User.objects.create(username="other_user")
+        other_note = NoteToDo.objects.create(title="other", author=other)
+        for index in range(7):
+            note = NoteToDo.objects.create(title=f"note_{index}", author=cls.user)
+            Comment.objects.create(author=other, note_todo=note)
+            Comment.objects.create(author=cls.user, note_todo=other_note)
+
+    def test_purge_user_in_batches(self):
+        """
+        Функция тестирования удаления пользователя маленькими пакетами с сигналами и прогрессом
+        """
+        purged_notes = []
+        progress = []
+
+        def receiver(note_ids, **kwargs):
+            purged_notes.extend(note_ids)
+
+        notes_purged.connect(receiver)
+        self.addCleanup(notes_purged.disconnect, receiver)
+
+        totals = purge.purge_user(self.user, batch_size=3, progress=lambda *args: progress.append(args))
+
+        self.assertEqual({'notes': 7, 'comments': 14}, totals)
+        self.assertEqual(7, len(purged_notes))
+        self.assertEqual(('notes', 7), progress[-1])
+        self.assertFalse(User.objects.filter(username="heavy_user").exists())
+        self.assertEqual(1, NoteToDo.objects.count())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_added_during_purge(self):
+        """
+        Функция тестирования того, что комментарий, добавленный между пакетами, удаляется вместе с заметкой
+        """
+        notes = NoteToDo.objects.filter(author=self.user)
+        first_note = notes.order_by('pk').first()
+        first_comment_pk = Comment.objects.filter(note_todo=first_note).get().pk
+        added = []
+
+        def progress(stage, deleted):
+            # Пакеты комментариев идут по возрастанию pk: комментарий с уже пройденным pk
+            # они не увидят, а заметка еще не удалена
+            if stage == 'comments' and not added:
+                added.append(Comment.objects.create(pk=first_comment_pk, author=self.user, note_todo=first_note))
+
+        totals = purge.purge_notes(notes, batch_size=3, progress=progress)
+
+        self.assertEqual({'notes': 7, 'comments': 8}, totals)
+        self.assertFalse(Comment.objects.filter(note_todo__author=self.user).exists())
+        self.assertFalse(Comment.objects.exclude(note_todo__in=NoteToDo.objects.all()).exists())
@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'author', 'run_after', 'finished_at')
+    list_filter = ('status', 'name')
+    list_select_related = ('author',)
+    raw_id_fields = ('author',)
+    ordering = ('-pk',)
@@ -4,3 +4,28 @@ from django.apps import AppConfig
 class NoteTodoApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'note_todo_api'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+
+        from note_todo.models import NoteToDo, Comment
+        from note_todo.signals import notes_changed, notes_purged, comments_purged
+        from . import coalescing, snapshots
+
+        post_save.connect(snapshots.note_changed, sender=NoteToDo, dispatch_uid='public_feed_note_saved')
+        post_delete.connect(snapshots.note_changed, sender=NoteToDo, dispatch_uid='public_feed_note_deleted')
+        post_save.connect(snapshots.comment_changed, sender=Comment, dispatch_uid='public_feed_comment_saved')
+        post_delete.connect(snapshots.comment_changed, sender=Comment, dispatch_uid='public_feed_comment_deleted')
+        post_save.connect(snapshots.author_changed, sender=get_user_model(), dispatch_uid='public_feed_author_saved')
+        notes_purged.connect(snapshots.notes_purged, dispatch_uid='public_feed_notes_purged')
+        comments_purged.connect(snapshots.notes_purged, dispatch_uid='public_feed_comments_purged')
+        notes_changed.connect(snapshots.notes_changed, dispatch_uid='public_feed_notes_changed')
+
+        for model in (NoteToDo, Comment, get_user_model()):
+            post_save.connect(coalescing.data_changed, sender=model, dispatch_uid=f'coalescing_{model.__name__}_saved')
+            post_delete.connect(coalescing.data_changed, sender=model,
+                                dispatch_uid=f'coalescing_{model.__name__}_deleted')
+        notes_purged.connect(coalescing.data_changed, dispatch_uid='coalescing_notes_purged')
+        comments_purged.connect(coalescing.data_changed, dispatch_uid='coalescing_comments_purged')
+        notes_changed.connect(coalescing.data_changed, dispatch_uid='coalescing_notes_changed')
@@ -0,0 +1,199 @@
+"""
+Групповая запись комментариев.
+
+Оценки ставятся всплесками, и вставка каждого комментария отдельной транзакцией
+упирается в блокировку записи и fsync SQLite. Здесь запросы кладут комментарий в очередь
+и ждут свой Future, а поток записи собирает комментарии в течение COMMENT_BATCH_MAX_DELAY
+секунд или до COMMENT_BATCH_MAX_SIZE штук и вставляет их одной транзакцией.
+
+Средний рейтинг заметок считается в той же транзакции, поэтому каждый запрос получает
+значение, в которое уже вошел его комментарий. Ошибку получает только тот запрос,
+чей комментарий не удалось записать: комментарии к несуществующим заметкам отсеиваются
+до вставки, а если транзакция пакета все же не прошла, комментарии вставляются по одному.
+
+Пакеты собираются внутри процесса, поэтому выигрыш есть у многопоточного сервера.
+Без COMMENT_BATCHING комментарий записывается тем же кодом сразу в потоке запроса.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, router, transaction
+from django.db.models import Avg
+
+from note_todo.models import NoteToDo, Comment
+from note_todo.signals import notes_changed
+
+# Через сколько секунд простоя поток записи закрывает свои соединения с базой
+IDLE_TIMEOUT = 1.0
+
+
+def rating_averages(alias, note_ids):
+    """
+    Функция, возвращающая средний рейтинг заметок так же, как filters.rating_avg_annotate
+    :return: словарь id заметки -> средний рейтинг
+    """
+    return dict(
+        Comment.objects.using(alias).filter(note_todo_id__in=note_ids)
+        .exclude(rating=Comment.Rating.WITHOUT_RATING)
+        .order_by().values('note_todo').annotate(avg=Avg('rating')).values_list('note_todo', 'avg')
+    )
+
+
+def insert(alias, items):
+    """
+    Функция, вставляющая комментарии одной транзакцией и раздающая результаты.
+    Комментарии к несуществующим заметкам получают NoteToDo.DoesNotExist и не мешают остальным;
+    внешний ключ SQLite проверяется только при коммите внешней транзакции, поэтому заметки
+    проверяются явно одним запросом на пакет
+    :param alias: база
+    :param items: список пар (несохраненный комментарий, Future)
+    """
+    note_ids = {comment.note_todo_id for comment, _ in items}
+    with transaction.atomic(using=alias):
+        existing = set(NoteToDo.objects.using(alias).filter(pk__in=note_ids).values_list('pk', flat=True))
+        accepted = [(comment, future) for comment, future in items if comment.note_todo_id in existing]
+        Comment.objects.using(alias).bulk_create([comment for comment, _ in accepted])
+        averages = rating_averages(alias, existing)
+    # bulk_create не отправляет post_save
+    if accepted:
+        notes_changed.send(sender=Comment, note_ids={comment.note_todo_id for comment, _ in accepted}, using=alias)
+
+    for comment, future in items:
+        if comment.note_todo_id in existing:
+            comment.rating_avg = averages.get(comment.note_todo_id)
+            future.set_result(comment)
+        else:
+            future.set_exception(NoteToDo.DoesNotExist(f'Заметка {comment.note_todo_id} не найдена'))
+
+
+def write_batch(batch):
+    """
+    Функция, записывающая пакет: каждый Future получает свой комментарий или ошибку
+    :param batch: список пар (комментарий, Future)
+    """
+    grouped = {}
+    for comment, future in batch:
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            alias = router.db_for_write(Comment, instance=comment) or DEFAULT_DB_ALIAS
+        except Exception as exc:
+            future.set_exception(exc)
+            continue
+        grouped.setdefault(alias, []).append((comment, future))
+
+    for alias, items in grouped.items():
+        try:
+            insert(alias, items)
+        except IntegrityError:
+            # Заметку удалили между проверкой и коммитом: записываем по одному
+            for comment, future in items:
+                comment.pk = None
+                comment._state.adding = True
+                try:
+                    insert(alias, [(comment, future)])
+                except Exception as exc:
+                    future.set_exception(exc)
+        except Exception as exc:
+            for _, future in items:
+                future.set_exception(exc)
+
+
+class CommentBatcher:
+    """
+    Класс очереди комментариев с потоком, который записывает их пакетами
+    """
+    def __init__(self, max_size, max_delay):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.queue = None
+        self.thread = None
+        self.pid = None
+
+    def submit(self, comment):
+        """
+        Функция, ставящая комментарий в очередь
+        :return: Future с сохраненным комментарием
+        """
+        future = Future()
+        self._ensure_thread().put((comment, future))
+        return future
+
+    def _ensure_thread(self):
+        # После fork потока записи в процессе нет, а очередь принадлежит родителю
+        with self.lock:
+            if self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.queue = queue.SimpleQueue()
+                self.thread = threading.Thread(target=self._run, args=(self.queue,),
+                                               name='comment-batcher', daemon=True)
+                self.thread.start()
+            return self.queue
+
+    def _run(self, items):
+        while True:
+            try:
+                batch = [items.get(timeout=IDLE_TIMEOUT)]
+            except queue.Empty:
+                connections.close_all()
+                continue
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(items.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            write_batch(batch)
+
+
+_batcher = None
+
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        _batcher = CommentBatcher(getattr(settings, 'COMMENT_BATCH_MAX_SIZE', 100),
+                                  getattr(settings, 'COMMENT_BATCH_MAX_DELAY', 0.005))
+    return _batcher
+
+
+def wait_timeout(comment):
+    """
+    Функция, возвращающая, сколько запрос ждет записи комментария: несколько окон сбора пакета
+    и два ожидания блокировки базы (timeout SQLite, по умолчанию 5 c) - предыдущего пакета и своего
+    :param comment: несохраненный комментарий
+    :return: время ожидания, c
+    """
+    alias = router.db_for_write(Comment, instance=comment) or DEFAULT_DB_ALIAS
+    db_timeout = connections[alias].settings_dict.get('OPTIONS', {}).get('timeout', 5)
+    return 3 * getattr(settings, 'COMMENT_BATCH_MAX_DELAY', 0.005) + 2 * db_timeout
+
+
+def save_comment(comment, timeout=None):
+    """
+    Функция, сохраняющая комментарий в пакете вместе с другими и ждущая результата.
+    Если комментарий не записан за timeout, он снимается с очереди (если его запись еще не началась)
+    и поднимается TimeoutError
+    :param comment: несохраненный комментарий
+    :param timeout: сколько ждать записи, c, по умолчанию wait_timeout
+    :return: сохраненный комментарий с полем rating_avg
+    """
+    if getattr(settings, 'COMMENT_BATCHING', False):
+        future = get_batcher().submit(comment)
+        try:
+            return future.result(wait_timeout(comment) if timeout is None else timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise
+    future = Future()
+    write_batch([(comment, future)])
+    return future.result()
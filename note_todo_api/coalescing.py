@@ -0,0 +1,182 @@
+"""
+Объединение одинаковых одновременных GET-запросов (single-flight).
+
+Когда популярную заметку или ленту публичных заметок одновременно запрашивает много
+клиентов, каждый запрос выполняет одни и те же запросы к базе. CoalescingMiddleware
+выполняет представление только для первого запроса (ведущего), а запросы с тем же ключом,
+пришедшие, пока он выполняется, ждут его и получают копию его ответа.
+
+Объединяются только GET и HEAD представлений с атрибутом coalesce_scope:
+
+* PUBLIC - ответ одинаков для всех: ключ - представление, путь, параметры,
+  заголовки Accept и Authorization (с неверным паролем DRF отвечает ошибкой);
+* USER - ответ зависит от пользователя: к ключу добавляется кука сессии.
+
+Браузерный API DRF показывает имя пользователя и CSRF-токен, поэтому запросы,
+принимающие text/html, не объединяются. Не делятся и ответы, которые ставят куки или
+отдаются потоком: ожидавшие запросы тогда выполняются сами.
+
+После изменения заметок, комментариев или пользователей новые запросы не присоединяются
+к уже начатым, чтобы не получить данные, прочитанные до изменения.
+Ожидание работает и в потоках WSGI-сервера, и в событийном цикле ASGI: ожидающий
+запрос под ASGI не занимает поток, в котором Django выполняет синхронные представления.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+PUBLIC = 'public'
+USER = 'user'
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Номер изменения данных: входит в ключ, поэтому после записи начинается новый ведущий запрос
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def data_changed(**kwargs):
+    """
+    Функция-приемник сигналов об изменении заметок, комментариев и пользователей.
+    Подключается только к сигналам (note_todo_api.apps), поэтому срабатывает один раз на запись
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def request_key(request):
+    """
+    Функция, возвращающая ключ объединения запроса
+    :param request: запрос
+    :return: ключ или None, если запрос нужно выполнить отдельно
+    """
+    if request.method not in SAFE_METHODS:
+        return None
+    accept = request.headers.get('Accept', '')
+    if 'text/html' in accept or request.GET.get('format', 'json') != 'json':
+        return None
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return None
+    scope = getattr(getattr(match.func, 'view_class', match.func), 'coalesce_scope', None)
+    if scope is None:
+        return None
+
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '') if scope == USER else ''
+    params = tuple(sorted((name, tuple(values)) for name, values in request.GET.lists()))
+    return (_generation, match._func_path, request.method, request.path_info, params,
+            accept, request.headers.get('Authorization', ''), session)
+
+
+def freeze(response):
+    """
+    Функция, сохраняющая ответ ведущего запроса для остальных
+    :return: (содержимое, код, причина, заголовки) или None, если ответ нельзя отдать другим
+    """
+    if response.streaming or response.cookies:
+        return None
+    return response.content, response.status_code, response.reason_phrase, dict(response.headers)
+
+
+def thaw(frozen):
+    content, status, reason, headers = frozen
+    return HttpResponse(content, status=status, reason=reason, headers=headers)
+
+
+class Flight:
+    """
+    Класс выполняющегося ведущего запроса. Результат передается через concurrent.futures.Future:
+    его можно ждать и из потока, и из событийного цикла, в том числе из другого цикла -
+    Django выполняет асинхронную часть цепочки middleware в отдельном цикле,
+    если выше нее стоит синхронное middleware
+    """
+    def __init__(self):
+        self.future = Future()
+        # Выполняющийся Future нельзя отменить, поэтому отмена ожидающего запроса не отменит общий результат
+        self.future.set_running_or_notify_cancel()
+        self.followers = 0
+
+
+class Flights:
+    """
+    Класс таблицы выполняющихся ведущих запросов
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def join(self, key):
+        """
+        Функция, присоединяющая запрос к выполняющемуся с тем же ключом или делающая его ведущим
+        :return: (полет, True для ведущего)
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                return flight, False
+            flight = self.flights[key] = Flight()
+            return flight, True
+
+    def land(self, key, flight, response):
+        """
+        Функция, отдающая ответ ведущего ожидающим запросам
+        :param response: ответ или None, если ведущий запрос завершился исключением
+        """
+        with self.lock:
+            del self.flights[key]
+        flight.future.set_result(None if response is None else freeze(response))
+
+
+@sync_and_async_middleware
+def CoalescingMiddleware(get_response):
+    """
+    Middleware, объединяющее одинаковые одновременные запросы к отмеченным представлениям.
+    Без REQUEST_COALESCING не подключается
+    """
+    if not getattr(settings, 'REQUEST_COALESCING', False):
+        raise MiddlewareNotUsed
+    flights = Flights()
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            key = request_key(request)
+            if key is None:
+                return await get_response(request)
+            flight, leader = flights.join(key)
+            if leader:
+                response = None
+                try:
+                    response = await get_response(request)
+                    return response
+                finally:
+                    flights.land(key, flight, response)
+
+            result = await asyncio.wrap_future(flight.future)
+            return await get_response(request) if result is None else thaw(result)
+    else:
+        def middleware(request):
+            key = request_key(request)
+            if key is None:
+                return get_response(request)
+            flight, leader = flights.join(key)
+            if leader:
+                response = None
+                try:
+                    response = get_response(request)
+                    return response
+                finally:
+                    flights.land(key, flight, response)
+
+            result = flight.future.result()
+            return get_response(request) if result is None else thaw(result)
+
+    middleware.flights = flights
+    return middleware
@@ -1,5 +1,7 @@
 from typing import Optional
+from django.db.models import Avg, Exists, F, FloatField, OuterRef, Subquery
 from django.db.models.query import QuerySet
+from note_todo.models import Comment
 
 
 def importance_filter(queryset: QuerySet, importance) -> QuerySet:
@@ -26,3 +28,82 @@ def public_filter(queryset: QuerySet, public: Optional[bool]) -> QuerySet:
         return queryset.filter(public=public)
     else:
         return queryset
+
+
+def rating_avg_annotate(queryset: QuerySet) -> QuerySet:
+    """
+    Функция, добавляющая к заметкам средний рейтинг комментариев подзапросом.
+    Комментарии "Без оценки" в среднем не учитываются
+    :param queryset: запрос
+    :return: queryset с полем rating_avg
+    """
+    rating_avg = Comment.objects.filter(
+        note_todo=OuterRef('pk')
+    ).exclude(
+        rating=Comment.Rating.WITHOUT_RATING
+    ).order_by().values('note_todo').annotate(avg=Avg('rating')).values('avg')
+
+    return queryset.annotate(rating_avg=Subquery(rating_avg, output_field=FloatField()))
+
+
+def min_rating_filter(queryset: QuerySet, min_rating: Optional[float]) -> QuerySet:
+    """
+    Функция, фильтрующая заметки по минимальному среднему рейтингу
+    :param queryset: запрос, аннотированный rating_avg
+    :param min_rating: минимальный средний рейтинг
+    :return: отфильтрованный queryset
+    """
+    if min_rating is not None:
+        return queryset.filter(rating_avg__gte=min_rating)
+    else:
+        return queryset
+
+
+def has_rating_filter(queryset: QuerySet, ratings: Optional[list]) -> QuerySet:
+    """
+    Функция, оставляющая заметки, у которых есть хотя бы один комментарий
+    с одним из переданных рейтингов
+    :param queryset: запрос
+    :param ratings: список значений рейтинга
+    :return: отфильтрованный queryset
+    """
+    if ratings:
+        comments = Comment.objects.filter(note_todo=OuterRef('pk'), rating__in=ratings)
+        return queryset.filter(Exists(comments))
+    else:
+        return queryset
+
+
+def rating_ordering(queryset: QuerySet, rating_order: Optional[str]) -> QuerySet:
+    """
+    Функция, сортирующая заметки по среднему рейтингу. Заметки без оценок идут в конце
+    :param queryset: запрос, аннотированный rating_avg
+    :param rating_order: asc или desc
+    :return: отсортированный queryset
+    """
+    if rating_order == 'asc':
+        return queryset.order_by(F('rating_avg').asc(nulls_last=True), 'pk')
+    elif rating_order == 'desc':
+        return queryset.order_by(F('rating_avg').desc(nulls_last=True), 'pk')
+    else:
+        return queryset
+
+
+def rating_filter(queryset: QuerySet, query_params: dict) -> QuerySet:
+    """
+    Функция, применяющая к заметкам все фильтры и сортировку по рейтингу.
+    Все условия собираются в один SQL запрос
+    :param queryset: запрос
+    :param query_params: провалидированные параметры min_rating, has_rating, rating_order
+    :return: отфильтрованный и отсортированный queryset
+    """
+    min_rating = query_params.get('min_rating')
+    rating_order = query_params.get('rating_order')
+
+    if min_rating is not None or rating_order:
+        queryset = rating_avg_annotate(queryset)
+    queryset = min_rating_filter(queryset, min_rating)
+    queryset = has_rating_filter(queryset, query_params.get('has_rating'))
+    queryset = rating_ordering(queryset, rating_order)
+
+    return queryset
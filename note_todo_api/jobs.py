@@ -0,0 +1,258 @@
+"""
+Фоновые задачи API.
+
+Долгие операции (выгрузка, загрузка и удаление большого числа заметок) не выполняются
+в запросе: представление ставит задачу в таблицу Job и сразу отвечает 202,
+а выполняет ее команда run_jobs в пуле потоков или процессов.
+
+Задача захватывается условным UPDATE ... WHERE status=QUEUED, поэтому несколько
+воркеров могут читать одну очередь без блокировок. Упавшая задача возвращается
+в очередь с экспоненциальной задержкой, пока не кончатся попытки.
+
+Пока задача выполняется, воркер периодически обновляет heartbeat_at. Зависшей считается задача
+без свежего сигнала, а не долгая: ее возвращают в очередь, и это тоже попытка. Результат
+сохраняется, только если задачу за это время не забрали у воркера.
+"""
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from note_todo import purge, sharding
+from note_todo.models import NoteToDo
+from note_todo.signals import notes_changed
+from . import serializers
+from .models import Job
+
+REGISTRY = {}
+
+BACKOFF_BASE = timedelta(seconds=10)
+BACKOFF_MAX = timedelta(hours=1)
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+STALE_ERROR = 'Воркер перестал отвечать'
+
+
+class JobError(Exception):
+    """
+    Ошибка, после которой повторять задачу бессмысленно (например, неверные параметры)
+    """
+
+
+def job(name):
+    """
+    Декоратор, регистрирующий функцию задачи. Функция принимает объект Job
+    и возвращает результат, который можно сохранить в JSON
+    :param name: имя задачи в API
+    """
+    def decorator(func):
+        REGISTRY[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, author=None, idempotency_key=None, max_attempts=None):
+    """
+    Функция, ставящая задачу в очередь. Повторный вызов с тем же ключом идемпотентности
+    не создает новую задачу, а возвращает уже существующую
+    :param name: имя зарегистрированной задачи
+    :param payload: параметры задачи
+    :param author: пользователь, от имени которого выполняется задача
+    :param idempotency_key: ключ идемпотентности
+    :param max_attempts: максимум попыток
+    :return: кортеж (задача, создана ли она)
+    """
+    if name not in REGISTRY:
+        raise JobError(f'Неизвестная задача {name}')
+
+    fields = {'name': name, 'payload': payload or {}, 'author': author}
+    if max_attempts is not None:
+        fields['max_attempts'] = max_attempts
+    if idempotency_key is None:
+        return Job.objects.create(**fields), True
+
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=idempotency_key, **fields), True
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key), False
+
+
+def backoff(attempts):
+    """
+    Функция, вычисляющая задержку перед следующей попыткой: 10 с, 20 с, 40 с ... но не больше часа
+    :param attempts: количество сделанных попыток
+    """
+    return min(BACKOFF_BASE * 2 ** min(max(attempts - 1, 0), 16), BACKOFF_MAX)
+
+
+def claim(limit):
+    """
+    Функция, захватывающая до limit готовых к выполнению задач.
+    Задачу, которую между выборкой и UPDATE забрал другой воркер, UPDATE не изменит
+    :param limit: сколько задач нужно
+    :return: список первичных ключей захваченных задач
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.JobStatus.QUEUED, run_after__lte=now,
+    ).order_by('run_after', 'pk').values_list('pk', flat=True)[:limit * 2]
+
+    claimed = []
+    for pk in candidates:
+        updated = Job.objects.filter(pk=pk, status=Job.JobStatus.QUEUED).update(
+            status=Job.JobStatus.RUNNING,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if updated:
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def requeue_stale(timeout):
+    """
+    Функция, возвращающая в очередь задачи, воркер которых завис или был убит.
+    Захват задачи уже посчитан в attempts, поэтому задача без оставшихся попыток
+    не возвращается в очередь, а завершается с ошибкой
+    :param timeout: сколько задача может не присылать сигнал воркера
+    :return: количество возвращенных в очередь и завершенных задач
+    """
+    now = timezone.now()
+    deadline = now - timeout
+    # heartbeat_at пуст только у задач, захваченных до его появления
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=deadline) | Q(heartbeat_at__isnull=True, started_at__lt=deadline),
+        status=Job.JobStatus.RUNNING,
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.JobStatus.FAILED, error=STALE_ERROR, finished_at=now,
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.JobStatus.QUEUED, error=STALE_ERROR, run_after=now,
+    )
+    return failed + requeued
+
+
+class Heartbeat:
+    """
+    Класс фонового потока, который обновляет heartbeat_at задачи, пока она выполняется.
+    Обновление идет, только пока задача принадлежит этой попытке воркера
+    """
+    def __init__(self, job, interval):
+        self.job = job
+        self.interval = interval.total_seconds()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f'job-heartbeat-{job.pk}', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    Job.objects.filter(
+                        pk=self.job.pk, status=Job.JobStatus.RUNNING, attempts=self.job.attempts,
+                    ).update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    # Пропущенный сигнал не страшен, пока следующий успевает до stale_timeout
+                    pass
+        finally:
+            connection.close()
+
+
+def run_job(pk, heartbeat=HEARTBEAT_INTERVAL):
+    """
+    Функция, выполняющая захваченную задачу и сохраняющая результат или ошибку
+    :param pk: id задачи в статусе RUNNING
+    :param heartbeat: как часто обновлять heartbeat_at, должно быть заметно меньше stale_timeout
+    :return: статус задачи после выполнения
+    """
+    job = Job.objects.select_related('author').get(pk=pk)
+    try:
+        with Heartbeat(job, heartbeat):
+            job.result = REGISTRY[job.name](job)
+    except Exception as exc:
+        job.error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+        if isinstance(exc, JobError) or job.attempts >= job.max_attempts:
+            job.status = Job.JobStatus.FAILED
+            job.finished_at = timezone.now()
+        else:
+            job.status = Job.JobStatus.QUEUED
+            job.run_after = timezone.now() + backoff(job.attempts)
+    else:
+        job.status = Job.JobStatus.DONE
+        job.error = ''
+        job.finished_at = timezone.now()
+
+    # Если задачу сочли зависшей и отдали другому воркеру, ее состояние уже не наше
+    updated = Job.objects.filter(pk=pk, status=Job.JobStatus.RUNNING, attempts=job.attempts).update(
+        status=job.status, result=job.result, error=job.error,
+        run_after=job.run_after, finished_at=job.finished_at,
+    )
+    if not updated:
+        return Job.objects.values_list('status', flat=True).get(pk=pk)
+    return job.status
+
+
+def run_pending(limit=100):
+    """
+    Функция, синхронно выполняющая готовые задачи в текущем потоке
+    :param limit: максимум задач
+    :return: количество выполненных попыток
+    """
+    claimed = claim(limit)
+    for pk in claimed:
+        run_job(pk)
+    return len(claimed)
+
+
+@job('export_notes')
+def export_notes(job):
+    """
+    Выгрузка всех заметок автора задачи. Параметр public=true|false ограничивает выгрузку
+    """
+    queryset = sharding.for_author(NoteToDo.objects.filter(author=job.author), job.author_id).order_by('pk')
+    if 'public' in job.payload:
+        queryset = queryset.filter(public=job.payload['public'])
+    return serializers.NoteToDoSerializer(instance=queryset.iterator(), many=True).data
+
+
+@job('import_notes')
+def import_notes(job):
+    """
+    Загрузка списка заметок из параметра notes одним bulk_create
+    """
+    serializer = serializers.NoteToDoSerializer(data=job.payload.get('notes', []), many=True)
+    if not serializer.is_valid():
+        raise JobError(serializer.errors)
+
+    notes = NoteToDo.objects.bulk_create(
+        (NoteToDo(author=job.author, **fields) for fields in serializer.validated_data),
+        batch_size=500,
+    )
+    # bulk_create не отправляет post_save. Непубличные заметки в ленту не попадают,
+    # а без первичных ключей неизвестно, какие страницы ленты перестраивать
+    if notes:
+        public = [note.pk for note in notes if note.public]
+        notes_changed.send(sender=NoteToDo, note_ids=None if None in public else public, using=notes[0]._state.db)
+    return {'created': len(notes)}
+
+
+@job('purge_notes')
+def purge_notes(job):
+    """
+    Удаление всех заметок автора задачи вместе с комментариями
+    """
+    return purge.purge_notes(sharding.for_author(NoteToDo.objects.filter(author=job.author), job.author_id))
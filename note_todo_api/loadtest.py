@@ -0,0 +1,304 @@
+"""
+Генератор нагрузки на API для команды loadtest.
+
+Клиент HTTP/1.1 написан на asyncio.open_connection без сторонних библиотек и держит
+keep-alive соединения. Запросы порождаются с постоянной целевой частотой (открытая модель):
+если сервер не успевает, запросы копятся в очереди, а задержка считается от запланированного
+времени отправки, поэтому очередь честно попадает в латентность.
+"""
+import asyncio
+import base64
+import bisect
+import json
+import random
+import string
+import time
+from urllib.parse import urlsplit
+
+# Верхние границы корзин гистограммы задержек, мс
+HISTOGRAM_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+DEFAULT_MIX = {
+    'list': 30,
+    'filter': 20,
+    'detail': 20,
+    'comment_filter': 10,
+}
+# Сценарии записи без авторизации дают только 403, поэтому в смесь по умолчанию
+# они добавляются лишь при заданных --user или --session
+WRITE_MIX = {
+    'create': 10,
+    'patch': 10,
+}
+
+
+class Connection:
+    """
+    Класс keep-alive соединения HTTP/1.1, через которое запросы идут по одному
+    """
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        """
+        Функция, отправляющая запрос и читающая ответ целиком
+        :return: кортеж (код ответа, тело ответа)
+        """
+        try:
+            return await asyncio.wait_for(self._request(method, path, headers, body), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _request(self, method, path, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Сервер закрыл соединение')
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = await self.reader.read()
+            self.close()
+
+        # HTTP/1.0 (например, wsgiref в manage.py serve) закрывает соединение, если не сказано иное
+        connection = response_headers.get('connection', '').lower()
+        if connection == 'close' or (status_line.startswith(b'HTTP/1.0') and connection != 'keep-alive'):
+            self.close()
+        return status, content
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Scenarios:
+    """
+    Класс сценариев нагрузки. Каждый сценарий возвращает (метод, путь, тело JSON или None).
+    Для detail и patch используются id заметок пользователя, созданных в том числе сценарием create,
+    а без авторизации - id опубликованных заметок. Пока id неизвестны, эти сценарии не выбираются
+    """
+    NEEDS_NOTE = ('detail', 'patch')
+
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.note_ids = []
+
+    def list(self):
+        return 'GET', '/api/note/', None
+
+    def filter(self):
+        params = self.rnd.choice(['importance=True', 'public=False', 'min_rating=3', 'rating_order=desc'])
+        return 'GET', f'/api/note/filter/?{params}', None
+
+    def detail(self):
+        return 'GET', f'/api/note/{self.note_id()}/', None
+
+    def comment_filter(self):
+        return 'GET', f'/api/note/filter/comment/?rating={self.rnd.randint(0, 5)}', None
+
+    def create(self):
+        return 'POST', '/api/note/', {'title': f'loadtest {self.rnd.randrange(10 ** 9)}', 'content': 'loadtest'}
+
+    def patch(self):
+        return 'PATCH', f'/api/note/{self.note_id()}/', {'title': f'loadtest patched {self.rnd.randrange(10 ** 9)}'}
+
+    def note_id(self):
+        return self.rnd.choice(self.note_ids)
+
+    def available(self, name):
+        return bool(self.note_ids) or name not in self.NEEDS_NOTE
+
+    def remember(self, name, status, content):
+        if name == 'create' and status == 201:
+            note_id = json.loads(content).get('id')
+            if note_id:
+                self.note_ids.append(note_id)
+
+
+class Stats:
+    """
+    Класс, накапливающий количество запросов, коды ответов и задержки по сценариям
+    """
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self.skipped = 0
+
+    def add(self, name, status, latency, error=False):
+        self.latencies.setdefault(name, []).append(latency)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        self.errors[name] = self.errors.get(name, 0) + int(error)
+
+    @staticmethod
+    def summary(latencies, errors, elapsed):
+        latencies = sorted(latencies)
+        count = len(latencies)
+
+        def percentile(value):
+            return round(latencies[min(count - 1, int(value * count))] * 1000, 3)
+
+        histogram = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        for latency in latencies:
+            histogram[bisect.bisect_left(HISTOGRAM_BUCKETS, latency * 1000)] += 1
+        labels = [f'<={bucket}' for bucket in HISTOGRAM_BUCKETS] + [f'>{HISTOGRAM_BUCKETS[-1]}']
+
+        return {
+            'requests': count,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': {
+                'min': percentile(0), 'mean': round(sum(latencies) / count * 1000, 3),
+                'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99),
+                'max': round(latencies[-1] * 1000, 3),
+            } if count else {},
+            'histogram_ms': {label: hits for label, hits in zip(labels, histogram) if hits},
+        }
+
+    def report(self, elapsed, options):
+        all_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        report = {
+            'target_rps': options['rps'],
+            'duration_s': round(elapsed, 3),
+            'concurrency': options['concurrency'],
+            'skipped': self.skipped,
+            'total': self.summary(all_latencies, sum(self.errors.values()), elapsed),
+            'scenarios': {},
+        }
+        for name in sorted(self.latencies):
+            report['scenarios'][name] = self.summary(self.latencies[name], self.errors[name], elapsed)
+            report['scenarios'][name]['status'] = {str(code): hits for code, hits in sorted(self.statuses[name].items())}
+        return report
+
+
+def parse_mix(value):
+    """
+    Функция, разбирающая веса сценариев вида list=30,detail=20
+    """
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in DEFAULT_MIX and name.strip() not in WRITE_MIX:
+            raise ValueError(f'Неизвестный сценарий {name}')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+async def run(options):
+    """
+    Функция, выполняющая нагрузочный тест
+    :param options: параметры команды loadtest
+    :return: отчет
+    """
+    url = urlsplit(options['url'])
+    rnd = random.Random(options['seed'])
+    scenarios = Scenarios(rnd)
+    stats = Stats()
+    headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+    if options['session']:
+        # SessionAuthentication проверяет CSRF для POST и PATCH: cookie и заголовок с одним секретом
+        csrf_secret = ''.join(rnd.choices(string.ascii_letters + string.digits, k=32))
+        headers['Cookie'] = f"sessionid={options['session']}; csrftoken={csrf_secret}"
+        headers['X-CSRFToken'] = csrf_secret
+    elif options['user']:
+        credentials = f"{options['user']}:{options['password']}".encode()
+        headers['Authorization'] = 'Basic ' + base64.b64encode(credentials).decode()
+
+    connections = [Connection(url.hostname, url.port or 80, options['timeout'])
+                   for _ in range(options['concurrency'])]
+
+    if options['session'] or options['user']:
+        status, content = await connections[0].request('GET', '/api/note/mine/?page_size=100', headers)
+        if status == 200:
+            scenarios.note_ids = [note['id'] for note in json.loads(content)['results']]
+    elif options['mix'].get('detail'):
+        status, content = await connections[0].request('GET', '/api/note/public/', headers)
+        if status == 200:
+            scenarios.note_ids = [note['id'] for note in json.loads(content)[:100]]
+
+    mix = options['mix']
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+    queue = asyncio.Queue()
+
+    async def worker(connection):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            name, scheduled = item
+            method, path, data = getattr(scenarios, name)()
+            body = json.dumps(data).encode() if data is not None else b''
+            try:
+                status, content = await connection.request(method, path, headers, body)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                stats.add(name, 0, time.perf_counter() - scheduled, error=True)
+                continue
+            stats.add(name, status, time.perf_counter() - scheduled, error=status >= 400)
+            scenarios.remember(name, status, content)
+
+    workers = [asyncio.create_task(worker(connection)) for connection in connections]
+    interval = 1 / options['rps']
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        scheduled = start + sent * interval
+        if scheduled - start >= options['duration']:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Сценарий выбирается в момент отправки: detail и patch появляются, как только create вернет id
+        available = [index for index, name in enumerate(names) if scenarios.available(name)]
+        if available:
+            name = names[rnd.choices(available, [weights[index] for index in available])[0]]
+            queue.put_nowait((name, scheduled))
+        else:
+            stats.skipped += 1
+        sent += 1
+
+    for _ in workers:
+        queue.put_nowait(None)
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - start
+    for connection in connections:
+        connection.close()
+
+    return stats.report(elapsed, options)
@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+
+from note_todo import purge
+from note_todo.models import NoteToDo, Comment
+
+
+class Command(BaseCommand):
+    """
+    Команда, сравнивающая одинаковые одновременные запросы к одной заметке
+    без объединения и с объединением (note_todo_api.coalescing) в режимах WSGI (потоки)
+    и ASGI (задачи событийного цикла). Запросы идут прямо в обработчик Django, без сети
+    """
+    help = 'Бенчмарк объединения одинаковых одновременных запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32, help='Количество одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на одного клиента')
+        parser.add_argument('--comments', type=int, default=50, help='Комментариев у заметки')
+
+    def handle(self, *args, **options):
+        author = User.objects.create(username='bench_coalescing')
+        note = NoteToDo.objects.create(title='bench', author=author, public=True)
+        Comment.objects.bulk_create([Comment(note_todo=note, author=author, rating=i % len(Comment.Rating))
+                                     for i in range(options['comments'])])
+        path = f'/api/note/{note.pk}/'
+        # Хост запроса должен пройти проверку ALLOWED_HOSTS, иначе все ответы будут 400
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')),
+                    'localhost')
+
+        queries = itertools.count()
+
+        def count_queries(execute, sql, params, many, context):
+            next(queries)
+            return execute(sql, params, many, context)
+
+        def wrap_connection(connection, **kwargs):
+            # Обертка соединения переживает переподключение после каждого запроса
+            if count_queries not in connection.execute_wrappers:
+                connection.execute_wrappers.append(count_queries)
+
+        connection_created.connect(wrap_connection, dispatch_uid='bench_coalescing')
+        connections.close_all()
+        try:
+            self.stdout.write(f"{'mode':>5} {'coalescing':>10} {'requests':>9} {'req/s':>7} {'queries/req':>12} "
+                              f"{'errors':>7}")
+            for mode, run in (('wsgi', self._run_wsgi), ('asgi', self._run_asgi)):
+                for enabled in (False, True):
+                    with override_settings(REQUEST_COALESCING=enabled):
+                        start_queries = next(queries)
+                        elapsed, statuses = run(path, host, options['clients'], options['requests'])
+                        executed = next(queries) - start_queries - 1
+                    total = len(statuses)
+                    errors = sum(status != 200 for status in statuses)
+                    self.stdout.write(f"{mode:>5} {'on' if enabled else 'off':>10} {total:>9} "
+                                      f'{total / elapsed:>7.0f} {executed / total:>12.2f} {errors:>7}')
+        finally:
+            connection_created.disconnect(dispatch_uid='bench_coalescing')
+            connections.close_all()
+            purge.purge_user(author)
+
+    @staticmethod
+    def _run_wsgi(path, host, clients, count):
+        handler = WSGIHandler()
+        environ = RequestFactory()._base_environ(PATH_INFO=path, REQUEST_METHOD='GET', SERVER_NAME=host)
+
+        def client(_):
+            statuses = []
+
+            def start_response(status, headers):
+                statuses.append(int(status.split()[0]))
+
+            try:
+                for _ in range(count):
+                    handler(dict(environ), start_response).close()
+            finally:
+                connections.close_all()
+            return statuses
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            results = list(pool.map(client, range(clients)))
+        return time.perf_counter() - start, [status for statuses in results for status in statuses]
+
+    @staticmethod
+    def _run_asgi(path, host, clients, count):
+        handler = ASGIHandler()
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [],
+                 'server': (host, 80)}
+        statuses = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async def client():
+            for _ in range(count):
+                await handler(dict(scope), receive, send)
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(clients)))
+            return time.perf_counter() - start
+
+        return asyncio.run(run()), statuses
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+from django.test.utils import setup_databases, teardown_databases
+
+from note_todo import purge
+from note_todo.models import NoteToDo, Comment
+from note_todo_api import batching
+
+
+class Command(BaseCommand):
+    """
+    Команда, сравнивающая запись комментариев по одному (транзакция на комментарий)
+    и через групповую запись note_todo_api.batching при нескольких одновременных писателях-потоках.
+    Пишет не в рабочую базу, а во временные базы с миграциями, как тестовый раннер,
+    и удаляет их после замера
+    """
+    help = 'Бенчмарк групповой записи комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', default='1,8,32', help='Количество потоков через запятую')
+        parser.add_argument('--comments', type=int, default=200, help='Комментариев на один поток')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix='bench_comment_ingest_') as tmp:
+            for alias in connections:
+                if connections[alias].vendor == 'sqlite':
+                    # Файл, а не база в памяти: писатели ждут блокировку записи, как в рабочей базе
+                    connections[alias].settings_dict['TEST']['NAME'] = os.path.join(tmp, f'{alias}.sqlite3')
+            old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+            try:
+                self.bench(options)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+    def bench(self, options):
+        """
+        Функция, выполняющая замеры во временной базе
+        :param options: параметры команды
+        """
+        author = User.objects.create(username=f'bench_comment_ingest_{uuid.uuid4().hex[:8]}')
+        notes = [NoteToDo.objects.create(title=f'bench {i}', author=author) for i in range(10)]
+        batcher = batching.get_batcher()
+        modes = {
+            'single': lambda comment: comment.save(),
+            'batched': lambda comment: batcher.submit(comment).result(),
+        }
+        self.stdout.write(f"{'writers':>7} {'mode':>8} {'comments':>9} {'comments/s':>11} "
+                          f"{'p99, ms':>8} {'errors':>7}")
+        for writers in [int(count) for count in options['writers'].split(',')]:
+            for mode, save in modes.items():
+                elapsed, latencies, errors = self._run(writers, options['comments'], notes, author, save)
+                total = len(latencies)
+                p99 = sorted(latencies)[max(int(total * 0.99) - 1, 0)] * 1000 if latencies else 0
+                self.stdout.write(f'{writers:>7} {mode:>8} {total:>9} {total / elapsed:>11.0f} {p99:>8.1f} '
+                                  f'{errors:>7}')
+                # Каждый режим начинает с той же пустой таблицы комментариев
+                purge.purge_comments(Comment.objects.filter(author=author))
+
+    def _run(self, writers, count, notes, author, save):
+        def write(writer):
+            latencies, errors = [], 0
+            try:
+                for i in range(count):
+                    comment = Comment(note_todo=notes[(writer + i) % len(notes)], author=author,
+                                      rating=i % len(Comment.Rating))
+                    start = time.perf_counter()
+                    try:
+                        save(comment)
+                    except DatabaseError:
+                        # database is locked: писатель не дождался блокировки записи
+                        errors += 1
+                    else:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+            return latencies, errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(writers) as pool:
+            results = list(pool.map(write, range(writers)))
+        elapsed = time.perf_counter() - start
+        latencies = [latency for result, _ in results for latency in result]
+        return elapsed, latencies, sum(errors for _, errors in results)
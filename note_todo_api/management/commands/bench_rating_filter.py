@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from note_todo.models import NoteToDo, Comment
+from note_todo_api import filters
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Команда, замеряющая время фильтрации заметок по рейтингу комментариев
+    с индексом (note_todo, rating) и без него.
+    Все тестовые данные создаются в транзакции, которая в конце откатывается
+    """
+    help = 'Бенчмарк фильтрации и сортировки заметок по рейтингу комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000',
+                            help='Количество заметок через запятую')
+        parser.add_argument('--comments', type=int, default=5,
+                            help='Количество комментариев на заметку')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Количество повторов каждого запроса')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        self.stdout.write(f"{'notes':>8} {'comments':>9} {'query':>12} {'index, ms':>10} {'no index, ms':>13}")
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    self._bench_size(size, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _bench_size(self, size, options):
+        rnd = random.Random(options['seed'])
+        author = User.objects.create(username=f'bench_rating_{size}')
+        NoteToDo.objects.bulk_create(
+            (NoteToDo(title=f'bench {i}', author=author) for i in range(size)),
+            batch_size=1000,
+        )
+        note_ids = NoteToDo.objects.filter(author=author).values_list('pk', flat=True)
+        Comment.objects.bulk_create(
+            (Comment(note_todo_id=note_id, author=author, rating=rnd.randint(0, 5))
+             for note_id in note_ids for _ in range(options['comments'])),
+            batch_size=1000,
+        )
+
+        queries = {
+            'has_rating': {'has_rating': [Comment.Rating.EXCELLENT]},
+            'min_rating': {'min_rating': 4.0},
+            'order': {'rating_order': 'desc'},
+        }
+        with_index = {name: self._time(params, options['repeat']) for name, params in queries.items()}
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX comment_note_rating_idx')
+        without_index = {name: self._time(params, options['repeat']) for name, params in queries.items()}
+
+        for name in queries:
+            self.stdout.write(f"{size:>8} {size * options['comments']:>9} {name:>12} "
+                              f"{with_index[name]:>10.1f} {without_index[name]:>13.1f}")
+
+    def _time(self, params, repeat):
+        best = None
+        for _ in range(repeat):
+            queryset = filters.rating_filter(NoteToDo.objects.all(), params)
+            start = time.perf_counter()
+            list(queryset.values_list('pk', flat=True)[:100])
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
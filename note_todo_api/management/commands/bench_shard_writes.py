@@ -0,0 +1,95 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import override_settings
+
+from note_todo import purge, sharding
+from note_todo.models import NoteToDo
+
+
+def _ready(_):
+    time.sleep(0.1)
+
+
+def _write_notes(aliases, author_ids, count, hold):
+    """
+    Функция процесса-писателя: создает заметки по одной, каждую в своей транзакции, как API
+    :param hold: сколько держать транзакцию открытой после записи, c
+    :return: время записи, c
+    """
+    try:
+        with override_settings(NOTE_TODO_SHARDS=aliases):
+            start = time.perf_counter()
+            for i in range(count):
+                author_id = author_ids[i % len(author_ids)]
+                with transaction.atomic(using=sharding.shard_for_author(author_id)):
+                    NoteToDo.objects.create(title=f'bench {i}', author_id=author_id)
+                    if hold:
+                        time.sleep(hold)
+            return time.perf_counter() - start
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """
+    Команда, замеряющая пропускную способность записи заметок в зависимости от количества шардов.
+    Несколько процессов одновременно создают заметки разных авторов; с одним шардом
+    они ждут единственную блокировку записи SQLite, с несколькими - пишут в разные файлы.
+    Шарды берутся из NOTE_TODO_SHARDS и должны быть созданы migrate --database.
+    --hold-ms держит транзакцию открытой после вставки и моделирует работу под блокировкой
+    записи: fsync медленного диска или код, выполняющийся внутри транзакции запроса
+    """
+    help = 'Бенчмарк записи заметок в 1..N шардов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', help='Количество шардов через запятую (по умолчанию 1, 2, 4 ... N)')
+        parser.add_argument('--writers', type=int, default=8, help='Количество процессов-писателей')
+        parser.add_argument('--notes', type=int, default=300, help='Заметок на одного писателя')
+        parser.add_argument('--authors', type=int, default=64, help='Количество авторов')
+        parser.add_argument('--hold-ms', type=float, default=0,
+                            help='Сколько держать транзакцию открытой после вставки, мс')
+
+    def handle(self, *args, **options):
+        aliases = sharding.shards()
+        if not aliases:
+            raise CommandError('Шардирование выключено: задайте NOTE_TODO_SHARDS')
+        if options['shards']:
+            counts = [int(count) for count in options['shards'].split(',')]
+        else:
+            counts = [2 ** power for power in range(len(aliases).bit_length()) if 2 ** power <= len(aliases)]
+        if max(counts) > len(aliases):
+            raise CommandError(f'Настроено только {len(aliases)} шардов')
+
+        authors = [User.objects.create(username=f'bench_shard_{i}') for i in range(options['authors'])]
+        author_ids = [author.pk for author in authors]
+        writers = options['writers']
+        try:
+            with ProcessPoolExecutor(writers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=django.setup) as pool:
+                list(pool.map(_ready, range(writers)))
+                self.stdout.write(f"{'shards':>6} {'notes':>7} {'notes/s':>9} {'speedup':>8}")
+                baseline = None
+                for count in counts:
+                    start = time.perf_counter()
+                    futures = [pool.submit(_write_notes, aliases[:count], author_ids[writer::writers] or author_ids,
+                                           options['notes'], options['hold_ms'] / 1000)
+                               for writer in range(writers)]
+                    for future in futures:
+                        future.result()
+                    elapsed = time.perf_counter() - start
+
+                    total = writers * options['notes']
+                    rate = total / elapsed
+                    baseline = baseline or rate
+                    self.stdout.write(f'{count:>6} {total:>7} {rate:>9.0f} {rate / baseline:>7.2f}x')
+                    for alias in aliases:
+                        purge.purge_notes(NoteToDo.objects.using(alias).filter(author_id__in=author_ids))
+        finally:
+            for author in authors:
+                author.delete()
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from note_todo_api import loadtest
+
+
+class Command(BaseCommand):
+    """
+    Команда, нагружающая запущенный сервер смесью запросов к API с заданной частотой
+    и печатающая отчет в JSON: пропускная способность, задержки, гистограмма и доля ошибок
+    """
+    help = 'Нагрузочный тест API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument('--rps', type=float, default=50, help='Целевая частота запросов в секунду')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность теста, c')
+        parser.add_argument('--concurrency', type=int, default=10, help='Количество соединений')
+        parser.add_argument('--timeout', type=float, default=10, help='Таймаут запроса, c')
+        parser.add_argument('--mix', type=loadtest.parse_mix,
+                            help='Веса сценариев: list, filter, detail, comment_filter, create, patch. '
+                                 'По умолчанию create и patch входят в смесь только с --user или --session')
+        parser.add_argument('--user', default='', help='Пользователь для Basic-авторизации (нужен для create и patch)')
+        parser.add_argument('--password', default='')
+        parser.add_argument('--session', default='',
+                            help='Ключ сессии вместо Basic-авторизации: Basic хэширует пароль '
+                                 'на каждый запрос и сам становится узким местом')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для отчета вместо stdout')
+
+    def handle(self, *args, **options):
+        if options['rps'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--rps и --concurrency должны быть положительными')
+
+        authenticated = bool(options['session'] or options['user'])
+        if options['mix'] is None:
+            options['mix'] = {**loadtest.DEFAULT_MIX, **(loadtest.WRITE_MIX if authenticated else {})}
+        elif not authenticated and any(options['mix'].get(name) for name in loadtest.WRITE_MIX):
+            raise CommandError('Сценарии create и patch требуют --user или --session')
+
+        report = asyncio.run(loadtest.run(options))
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(content)
+            self.stderr.write(f"Запросов: {report['total']['requests']}, "
+                              f"{report['total']['throughput_rps']} в секунду")
+        else:
+            self.stdout.write(content)
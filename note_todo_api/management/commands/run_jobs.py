@@ -0,0 +1,119 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from note_todo_api import jobs
+from note_todo_api.models import Job
+
+
+def _run_in_thread(pk, heartbeat):
+    try:
+        return jobs.run_job(pk, heartbeat)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    """
+    Команда-воркер, выполняющая фоновые задачи из таблицы Job в пуле потоков или процессов.
+    Главный поток только захватывает задачи и раздает их пулу, пока в пуле есть свободные места
+    """
+    help = 'Выполнение фоновых задач API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Размер пула')
+        parser.add_argument('--processes', action='store_true',
+                            help='Пул процессов вместо пула потоков (для задач, нагружающих CPU)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза между опросами пустой очереди, c')
+        parser.add_argument('--stale-timeout', type=int, default=600,
+                            help='Через сколько секунд без сигнала воркера задача возвращается в очередь')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда в очереди не останется готовых задач')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        previous_handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self.work(options)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def work(self, options):
+        """
+        Функция, раздающая задачи пулу до остановки воркера
+        :param options: параметры команды
+        """
+
+        workers = options['workers']
+        if options['processes']:
+            # Процессы запускаются через spawn и настраивают Django заново:
+            # соединения с базой после fork делить нельзя
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=django.setup)
+            target = jobs.run_job
+        else:
+            pool = ThreadPoolExecutor(workers, thread_name_prefix='job')
+            target = _run_in_thread
+
+        stale_timeout = timedelta(seconds=options['stale_timeout'])
+        # Несколько сигналов за stale_timeout: один пропущенный не делает задачу зависшей
+        heartbeat = min(jobs.HEARTBEAT_INTERVAL, stale_timeout / 4)
+        # Зависшие задачи ищутся не на каждой итерации, а пару раз за stale_timeout
+        stale_check_interval = min(60.0, options['stale_timeout'] / 2)
+        next_stale_check = 0.0
+        in_flight = {}
+        done_count = 0
+        with pool:
+            while not self.stopping:
+                if time.monotonic() >= next_stale_check:
+                    next_stale_check = time.monotonic() + stale_check_interval
+                    if jobs.requeue_stale(stale_timeout):
+                        self.stderr.write('Зависшие задачи возвращены в очередь или завершены с ошибкой')
+
+                claimed = jobs.claim(workers - len(in_flight)) if len(in_flight) < workers else []
+                for pk in claimed:
+                    in_flight[pool.submit(target, pk, heartbeat)] = pk
+
+                if not in_flight:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                finished, _ = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done_count += 1
+                    self.report(in_flight.pop(future), future)
+
+            # Уже начатые задачи дорабатывают; упавший воркер не должен прерывать остановку
+            for future, pk in in_flight.items():
+                self.report(pk, future)
+
+        self.stdout.write(f'Выполнено попыток: {done_count + len(in_flight)}')
+
+    def report(self, pk, future):
+        """
+        Функция, выводящая итог выполнения задачи воркером
+        :param pk: id задачи
+        :param future: Future воркера
+        """
+        try:
+            job_status = future.result()
+        except Exception as exc:
+            self.stderr.write(f'Задача #{pk}: воркер упал: {exc!r}')
+        else:
+            self.stdout.write(f'Задача #{pk}: {Job.JobStatus(job_status).label}')
+
+    def stop(self, signum, frame):
+        """
+        Функция, завершающая воркер после выполнения уже начатых задач
+        """
+        self.stopping = True
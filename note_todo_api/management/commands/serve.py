@@ -0,0 +1,55 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from examen.prefork import PreforkServer, process_local_caches
+
+
+class Command(BaseCommand):
+    """
+    Команда, запускающая сервер с предварительно загруженным и прогретым приложением,
+    который форкает воркеры. SIGHUP - плавная перезагрузка с новым кодом,
+    SIGUSR1 - вывод RSS/PSS мастера и воркеров, SIGTERM - плавная остановка
+    """
+    help = 'Production-сервер: предзагрузка приложения и форк воркеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000', help='Адрес и порт')
+        parser.add_argument('--workers', type=int,
+                            help='Количество воркеров (по умолчанию по числу ядер, '
+                                 'а при кэше сессий в памяти процесса - 1)')
+        parser.add_argument('--max-requests', type=int, default=1000,
+                            help='Воркер перезапускается после стольких запросов (0 - никогда)')
+        parser.add_argument('--max-requests-jitter', type=int, default=50,
+                            help='Случайная добавка к лимиту, чтобы воркеры не перезапускались одновременно')
+        parser.add_argument('--graceful-timeout', type=float, default=30,
+                            help='Сколько ждать завершения воркеров при остановке, c')
+        parser.add_argument('--warm-url', action='append', dest='warm_urls',
+                            help='Путь, который запрашивается при прогреве (можно несколько раз)')
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError('serve работает только на системах с fork()')
+        local = process_local_caches()
+        if options['workers'] is None:
+            options['workers'] = 1 if local else os.cpu_count() or 1
+            if local:
+                self.stderr.write(f"{', '.join(local)} указывают на кэш в памяти процесса: запускается "
+                                  f'один воркер. Для нескольких задайте общий кэш в CACHE_URL (redis://, memcached://)')
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть положительным')
+        if options['workers'] > 1 and local:
+            raise CommandError(f"{', '.join(local)} указывают на кэш в памяти процесса: выход, смена пароля "
+                               f'и изменения ленты в одном воркере не дойдут до других. Задайте общий кэш '
+                               f'в CACHE_URL (redis://, memcached://) или запустите с --workers 1')
+
+        server = PreforkServer(
+            bind=options['bind'],
+            workers=options['workers'],
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            graceful_timeout=options['graceful_timeout'],
+            warm_urls=options['warm_urls'] or ['/api/note/public/', '/api/note/'],
+            log=lambda message: self.stderr.write(message),
+        )
+        server.run()
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from examen import startup
+
+
+class Command(BaseCommand):
+    """
+    Команда, показывающая время холодного старта и дерево импортов (python -X importtime)
+    для этапов запуска: django.setup(), manage.py check и первого запроса воркера.
+    Время старта замеряется отдельным запуском без -X importtime и сравнивается с STARTUP_BUDGET
+    """
+    help = 'Профиль импортов при запуске'
+
+    def add_arguments(self, parser):
+        parser.add_argument('stages', nargs='*', help=f"Этапы: {', '.join(startup.STAGES)} (по умолчанию все)")
+        parser.add_argument('--url', default=startup.DEFAULT_URL, help='Путь первого запроса для этапа request')
+        parser.add_argument('--min-ms', type=float, default=2, help='Не показывать импорты быстрее, мс')
+        parser.add_argument('--depth', type=int, default=4, help='Глубина дерева')
+
+    def handle(self, *args, **options):
+        unknown = set(options['stages']) - set(startup.STAGES)
+        if unknown:
+            raise CommandError(f"Неизвестные этапы: {', '.join(sorted(unknown))}")
+
+        budget = getattr(settings, 'STARTUP_BUDGET', {})
+        for stage in options['stages'] or startup.STAGES:
+            elapsed, _, _ = startup.measure(stage, url=options['url'])
+            _, tree, _ = startup.measure(stage, profile=True, url=options['url'])
+
+            imports = sum(cumulative for _, _, cumulative, _ in tree) / 1000
+            line = f'Этап {stage}: {elapsed * 1000:.0f} мс до выхода процесса, из них импорт {imports:.0f} мс'
+            if stage in budget:
+                line += f', бюджет {budget[stage] * 1000:.0f} мс'
+            self.stdout.write(self.style.ERROR(line) if elapsed > budget.get(stage, elapsed) else line)
+
+            self.stdout.write(f"{'всего, мс':>10} {'свое, мс':>9}  модуль")
+            self.write_tree(tree, options['min_ms'] * 1000, options['depth'])
+            self.stdout.write('')
+
+    def write_tree(self, nodes, min_us, depth, level=0):
+        for name, self_us, cumulative_us, children in sorted(nodes, key=lambda node: -node[2]):
+            if cumulative_us < min_us:
+                break
+            self.stdout.write(f"{cumulative_us / 1000:>10.1f} {self_us / 1000:>9.1f}  {'  ' * level}{name}")
+            if level + 1 < depth:
+                self.write_tree(children, min_us, depth, level + 1)
@@ -1,3 +1,47 @@
+from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class Job(models.Model):
+    """
+    Класс, описывающий фоновую задачу в очереди.
+    Задачи выполняет команда run_jobs, а API только ставит их в очередь
+    """
+    class JobStatus(models.IntegerChoices):
+        """
+        Класс, описывающий статусы задачи
+        """
+        QUEUED = 0, _("В очереди")
+        RUNNING = 1, _("Выполняется")
+        DONE = 2, _("Выполнена")
+        FAILED = 3, _("Ошибка")
+
+    name = models.CharField(max_length=64, verbose_name='Задача')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    status = models.IntegerField(default=JobStatus.QUEUED,
+                                 choices=JobStatus.choices,
+                                 verbose_name='Статус')
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    error = models.TextField(default='', blank=True, verbose_name='Ошибка')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name='Максимум попыток')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Выполнить не раньше')
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, unique=True,
+                                       verbose_name='Ключ идемпотентности')
+    author = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, verbose_name='Автор')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало выполнения')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Последний сигнал воркера')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание выполнения')
+
+    def __str__(self):
+        return f"Задача {self.name} #{self.pk}"
+
+    class Meta:
+        verbose_name = _("задача")
+        verbose_name_plural = _("задачи")
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
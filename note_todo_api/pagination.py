@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TimelineCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация ленты заметок автора.
+    Следующая страница запрашивается условием по ключу сортировки (created_at < курсора),
+    а не OFFSET, поэтому любая страница читается по индексу за одинаковое время.
+    Сортировка задается параметром ?ordering=created_at, -created_at, due_to или -due_to
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+    orderings = ('created_at', '-created_at', 'due_to', '-due_to')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get('ordering', self.ordering)
+        if ordering not in self.orderings:
+            ordering = self.ordering
+        # pk делает порядок однозначным для заметок с одинаковой датой
+        return ordering, '-pk' if ordering.startswith('-') else 'pk'
@@ -0,0 +1,225 @@
+"""
+Профилирование запросов API без передеплоя.
+
+ProfilingMiddleware подключено всегда и умеет два режима:
+
+* выборочный, только при API_PROFILING_ENABLED: доля API_PROFILING_SAMPLE_RATE запросов
+  отмечается для сэмплера - фонового потока, который каждые API_PROFILING_INTERVAL секунд
+  снимает стеки отмеченных потоков через sys._current_frames(). Сам запрос при этом не замедляется;
+* по требованию, независимо от настройки: запрос с заголовком X-Profile, подписанным
+  django.core.signing (токен выдает POST /api/profiling/), целиком выполняется под cProfile.
+  Подпись проверяется всегда, без нее заголовок игнорируется.
+
+Стеки складываются по представлениям в формате collapsed stacks
+(«кадр;кадр;кадр количество»), который понимают flamegraph.pl и speedscope.
+Данные хранятся в памяти процесса и отдаются персоналу по GET /api/profiling/.
+Под manage.py serve с несколькими воркерами у каждого воркера свой store: ответ содержит
+данные только обработавшего его воркера, pid которого указан в заголовке X-Profile-Worker.
+Профиль запроса с X-Profile лежит у воркера из заголовка X-Profile-Worker ответа на этот запрос.
+Чтобы собрать все данные в одном месте, профилируйте под serve --workers 1
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core import signing
+
+PROFILE_HEADER = 'X-Profile'
+WORKER_HEADER = 'X-Profile-Worker'
+TOKEN_SALT = 'note_todo_api.profiling'
+MAX_DEPTH = 128
+# Сколько разных стеков хранится на одно представление, остальные считаются вместе
+MAX_STACKS = 5000
+OTHER_STACK = '[other]'
+
+
+def make_token():
+    """
+    Функция, выдающая подписанный токен для заголовка X-Profile
+    """
+    return signing.dumps('profile', salt=TOKEN_SALT)
+
+
+def check_token(token):
+    """
+    Функция, проверяющая подпись и срок действия токена
+    :param token: значение заголовка X-Profile
+    """
+    try:
+        signing.loads(token, salt=TOKEN_SALT, max_age=getattr(settings, 'API_PROFILING_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse(frame):
+    """
+    Функция, превращающая стек кадра в строку collapsed stacks от корня к вершине
+    """
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class ProfileStore:
+    """
+    Класс, накапливающий стеки сэмплера и статистику cProfile по представлениям
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stacks = defaultdict(Counter)
+            self.stats = {}
+
+    def add_samples(self, view, samples):
+        with self.lock:
+            stacks = self.stacks[view]
+            for stack, count in samples.items():
+                if stack not in stacks and len(stacks) >= MAX_STACKS:
+                    stack = OTHER_STACK
+                stacks[stack] += count
+
+    def add_profile(self, view, profile):
+        with self.lock:
+            if view in self.stats:
+                self.stats[view].add(profile)
+            else:
+                self.stats[view] = pstats.Stats(profile)
+
+    def collapsed(self, view=None):
+        """
+        Функция, возвращающая стеки в формате collapsed stacks
+        :param view: представление или None для всех представлений
+        """
+        with self.lock:
+            lines = []
+            for name, stacks in sorted(self.stacks.items()):
+                if view is None or name == view:
+                    lines.extend(f'{name};{stack} {count}' for stack, count in stacks.most_common())
+            return '\n'.join(lines) + '\n' if lines else ''
+
+    def pstats_text(self, view, sort='cumulative', limit=50):
+        """
+        Функция, возвращающая текстовый отчет cProfile по представлению
+        """
+        with self.lock:
+            if view not in self.stats:
+                return ''
+            stream = io.StringIO()
+            stats = self.stats[view]
+            stats.stream = stream
+            stats.sort_stats(sort).print_stats(limit)
+            return stream.getvalue()
+
+
+class Sampler:
+    """
+    Класс фонового потока, который снимает стеки только отмеченных потоков.
+    Поток запускается при первом отмеченном запросе и спит, пока таких запросов нет
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.active = {}
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id):
+        samples = Counter()
+        with self.lock:
+            self.active[thread_id] = samples
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='api-profiling-sampler', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+        return samples
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.active.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                if not self.active:
+                    self.wakeup.clear()
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+store = ProfileStore()
+_sampler = None
+
+
+def get_sampler():
+    global _sampler
+    if _sampler is None:
+        _sampler = Sampler(getattr(settings, 'API_PROFILING_INTERVAL', 0.005))
+    return _sampler
+
+
+class ProfilingMiddleware:
+    """
+    Middleware, отмечающее запросы для сэмплера или выполняющее их под cProfile.
+    API_PROFILING_ENABLED включает только сэмплер, подписанный X-Profile работает всегда
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = (getattr(settings, 'API_PROFILING_SAMPLE_RATE', 0.01)
+                            if getattr(settings, 'API_PROFILING_ENABLED', False) else 0)
+
+    def __call__(self, request):
+        token = request.headers.get(PROFILE_HEADER)
+        if token and check_token(token):
+            profile = cProfile.Profile()
+            response = profile.runcall(self.get_response, request)
+            store.add_profile(self.view_name(request), profile)
+            response[WORKER_HEADER] = str(os.getpid())
+            return response
+
+        if self.sample_rate and random.random() < self.sample_rate:
+            sampler = get_sampler()
+            thread_id = threading.get_ident()
+            sampler.start(thread_id)
+            try:
+                return self.get_response(request)
+            finally:
+                samples = sampler.stop(thread_id)
+                if samples:
+                    store.add_samples(self.view_name(request), samples)
+
+        return self.get_response(request)
+
+    @staticmethod
+    def view_name(request):
+        """
+        Функция, возвращающая путь к классу или функции представления запроса
+        """
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return request.path_info
+        return match._func_path
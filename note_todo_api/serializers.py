@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from note_todo.models import NoteToDo, Comment
+from .models import Job
 from datetime import datetime
 from django.utils import dateparse
 
@@ -55,6 +56,15 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class CommentCreateSerializer(serializers.Serializer):
+    """
+    Класс, который проверяет новый комментарий перед групповой записью.
+    Существование заметки проверяет внешний ключ при записи пакета
+    """
+    note_todo = serializers.IntegerField(min_value=1)
+    rating = serializers.ChoiceField(choices=Comment.Rating.choices, default=Comment.Rating.WITHOUT_RATING)
+
+
 class NoteToDoDetailSerializer(serializers.ModelSerializer):
     """
     Класс, который сериализует детальную информацию по моделе NoteToDo
@@ -68,7 +78,7 @@ class NoteToDoDetailSerializer(serializers.ModelSerializer):
         model = NoteToDo
         fields = (
             'title', 'content', 'created_at', 'due_to', 'importance', 'public',
-            'author', 'comment_set'
+            'author', 'comment_set', 'version'
         )
 
     def to_representation(self, instance):
@@ -92,4 +102,35 @@ class QueryParamsStatusFilterSerializer(serializers.Serializer):
 
 
 class QueryParamsCommentFilterSerializer(serializers.Serializer):
-    rating = serializers.ListField(child=serializers.ChoiceField(choices=Comment.Rating.choices), required=False)
\ No newline at end of file
+    rating = serializers.ListField(child=serializers.ChoiceField(choices=Comment.Rating.choices), required=False)
+
+
+class QueryParamsRatingFilterSerializer(serializers.Serializer):
+    min_rating = serializers.FloatField(min_value=Comment.Rating.TERRIBLE,
+                                        max_value=Comment.Rating.EXCELLENT,
+                                        required=False)
+    has_rating = serializers.ListField(child=serializers.ChoiceField(choices=Comment.Rating.choices), required=False)
+    rating_order = serializers.ChoiceField(choices=('asc', 'desc'), required=False)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Класс, который сериализует фоновую задачу
+    """
+    status = serializers.SerializerMethodField('get_status')
+
+    def get_status(self, obj):
+        return {
+            'value': obj.status,
+            'display': obj.get_status_display()
+        }
+
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'name', 'payload', 'status', 'result', 'error', 'attempts',
+            'run_after', 'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = (
+            'result', 'error', 'attempts', 'run_after', 'created_at', 'started_at', 'finished_at'
+        )
@@ -0,0 +1,296 @@
+"""
+Заранее отрендеренная лента публичных заметок.
+
+Лента /api/note/public/ одинакова для всех клиентов, поэтому она хранится в кэше
+PUBLIC_FEED_CACHE_ALIAS уже готовыми байтами JSON. Заметки разбиты на страницы
+по первичному ключу (pk // CHUNK_SIZE), каждая страница - отдельная запись кэша
+с отрендеренными через запятую элементами списка, а индекс хранит номера непустых страниц.
+Ответ собирается склейкой страниц без обращения к ORM.
+
+При изменении заметки, ее комментариев или автора перестраивается только страница
+этой заметки - после коммита транзакции, чтобы в ленту не попали откатившиеся данные.
+
+Перестройки из разных потоков и процессов упорядочены номером из счетчика в кэше:
+страница записывается, только если ее не записала перестройка с большим номером,
+а индекс меняется под блокировкой.
+
+Свежесть ленты обеспечивают эти перестройки, а срок жизни - только страховка от потерянной:
+раз в PUBLIC_FEED_REFRESH секунд один запрос запускает полную перестройку в фоновом потоке,
+а все запросы тем временем получают прежние страницы. Записи живут PUBLIC_FEED_TIMEOUT,
+и при постоянных обновлениях не истекают. Если индекса нет (первый запрос или вытеснение),
+ленту строит один запрос, а остальные ждут его результата.
+Кэш в памяти процесса не видит перестроек в других процессах, поэтому manage.py serve
+с ним запускает один воркер.
+"""
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+
+from note_todo import sharding
+from note_todo.models import NoteToDo
+
+CHUNK_SIZE = 100
+INDEX_KEY = 'public_feed:index'
+CHUNK_KEY = 'public_feed:chunk:%s'
+# Номер перестройки, записавшей страницу, и номер последнего сброса всей ленты
+GENERATION_KEY = 'public_feed:generation'
+GENERATION_CHUNK_KEY = 'public_feed:generation:%s'
+RESET_KEY = 'public_feed:reset'
+LOCK_KEY = 'public_feed:lock'
+LOCK_TIMEOUT = 5
+# Метка свежести полной перестройки и блокировка, под которой ее выполняет один запрос
+FRESH_KEY = 'public_feed:fresh'
+REBUILD_KEY = 'public_feed:rebuild'
+REBUILD_TIMEOUT = 60
+
+
+def feed_cache():
+    return caches[getattr(settings, 'PUBLIC_FEED_CACHE_ALIAS', 'default')]
+
+
+def public_queryset():
+    return NoteToDo.objects.filter(public=True).select_related('author').prefetch_related('comment_set').order_by('pk')
+
+
+def chunk_of(pk):
+    return pk // CHUNK_SIZE
+
+
+def render(notes):
+    """
+    Функция, рендерящая заметки так же, как JSONRenderer рендерит список, но без скобок
+    :param notes: заметки
+    :return: байты элементов списка через запятую
+    """
+    # Модуль подключает приемники сигналов при запуске, а DRF нужен только для рендеринга
+    from rest_framework.renderers import JSONRenderer
+    from . import serializers
+
+    data = serializers.NoteToDoDetailSerializer(instance=notes, many=True).data
+    return JSONRenderer().render(data)[1:-1]
+
+
+def feed_timeout(cache):
+    """
+    Функция, возвращающая время жизни записей ленты в кэше
+    """
+    return getattr(settings, 'PUBLIC_FEED_TIMEOUT', 86400)
+
+
+def next_generation(cache):
+    """
+    Функция, выдающая номер перестройки. Номер берется до чтения базы, поэтому перестройка
+    с большим номером видит все изменения, закоммиченные до перестройки с меньшим
+    """
+    # Счетчик начинается с текущего времени в мс: после вытеснения из кэша он продолжит расти
+    now = int(time.time() * 1000)
+    cache.add(GENERATION_KEY, now, timeout=None)
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Кэш не хранит значения (DummyCache) или счетчик вытеснен между add и incr
+        return now
+
+
+@contextmanager
+def feed_lock(cache):
+    """
+    Менеджер контекста, сериализующий запись страниц и индекса между процессами.
+    Блокировка с LOCK_TIMEOUT: если процесс, взявший ее, умер, следующий писатель подождет не дольше него
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(LOCK_KEY, token, timeout=LOCK_TIMEOUT) and time.monotonic() < deadline:
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        if cache.get(LOCK_KEY) == token:
+            cache.delete(LOCK_KEY)
+
+
+def store(cache, generation, chunks, index):
+    """
+    Функция, записывающая отрендеренные страницы, если их не записала более новая перестройка.
+    Вызывается под feed_lock
+    :param generation: номер перестройки
+    :param chunks: словарь номер страницы -> байты, пустые байты - страница пуста
+    :param index: индекс после записи или None, если индекс не нужно трогать
+    :return: номера записанных страниц
+    """
+    if generation < (cache.get(RESET_KEY) or 0):
+        return set()
+    written = cache.get_many([GENERATION_CHUNK_KEY % chunk for chunk in chunks])
+    fresh = {chunk for chunk in chunks if written.get(GENERATION_CHUNK_KEY % chunk, 0) < generation}
+
+    timeout = feed_timeout(cache)
+    cache.set_many({CHUNK_KEY % chunk: chunks[chunk] for chunk in fresh if chunks[chunk]}, timeout=timeout)
+    cache.delete_many([CHUNK_KEY % chunk for chunk in fresh if not chunks[chunk]])
+    cache.set_many({GENERATION_CHUNK_KEY % chunk: generation for chunk in fresh}, timeout=timeout)
+    if index is not None:
+        cache.set(INDEX_KEY, sorted(index), timeout=timeout)
+    return fresh
+
+
+def rebuild_all():
+    """
+    Функция, перестраивающая всю ленту
+    :return: словарь номер страницы -> байты
+    """
+    cache = feed_cache()
+    generation = next_generation(cache)
+    grouped = {}
+    for note in sharding.scatter(public_queryset()):
+        grouped.setdefault(chunk_of(note.pk), []).append(note)
+    chunks = {chunk: render(notes) for chunk, notes in grouped.items()}
+
+    with feed_lock(cache):
+        index = cache.get(INDEX_KEY) or []
+        # Страницы, которых нет в этой перестройке, но которые были в индексе, теперь пусты
+        rendered = dict.fromkeys(index, b'')
+        rendered.update(chunks)
+        written = cache.get_many([GENERATION_CHUNK_KEY % chunk for chunk in rendered])
+        newer = {chunk for chunk in rendered if written.get(GENERATION_CHUNK_KEY % chunk, 0) > generation}
+        # Для страниц, записанных более новой перестройкой, в индексе остается то, что она записала
+        present = cache.get_many([CHUNK_KEY % chunk for chunk in newer])
+        index = {chunk for chunk in chunks if chunk not in newer} | {
+            chunk for chunk in newer if CHUNK_KEY % chunk in present}
+        store(cache, generation, rendered, index)
+    cache.set(FRESH_KEY, generation, timeout=getattr(settings, 'PUBLIC_FEED_REFRESH', 3600))
+    return chunks
+
+
+def refresh_in_background():
+    """
+    Функция, запускающая полную перестройку ленты в фоновом потоке.
+    Вызывается под REBUILD_KEY и снимает его по окончании
+    """
+    def run():
+        try:
+            rebuild_all()
+        finally:
+            feed_cache().delete(REBUILD_KEY)
+            connections.close_all()
+
+    threading.Thread(target=run, name='public-feed-refresh', daemon=True).start()
+
+
+def wait_for_index(cache):
+    """
+    Функция, ждущая индекс, который строит другой запрос
+    :return: индекс или None, если он не появился за REBUILD_TIMEOUT
+    """
+    deadline = time.monotonic() + REBUILD_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        index = cache.get(INDEX_KEY)
+        if index is not None:
+            return index
+    return None
+
+
+def rebuild_chunks(chunks):
+    """
+    Функция, перестраивающая только указанные страницы ленты.
+    Если индекса нет, страницы все равно записываются с номером перестройки, чтобы
+    одновременно идущая полная перестройка не записала поверх них данные, прочитанные раньше
+    :param chunks: номера страниц
+    :return: словарь номер страницы -> байты, пустые байты - страница пуста
+    """
+    cache = feed_cache()
+    generation = next_generation(cache)
+    rendered = {}
+    for chunk in chunks:
+        notes = public_queryset().filter(pk__gte=chunk * CHUNK_SIZE, pk__lt=(chunk + 1) * CHUNK_SIZE)
+        rendered[chunk] = render(list(sharding.scatter(notes)))
+
+    with feed_lock(cache):
+        index = cache.get(INDEX_KEY)
+        fresh = store(cache, generation, rendered, None)
+        if index is not None and fresh:
+            index = set(index)
+            index.update(chunk for chunk in fresh if rendered[chunk])
+            index.difference_update(chunk for chunk in fresh if not rendered[chunk])
+            cache.set(INDEX_KEY, sorted(index), timeout=feed_timeout(cache))
+    return rendered
+
+
+def invalidate_notes(note_ids):
+    """
+    Функция, планирующая перестройку страниц с указанными заметками после коммита транзакции
+    :param note_ids: id заметок
+    """
+    chunks = {chunk_of(note_id) for note_id in note_ids}
+    if chunks:
+        transaction.on_commit(lambda: rebuild_chunks(chunks))
+
+
+def invalidate_all():
+    """
+    Функция, сбрасывающая всю ленту. Перестройки, начатые до сброса, ничего не запишут
+    """
+    cache = feed_cache()
+    with feed_lock(cache):
+        cache.set(RESET_KEY, next_generation(cache), timeout=None)
+        cache.delete(INDEX_KEY)
+
+
+def public_feed():
+    """
+    Функция, возвращающая ленту публичных заметок в виде готового JSON
+    :return: байты JSON-массива
+    """
+    cache = feed_cache()
+    index = cache.get(INDEX_KEY)
+    if index is None:
+        if cache.add(REBUILD_KEY, True, timeout=REBUILD_TIMEOUT):
+            try:
+                chunks = rebuild_all()
+            finally:
+                cache.delete(REBUILD_KEY)
+            return b'[' + b','.join(chunks[chunk] for chunk in sorted(chunks)) + b']'
+        index = wait_for_index(cache)
+        if index is None:
+            chunks = rebuild_all()
+            return b'[' + b','.join(chunks[chunk] for chunk in sorted(chunks)) + b']'
+    elif cache.get(FRESH_KEY) is None and cache.add(REBUILD_KEY, True, timeout=REBUILD_TIMEOUT):
+        refresh_in_background()
+
+    found = cache.get_many([CHUNK_KEY % chunk for chunk in index])
+    missing = [chunk for chunk in index if CHUNK_KEY % chunk not in found]
+    if missing:
+        # Перестроенные страницы берутся из результата: их запись могла быть пропущена
+        found.update((CHUNK_KEY % chunk, blob) for chunk, blob in rebuild_chunks(missing).items())
+    blobs = [found[CHUNK_KEY % chunk] for chunk in index if found.get(CHUNK_KEY % chunk)]
+    return b'[' + b','.join(blobs) + b']'
+
+
+def note_changed(sender, instance, **kwargs):
+    invalidate_notes([instance.pk])
+
+
+def comment_changed(sender, instance, **kwargs):
+    invalidate_notes([instance.note_todo_id])
+
+
+def author_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    notes = sharding.for_author(NoteToDo.objects.filter(author=instance, public=True), instance.pk)
+    invalidate_notes(notes.values_list('pk', flat=True))
+
+
+def notes_purged(sender, note_ids, **kwargs):
+    invalidate_notes(note_ids)
+
+
+def notes_changed(sender, note_ids, **kwargs):
+    if note_ids is None:
+        invalidate_all()
+    else:
+        invalidate_notes(note_ids)
@@ -0,0 +1,155 @@
+"""
+Потоковая выдача больших списков заметок и комментариев.
+
+ModelSerializer(many=True) создает модель и OrderedDict на каждую строку и рендерит
+весь список разом, поэтому память растет вместе с размером ответа. Здесь строки читаются
+кортежами values_list() пачками по CHUNK_SIZE, каждая сразу превращается в JSON
+заранее подготовленными преобразователями полей и отдается клиенту StreamingHttpResponse.
+
+Байты ответа совпадают с JSONRenderer + NoteToDoSerializer/CommentSerializer:
+тот же порядок полей, компактные разделители, ensure_ascii=False,
+экранирование U+2028/U+2029 и формат дат '%d %B %Y %H:%M:%S' в текущем часовом поясе.
+Включается настройкой NOTE_LIST_STREAMING.
+
+ASGI-обработчик Django 4.0 читает потоковый ответ прямо в событийном цикле, где запросы
+к базе запрещены (SynchronousOnlyOperation). Поэтому под ASGI тело собирается теми же
+преобразователями целиком еще в потоке представления и отдается обычным HttpResponse.
+"""
+from json.encoder import encode_basestring
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from note_todo import sharding
+from note_todo.models import NoteToDo, Comment
+from . import serializers
+
+CHUNK_SIZE = 2000
+DATE_FORMAT = '%d %B %Y %H:%M:%S'
+
+NOTE_COLUMNS = ('id', 'note_status', 'title', 'content', 'created_at', 'due_to',
+                'public', 'importance', 'version', 'author_id')
+COMMENT_COLUMNS = ('id', 'rating', 'author_id', 'note_todo_id')
+
+
+def choices_json(choices):
+    """
+    Функция, заранее кодирующая {"value": ..., "display": ...} для каждого значения перечисления
+    на активном языке
+    :param choices: IntegerChoices
+    """
+    return {value: f'{{"value":{value},"display":{encode_basestring(str(label))}}}'
+            for value, label in choices.choices}
+
+
+def json_string(value):
+    encoded = encode_basestring(value)
+    if '\u2028' in encoded or '\u2029' in encoded:
+        encoded = encoded.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return encoded
+
+
+def note_rows(queryset):
+    """
+    Функция, возвращающая генератор JSON-объектов заметок в формате NoteToDoSerializer.
+    Подписи статусов и часовой пояс берутся сразу, а не при первом чтении генератора,
+    который выполняется уже после выхода из представления
+    """
+    statuses = choices_json(NoteToDo.NoteStatus)
+    tz = timezone.get_current_timezone()
+    booleans = {True: 'true', False: 'false'}
+
+    def rows():
+        for pk, note_status, title, content, created_at, due_to, public, importance, version, author_id \
+                in queryset.values_list(*NOTE_COLUMNS).iterator(chunk_size=CHUNK_SIZE):
+            yield (
+                f'{{"id":{pk},"note_status":{statuses[note_status]},'
+                f'"title":{json_string(title)},"content":{json_string(content)},'
+                f'"created_at":"{created_at.astimezone(tz).strftime(DATE_FORMAT)}",'
+                f'"due_to":"{due_to.astimezone(tz).strftime(DATE_FORMAT)}",'
+                f'"public":{booleans[public]},"importance":{booleans[importance]},'
+                f'"version":{version},"author":{author_id}}}'
+            )
+
+    return rows()
+
+
+def comment_rows(queryset):
+    """
+    Функция, возвращающая генератор JSON-объектов комментариев в формате CommentSerializer
+    """
+    ratings = choices_json(Comment.Rating)
+
+    def rows():
+        for pk, rating, author_id, note_todo_id in queryset.values_list(*COMMENT_COLUMNS).iterator(chunk_size=CHUNK_SIZE):
+            yield f'{{"id":{pk},"rating":{ratings[rating]},"author":{author_id},"note_todo":{note_todo_id}}}'
+
+    return rows()
+
+
+STREAMERS = {
+    serializers.NoteToDoSerializer: note_rows,
+    serializers.CommentSerializer: comment_rows,
+}
+
+
+def json_array(rows):
+    """
+    Функция, склеивающая объекты в JSON-массив и отдающая его кусками по CHUNK_SIZE объектов
+    """
+    yield b'['
+    separator = ''
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) == CHUNK_SIZE:
+            yield (separator + ','.join(buffer)).encode()
+            separator = ','
+            buffer = []
+    if buffer:
+        yield (separator + ','.join(buffer)).encode()
+    yield b']'
+
+
+def can_stream(request):
+    """
+    Функция, проверяющая, что ответ рендерится обычным JSONRenderer без отступов.
+    При шардировании списки собираются из всех шардов (ShardedListMixin) и потоково не отдаются
+    """
+    return (getattr(settings, 'NOTE_LIST_STREAMING', False)
+            and not sharding.is_enabled()
+            and type(getattr(request, 'accepted_renderer', None)) is JSONRenderer
+            and 'indent' not in getattr(request, 'accepted_media_type', ''))
+
+
+def stream_response(request, queryset, serializer_class):
+    """
+    Функция, возвращающая потоковый ответ (под ASGI - собранный целиком)
+    или None, если для запроса нужен обычный рендеринг
+    :param request: запрос
+    :param queryset: отфильтрованный и отсортированный queryset
+    :param serializer_class: сериализатор, формат которого нужно повторить
+    """
+    streamer = STREAMERS.get(serializer_class)
+    if streamer is None or not can_stream(request):
+        return None
+    chunks = json_array(streamer(queryset))
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return HttpResponse(b''.join(chunks), content_type=request.accepted_media_type)
+    return StreamingHttpResponse(chunks, content_type=request.accepted_media_type)
+
+
+class StreamingListMixin:
+    """
+    Примесь к ListAPIView без пагинации, отдающая список потоково
+    """
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None:
+            response = stream_response(request, self.filter_queryset(self.get_queryset()),
+                                       self.get_serializer_class())
+            if response is not None:
+                return response
+        return super().list(request, *args, **kwargs)
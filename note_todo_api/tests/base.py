@@ -0,0 +1,30 @@
+import json
+
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from note_todo.models import NoteToDo
+
+
+class NoteToDoAPITestCase(APITestCase):
+    """
+    Базовый класс тестов API: пользователь и заметка создаются один раз на класс
+    в setUpTestData и откатываются вместе с транзакцией класса, а не пересоздаются в каждом тесте.
+    Данные не делятся на весь модуль: их пришлось бы создавать вне транзакции класса, и тогда
+    их удалил бы flush у TransactionTestCase того же модуля (Django запускает такие классы
+    после всех TestCase, и setUpModule выполнился бы второй раз), а параллельный запуск
+    все равно раздает тесты процессам по классам
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = User.objects.create(username="test_user")
+        cls.note = NoteToDo.objects.create(title="Test_title", author=cls.test_user)
+
+
+def response_data(resp):
+    """
+    Функция, возвращающая данные ответа: для потоковых списков (note_todo_api.streaming)
+    у ответа нет data, и JSON собирается из streaming_content
+    """
+    if resp.streaming:
+        return json.loads(b''.join(resp.streaming_content))
+    return resp.data
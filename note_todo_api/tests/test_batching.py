@@ -0,0 +1,117 @@
+from concurrent.futures import Future
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+
+from note_todo.models import NoteToDo, Comment
+from note_todo_api import batching
+from .base import NoteToDoAPITestCase
+
+
+class TestCommentCreateAPIView(NoteToDoAPITestCase):
+    """
+    Тестирование приема оценок заметок
+    """
+    def setUp(self):
+        self.client.force_authenticate(self.test_user)
+
+    def test_anonymous_forbidden(self):
+        """
+        Функция тестирования запрета оценки без авторизации
+        """
+        self.client.force_authenticate(None)
+        resp = self.client.post('/api/comment/', data={'note_todo': self.note.pk, 'rating': 5}, format='json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, resp.status_code)
+
+    def test_rating_avg_includes_own_comment(self):
+        """
+        Функция тестирования того, что средний рейтинг в ответе уже учитывает новый комментарий
+        """
+        resp = self.client.post('/api/comment/', data={'note_todo': self.note.pk, 'rating': 5}, format='json')
+        self.assertEqual(status.HTTP_201_CREATED, resp.status_code)
+        self.assertEqual(5, resp.data['rating']['value'])
+        self.assertEqual(5.0, resp.data['rating_avg'])
+
+        resp = self.client.post('/api/comment/', data={'note_todo': self.note.pk, 'rating': 2}, format='json')
+        self.assertEqual(3.5, resp.data['rating_avg'])
+        resp = self.client.post('/api/comment/', data={'note_todo': self.note.pk}, format='json')
+        self.assertEqual(3.5, resp.data['rating_avg'])
+        self.assertEqual(3, Comment.objects.filter(note_todo=self.note, author=self.test_user).count())
+
+    def test_missing_note(self):
+        """
+        Функция тестирования ошибки при оценке несуществующей заметки
+        """
+        resp = self.client.post('/api/comment/', data={'note_todo': self.note.pk + 100, 'rating': 5}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, resp.status_code)
+        self.assertFalse(Comment.objects.exists())
+
+        resp = self.client.post('/api/comment/', data={'note_todo': self.note.pk, 'rating': 9}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, resp.status_code)
+
+    def test_write_unavailable(self):
+        """
+        Функция тестирования ответа 503, если запись не успела или база занята
+        """
+        for error in (TimeoutError(), OperationalError('database is locked')):
+            with mock.patch.object(batching, 'save_comment', side_effect=error):
+                resp = self.client.post('/api/comment/', data={'note_todo': self.note.pk, 'rating': 5},
+                                        format='json')
+            self.assertEqual(status.HTTP_503_SERVICE_UNAVAILABLE, resp.status_code)
+            self.assertEqual('1', resp['Retry-After'])
+
+    @override_settings(COMMENT_BATCHING=True)
+    def test_wait_is_bounded(self):
+        """
+        Функция тестирования того, что запрос не ждет записи бесконечно и снимает комментарий с очереди
+        """
+        comment = Comment(note_todo_id=self.note.pk, author_id=self.test_user.pk, rating=5)
+        self.assertLess(batching.wait_timeout(comment), 60)
+
+        future = Future()
+        with mock.patch.object(batching, 'get_batcher') as get_batcher:
+            get_batcher.return_value.submit.return_value = future
+            with self.assertRaises(TimeoutError):
+                batching.save_comment(comment, timeout=0.01)
+        self.assertTrue(future.cancelled())
+
+
+class TestCommentBatcher(TransactionTestCase):
+    """
+    Тестирование групповой записи комментариев потоком записи
+    """
+    def setUp(self):
+        self.author = User.objects.create(username='batch_user')
+        self.note = NoteToDo.objects.create(title='note', author=self.author)
+
+    def test_one_transaction_per_batch(self):
+        """
+        Функция тестирования записи одновременно поставленных комментариев одним пакетом
+        """
+        batcher = batching.CommentBatcher(max_size=100, max_delay=0.2)
+        with mock.patch.object(batching, 'insert', wraps=batching.insert) as insert:
+            futures = [batcher.submit(Comment(note_todo_id=self.note.pk, author_id=self.author.pk, rating=rating))
+                       for rating in (1, 2, 3, 4, 5)]
+            comments = [future.result(timeout=5) for future in futures]
+
+        insert.assert_called_once()
+        self.assertEqual(5, Comment.objects.count())
+        self.assertTrue(all(comment.pk for comment in comments))
+        self.assertEqual([3.0] * 5, [comment.rating_avg for comment in comments])
+
+    def test_error_only_for_failed_comment(self):
+        """
+        Функция тестирования того, что ошибку получает только запрос с неверным комментарием
+        """
+        batcher = batching.CommentBatcher(max_size=3, max_delay=1)
+        futures = [batcher.submit(Comment(note_todo_id=note_id, author_id=self.author.pk, rating=5))
+                   for note_id in (self.note.pk, self.note.pk + 100, self.note.pk)]
+
+        self.assertEqual(self.note.pk, futures[0].result(timeout=5).note_todo_id)
+        with self.assertRaises(NoteToDo.DoesNotExist):
+            futures[1].result(timeout=5)
+        self.assertEqual(5.0, futures[2].result(timeout=5).rating_avg)
+        self.assertEqual(2, Comment.objects.count())
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from note_todo.models import NoteToDo
+from note_todo_api import coalescing
+from .base import NoteToDoAPITestCase
+
+
+def wait_for_followers(flights, count):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if any(flight.followers == count for flight in list(flights.flights.values())):
+            return
+        time.sleep(0.001)
+    raise AssertionError('Запросы не присоединились к ведущему')
+
+
+class TestCoalescing(NoteToDoAPITestCase):
+    """
+    Тестирование объединения одинаковых одновременных запросов
+    """
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.url = f'/api/note/{self.note.pk}/'
+
+    def test_request_key(self):
+        """
+        Функция тестирования того, какие запросы получают общий ключ
+        """
+        key = coalescing.request_key(self.factory.get(self.url))
+        self.assertIsNotNone(key)
+        self.assertEqual(hash(key), hash(coalescing.request_key(self.factory.get(self.url))))
+        self.assertEqual(key, coalescing.request_key(self.factory.get(self.url, HTTP_COOKIE='sessionid=other')))
+        self.assertNotEqual(key, coalescing.request_key(self.factory.get(self.url, HTTP_AUTHORIZATION='Basic eDp5')))
+        self.assertNotEqual(key, coalescing.request_key(self.factory.get(self.url, {'a': [1, 2]})))
+
+        self.assertIsNone(coalescing.request_key(self.factory.get(self.url, HTTP_ACCEPT='text/html')))
+        self.assertIsNone(coalescing.request_key(self.factory.patch(self.url)))
+        self.assertIsNone(coalescing.request_key(self.factory.get('/api/note/sort/')))
+
+        mine = [coalescing.request_key(self.factory.get('/api/note/mine/', HTTP_COOKIE=f'sessionid={session}'))
+                for session in ('a', 'b')]
+        self.assertNotEqual(*mine)
+
+        NoteToDo.objects.filter(pk=self.note.pk).get().save()
+        self.assertNotEqual(key, coalescing.request_key(self.factory.get(self.url)))
+
+    def test_patch_starts_new_flight(self):
+        """
+        Функция тестирования того, что GET после PATCH не присоединяется к начатому до него
+        """
+        key = coalescing.request_key(self.factory.get(self.url))
+        self.client.force_authenticate(self.test_user)
+        resp = self.client.patch(self.url, data={'title': 'changed'}, format='json')
+        self.assertEqual(200, resp.status_code)
+        self.assertNotEqual(key, coalescing.request_key(self.factory.get(self.url)))
+
+    def test_generation_once_per_write(self):
+        """
+        Функция тестирования того, что запись через ORM и через update() меняет номер ровно один раз,
+        а одновременные изменения не теряются
+        """
+        generation = coalescing._generation
+        NoteToDo.objects.get(pk=self.note.pk).save()
+        self.assertEqual(generation + 1, coalescing._generation)
+
+        self.client.force_authenticate(self.test_user)
+        self.client.patch(self.url, data={'title': 'changed'}, format='json')
+        self.assertEqual(generation + 2, coalescing._generation)
+
+        threads = [threading.Thread(target=lambda: [coalescing.data_changed() for _ in range(1000)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(generation + 4002, coalescing._generation)
+
+    def test_concurrent_requests_share_response(self):
+        """
+        Функция тестирования одного выполнения представления на одновременные запросы в потоках
+        """
+        release = threading.Event()
+        calls = []
+
+        def get_response(request):
+            calls.append(request)
+            release.wait(5)
+            return HttpResponse(b'{"title": "note"}', content_type='application/json', headers={'ETag': '"1"'})
+
+        middleware = coalescing.CoalescingMiddleware(get_response)
+        responses = [None] * 4
+
+        def get(i):
+            responses[i] = middleware(self.factory.get(self.url))
+
+        threads = [threading.Thread(target=get, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        wait_for_followers(middleware.flights, 3)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual([b'{"title": "note"}'] * 4, [resp.content for resp in responses])
+        self.assertEqual(['"1"'] * 4, [resp['ETag'] for resp in responses])
+        self.assertEqual(4, len({id(resp) for resp in responses}))
+        self.assertEqual({}, middleware.flights.flights)
+
+    def test_response_with_cookie_not_shared(self):
+        """
+        Функция тестирования того, что ответ с кукой ожидавшие запросы получают каждый свой
+        """
+        release = threading.Event()
+        calls = []
+
+        def get_response(request):
+            calls.append(request)
+            release.wait(5)
+            response = HttpResponse(b'{}', content_type='application/json')
+            response.set_cookie('sessionid', str(len(calls)))
+            return response
+
+        middleware = coalescing.CoalescingMiddleware(get_response)
+        threads = [threading.Thread(target=middleware, args=(self.factory.get(self.url),)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for_followers(middleware.flights, 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(3, len(calls))
+
+    def test_async_requests_share_response(self):
+        """
+        Функция тестирования одного выполнения представления на одновременные запросы под ASGI
+        """
+        calls = []
+
+        async def get_response(request):
+            calls.append(request)
+            await asyncio.sleep(0.05)
+            return HttpResponse(b'[]', content_type='application/json')
+
+        middleware = coalescing.CoalescingMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        async def run():
+            return await asyncio.gather(*(middleware(self.factory.get('/api/note/public/')) for _ in range(5)))
+
+        responses = asyncio.run(run())
+        self.assertEqual(1, len(calls))
+        self.assertEqual([b'[]'] * 5, [resp.content for resp in responses])
+        self.assertEqual({}, middleware.flights.flights)
@@ -0,0 +1,226 @@
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+
+from note_todo.models import NoteToDo
+from note_todo_api import jobs
+from note_todo_api.management.commands import run_jobs
+from note_todo_api.models import Job
+from .base import NoteToDoAPITestCase
+
+
+def failing_job(job):
+    raise RuntimeError('boom')
+
+
+def slow_job(job):
+    time.sleep(0.3)
+    return 'done'
+
+
+class TestJobAPIView(NoteToDoAPITestCase):
+    """
+    Тестирование постановки фоновых задач и получения их результата
+    """
+    def setUp(self):
+        self.client.force_authenticate(self.test_user)
+
+    def test_anonymous_forbidden(self):
+        """
+        Функция тестирования запрета постановки задачи без авторизации
+        """
+        self.client.force_authenticate(None)
+        resp = self.client.post('/api/job/', data={'name': 'export_notes'}, format='json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, resp.status_code)
+
+    def test_unknown_job(self):
+        """
+        Функция тестирования ошибки при неизвестном имени задачи
+        """
+        resp = self.client.post('/api/job/', data={'name': 'unknown'}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, resp.status_code)
+        self.assertFalse(Job.objects.exists())
+
+    def test_export_accepted_then_done(self):
+        """
+        Функция тестирования того, что запрос отвечает 202, а результат появляется после выполнения воркером
+        """
+        resp = self.client.post('/api/job/', data={'name': 'export_notes'}, format='json')
+        self.assertEqual(status.HTTP_202_ACCEPTED, resp.status_code)
+        self.assertEqual(Job.JobStatus.QUEUED, resp.data['status']['value'])
+
+        self.assertEqual(1, jobs.run_pending())
+
+        resp = self.client.get(resp['Location'])
+        self.assertEqual(Job.JobStatus.DONE, resp.data['status']['value'])
+        self.assertEqual(['Test_title'], [note['title'] for note in resp.data['result']])
+
+    def test_import_notes(self):
+        """
+        Функция тестирования загрузки заметок задачей
+        """
+        payload = {'notes': [{'title': 'first'}, {'title': 'second', 'public': True}]}
+        self.client.post('/api/job/', data={'name': 'import_notes', 'payload': payload}, format='json')
+        jobs.run_pending()
+
+        self.assertEqual(3, NoteToDo.objects.filter(author=self.test_user).count())
+        self.assertEqual({'created': 2}, Job.objects.get().result)
+
+    def test_idempotency_key(self):
+        """
+        Функция тестирования того, что повтор запроса с тем же ключом не создает вторую задачу
+        """
+        data = {'name': 'export_notes', 'payload': {'public': True}}
+        first = self.client.post('/api/job/', data=data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        second = self.client.post('/api/job/', data=data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(1, Job.objects.count())
+
+        other = self.client.post('/api/job/', data={'name': 'purge_notes'}, format='json',
+                                 HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(status.HTTP_409_CONFLICT, other.status_code)
+
+    def test_other_user_forbidden(self):
+        """
+        Функция тестирования того, что чужую задачу посмотреть нельзя
+        """
+        job, _ = jobs.enqueue('export_notes', author=User.objects.create(username='other_user'))
+        resp = self.client.get(f'/api/job/{job.pk}/')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, resp.status_code)
+
+    def test_job_without_author_only_for_staff(self):
+        """
+        Функция тестирования того, что задачу без автора не видит анонимный пользователь
+        """
+        job, _ = jobs.enqueue('export_notes')
+        self.client.force_authenticate(None)
+        self.assertEqual(status.HTTP_403_FORBIDDEN, self.client.get(f'/api/job/{job.pk}/').status_code)
+
+        self.client.force_authenticate(User.objects.create(username='staff_user', is_staff=True))
+        self.assertEqual(status.HTTP_200_OK, self.client.get(f'/api/job/{job.pk}/').status_code)
+
+
+@mock.patch.dict(jobs.REGISTRY, {'failing': failing_job})
+class TestJobRetry(NoteToDoAPITestCase):
+    """
+    Тестирование повторов упавших задач с экспоненциальной задержкой
+    """
+    def test_retry_with_backoff_then_fail(self):
+        """
+        Функция тестирования возврата задачи в очередь с задержкой и ошибки после последней попытки
+        """
+        job, _ = jobs.enqueue('failing', author=self.test_user, max_attempts=2)
+
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(Job.JobStatus.QUEUED, job.status)
+        self.assertIn('boom', job.error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(0, jobs.run_pending())
+
+        Job.objects.update(run_after=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(Job.JobStatus.FAILED, job.status)
+        self.assertEqual(2, job.attempts)
+
+    def test_stale_requeue_counts_attempts(self):
+        """
+        Функция тестирования того, что зависшей считается задача без свежего сигнала воркера,
+        а возврат зависшей задачи тратит попытку
+        """
+        job, _ = jobs.enqueue('failing', author=self.test_user, max_attempts=2)
+        jobs.claim(1)
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.update(started_at=long_ago)
+        self.assertEqual(0, jobs.requeue_stale(timedelta(minutes=10)))
+
+        Job.objects.update(heartbeat_at=long_ago)
+        self.assertEqual(1, jobs.requeue_stale(timedelta(minutes=10)))
+        job.refresh_from_db()
+        self.assertEqual((Job.JobStatus.QUEUED, 1), (job.status, job.attempts))
+
+        jobs.claim(1)
+        Job.objects.update(heartbeat_at=long_ago)
+        self.assertEqual(1, jobs.requeue_stale(timedelta(minutes=10)))
+        job.refresh_from_db()
+        self.assertEqual((Job.JobStatus.FAILED, 2), (job.status, job.attempts))
+        self.assertEqual(jobs.STALE_ERROR, job.error)
+
+    def test_stale_worker_does_not_overwrite(self):
+        """
+        Функция тестирования того, что воркер, задачу которого уже вернули в очередь, не сохраняет результат
+        """
+        job, _ = jobs.enqueue('export_notes', author=self.test_user)
+        jobs.claim(1)
+
+        def requeue_during_run(job):
+            Job.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))
+            jobs.requeue_stale(timedelta(minutes=10))
+            return []
+
+        with mock.patch.dict(jobs.REGISTRY, {'export_notes': requeue_during_run}):
+            self.assertEqual(Job.JobStatus.QUEUED, jobs.run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(Job.JobStatus.QUEUED, job.status)
+        self.assertIsNone(job.result)
+
+    def test_backoff_grows(self):
+        """
+        Функция тестирования роста задержки и ее ограничения сверху
+        """
+        self.assertEqual(timedelta(seconds=10), jobs.backoff(1))
+        self.assertEqual(timedelta(seconds=40), jobs.backoff(3))
+        self.assertEqual(jobs.BACKOFF_MAX, jobs.backoff(50))
+
+
+class TestRunJobsCommand(TransactionTestCase):
+    """
+    Тестирование воркера с пулом потоков.
+    В тестовой базе в памяти с общим кэшем SQLite не ждет блокировку таблицы, а сразу падает,
+    поэтому воркер запускается с одним потоком и главный поток не пишет одновременно с ним
+    """
+    def test_burst_runs_all_jobs(self):
+        """
+        Функция тестирования того, что воркер выполняет все задачи очереди и завершается
+        """
+        author = User.objects.create(username='worker_user')
+        NoteToDo.objects.create(title='note', author=author)
+        for _ in range(5):
+            jobs.enqueue('export_notes', author=author)
+
+        call_command('run_jobs', '--burst', '--workers', '1', '--poll-interval', '5', stdout=StringIO())
+
+        self.assertEqual(5, Job.objects.filter(status=Job.JobStatus.DONE).count())
+
+    @mock.patch.dict(jobs.REGISTRY, {'slow': slow_job})
+    def test_heartbeat_while_running(self):
+        """
+        Функция тестирования того, что долгая задача обновляет сигнал воркера и не считается зависшей
+        """
+        job, _ = jobs.enqueue('slow')
+        jobs.claim(1)
+        started_at = Job.objects.get().heartbeat_at
+
+        self.assertEqual(Job.JobStatus.DONE, jobs.run_job(job.pk, heartbeat=timedelta(seconds=0.05)))
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, started_at + timedelta(seconds=0.1))
+        self.assertEqual('done', job.result)
+
+    def test_report_worker_failure(self):
+        """
+        Функция тестирования того, что упавший воркер выводится в stderr, а не прерывает команду
+        """
+        future = Future()
+        future.set_exception(RuntimeError('boom'))
+        stderr = StringIO()
+        run_jobs.Command(stdout=StringIO(), stderr=stderr).report(7, future)
+        self.assertIn("Задача #7: воркер упал: RuntimeError('boom')", stderr.getvalue())
@@ -0,0 +1,49 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase
+
+from note_todo.models import NoteToDo
+
+
+class TestLoadtestCommand(LiveServerTestCase):
+    """
+    Тестирование нагрузочного теста против живого сервера
+    """
+    def test_report(self):
+        """
+        Функция тестирования того, что все сценарии выполняются и попадают в отчет
+        """
+        user = User.objects.create_user(username='load_user', password='load_password')
+        NoteToDo.objects.create(title='seed', author=user)
+
+        out = StringIO()
+        call_command('loadtest', '--url', self.live_server_url, '--rps', '60', '--duration', '0.5',
+                     '--concurrency', '2', '--user', 'load_user', '--password', 'load_password', stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(30, report['total']['requests'])
+        self.assertEqual(0, report['total']['errors'])
+        self.assertEqual(30, sum(report['total']['histogram_ms'].values()))
+        self.assertLessEqual(report['total']['latency_ms']['p50'], report['total']['latency_ms']['p99'])
+        self.assertTrue(NoteToDo.objects.filter(title__startswith='loadtest').exists())
+
+    def test_anonymous_mix(self):
+        """
+        Функция тестирования того, что без авторизации сценарии записи не запускаются,
+        а detail ждет, пока станут известны id заметок
+        """
+        with self.assertRaises(CommandError):
+            call_command('loadtest', '--url', self.live_server_url, '--mix', 'list=1,create=1')
+
+        out = StringIO()
+        call_command('loadtest', '--url', self.live_server_url, '--rps', '60', '--duration', '0.5',
+                     '--concurrency', '2', stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(30, report['total']['requests'])
+        self.assertEqual(0, report['total']['errors'])
+        self.assertEqual({'comment_filter', 'filter', 'list'}, set(report['scenarios']))
@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.wsgi import get_wsgi_application
+from django.test import override_settings
+
+from examen import cache_url, prefork
+from note_todo_api import snapshots
+from note_todo_api.management.commands import serve
+from .base import NoteToDoAPITestCase
+
+
+class TestPrefork(NoteToDoAPITestCase):
+    """
+    Тестирование прогрева приложения перед форком воркеров
+    """
+    def test_warm_up_requests_urls(self):
+        """
+        Функция тестирования того, что прогрев проходит по всем URL и сообщает статусы ответов
+        """
+        messages = []
+        prefork.warm_up(get_wsgi_application(), ['/api/note/public/', '/api/missing/'], messages.append)
+
+        self.assertIn('Прогрев /api/note/public/: 200 OK', messages)
+        self.assertIn('Прогрев /api/missing/: 404 Not Found', messages)
+        self.assertTrue(messages[-1].startswith('Прогрев занял'))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_warm_up_keeps_cache(self):
+        """
+        Функция тестирования того, что воркеры получают ленту, отрендеренную при прогреве
+        """
+        messages = []
+        prefork.warm_up(get_wsgi_application(), ['/api/note/public/'], messages.append)
+
+        self.assertIn('Прогрев /api/note/public/: 200 OK', messages)
+        self.assertIsNotNone(cache.get(snapshots.INDEX_KEY))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_serve_refuses_workers_with_local_sessions(self):
+        """
+        Функция тестирования того, что несколько воркеров не запускаются с сессиями в кэше процесса,
+        а без --workers запускается один
+        """
+        self.assertEqual(['AUTH_USER_CACHE_ALIAS', 'PUBLIC_FEED_CACHE_ALIAS', 'SESSION_CACHE_ALIAS'],
+                         prefork.process_local_caches())
+        with self.assertRaisesMessage(CommandError, 'SESSION_CACHE_ALIAS'):
+            call_command('serve', workers=2)
+
+        stderr = StringIO()
+        with mock.patch.object(serve, 'PreforkServer') as server, mock.patch('os.cpu_count', return_value=4):
+            call_command('serve', stderr=stderr)
+        self.assertEqual(1, server.call_args.kwargs['workers'])
+        self.assertIn('запускается один воркер', stderr.getvalue())
+
+    def test_cache_url(self):
+        """
+        Функция тестирования настройки кэша из CACHE_URL
+        """
+        self.assertEqual('django.core.cache.backends.redis.RedisCache',
+                         cache_url.parse('redis://127.0.0.1:6379/0')['BACKEND'])
+        self.assertEqual(['a:11211', 'b:11211'], cache_url.parse('memcached://a:11211,b:11211')['LOCATION'])
+        self.assertEqual('examen', cache_url.parse('locmem://')['LOCATION'])
+        with self.assertRaises(ImproperlyConfigured):
+            cache_url.parse('file:///tmp/cache')
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'smaps_rollup есть только в Linux')
+    def test_rss_kb(self):
+        """
+        Функция тестирования чтения RSS и PSS текущего процесса
+        """
+        rss, pss = prefork.rss_kb(os.getpid())
+        self.assertGreater(rss, 0)
+        self.assertGreater(pss, 0)
+        self.assertEqual((None, None), prefork.rss_kb(-1))
@@ -0,0 +1,88 @@
+import os
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework import status
+
+from note_todo_api import profiling
+from note_todo_api.views import NoteToDoSortListAPIView
+from .base import NoteToDoAPITestCase
+
+SORT_VIEW = 'note_todo_api.views.NoteToDoSortListAPIView'
+
+
+def slow_get_queryset(self):
+    time.sleep(0.05)
+    return NoteToDoSortListAPIView.queryset.all()
+
+
+@override_settings(API_PROFILING_ENABLED=True, API_PROFILING_SAMPLE_RATE=1.0, API_PROFILING_INTERVAL=0.001)
+class TestProfiling(NoteToDoAPITestCase):
+    """
+    Тестирование сэмплирующего профилировщика и профилирования по подписанному заголовку
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+
+    def setUp(self):
+        profiling.store.reset()
+        self.client.force_authenticate(self.staff)
+
+    @mock.patch.object(NoteToDoSortListAPIView, 'get_queryset', slow_get_queryset)
+    def test_sampled_request_collapsed_stacks(self):
+        """
+        Функция тестирования того, что стеки медленного запроса попадают в отчет своего представления
+        """
+        self.client.get('/api/note/sort/')
+
+        resp = self.client.get(f'/api/profiling/?view={SORT_VIEW}')
+        lines = resp.content.decode().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.startswith(SORT_VIEW + ';') for line in lines))
+        self.assertTrue(any('slow_get_queryset' in line for line in lines))
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+
+    @override_settings(API_PROFILING_SAMPLE_RATE=0)
+    def test_signed_header_runs_cprofile(self):
+        """
+        Функция тестирования профилирования cProfile только с правильно подписанным заголовком
+        """
+        self.client.get('/api/note/sort/', HTTP_X_PROFILE='forged')
+        self.assertEqual('', profiling.store.pstats_text(SORT_VIEW))
+
+        token = self.client.post('/api/profiling/').data['token']
+        self.client.get('/api/note/sort/', HTTP_X_PROFILE=token)
+
+        resp = self.client.get(f'/api/profiling/?view={SORT_VIEW}&report=pstats')
+        self.assertIn('get_queryset', resp.content.decode())
+        self.assertEqual('', profiling.store.collapsed())
+
+    @override_settings(API_PROFILING_ENABLED=False)
+    def test_signed_header_without_sampling(self):
+        """
+        Функция тестирования того, что выключенный сэмплер не отключает профилирование по заголовку,
+        а ответы указывают воркер, в котором лежат данные
+        """
+        self.client.get('/api/note/sort/')
+        self.assertEqual('', profiling.store.collapsed())
+
+        token = self.client.post('/api/profiling/').data['token']
+        resp = self.client.get('/api/note/sort/', HTTP_X_PROFILE=token)
+        self.assertEqual(str(os.getpid()), resp[profiling.WORKER_HEADER])
+
+        resp = self.client.get(f'/api/profiling/?view={SORT_VIEW}&report=pstats')
+        self.assertIn('get_queryset', resp.content.decode())
+        self.assertEqual(str(os.getpid()), resp[profiling.WORKER_HEADER])
+
+    def test_staff_only(self):
+        """
+        Функция тестирования того, что отчеты доступны только персоналу
+        """
+        self.client.force_authenticate(self.test_user)
+        resp = self.client.get('/api/profiling/')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, resp.status_code)
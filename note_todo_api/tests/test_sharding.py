@@ -0,0 +1,136 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from note_todo import sharding
+from note_todo.models import NoteToDo, Comment
+from .base import response_data
+
+SHARDS = ['shard_0', 'shard_1']
+
+
+@override_settings(NOTE_TODO_SHARDS=SHARDS)
+class TestSharding(APITestCase):
+    """
+    Тестирование шардирования заметок по автору
+    """
+    databases = {'default', *SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        for alias in SHARDS:
+            sharding.seed_pk_range(alias)
+        # Пользователи с pk разной четности попадают в разные шарды
+        users = [User.objects.create(username=f'user_{i}') for i in range(2)]
+        cls.even, cls.odd = sorted(users, key=lambda user: user.pk % 2)
+
+    def setUp(self):
+        self.client.force_authenticate(self.even)
+
+    def test_users_mirrored(self):
+        """
+        Функция тестирования копирования пользователей в шарды
+        """
+        for alias in SHARDS:
+            self.assertEqual({'user_0', 'user_1'}, set(User.objects.using(alias).values_list('username', flat=True)))
+
+    def test_create_goes_to_author_shard(self):
+        """
+        Функция тестирования записи заметки и ее комментария в шард автора заметки
+        """
+        resp = self.client.post('/api/note/', data={'title': 'even note'}, format='json')
+        self.assertEqual(status.HTTP_201_CREATED, resp.status_code)
+
+        note = NoteToDo.objects.using('shard_0').get(title='even note')
+        self.assertEqual(resp.data['id'], note.pk)
+        self.assertEqual(sharding.PK_RANGE + 1, note.pk)
+        self.assertFalse(NoteToDo.objects.using('shard_1').exists())
+        self.assertFalse(NoteToDo.objects.using('default').exists())
+
+        Comment.objects.create(note_todo=note, author=self.odd, rating=Comment.Rating.GOOD)
+        self.assertEqual(1, note.comment_set.count())
+        self.assertFalse(Comment.objects.using('shard_1').exists())
+
+    def test_detail_found_in_any_shard(self):
+        """
+        Функция тестирования чтения и изменения заметки по id без знания ее шарда
+        """
+        note = NoteToDo.objects.create(title='odd note', author=self.odd)
+        self.client.force_authenticate(self.odd)
+
+        resp = self.client.patch(f'/api/note/{note.pk}/', data={'title': 'changed'}, format='json')
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertEqual('changed', NoteToDo.objects.using('shard_1').get(pk=note.pk).title)
+        self.assertEqual(status.HTTP_404_NOT_FOUND, self.client.get(f'/api/note/{note.pk + 1}/').status_code)
+
+        self.assertEqual(status.HTTP_204_NO_CONTENT, self.client.delete(f'/api/note/{note.pk}/').status_code)
+        self.assertFalse(NoteToDo.objects.using('shard_1').exists())
+
+    def test_scatter_merges_by_ordering(self):
+        """
+        Функция тестирования слияния результатов шардов в порядке запроса
+        """
+        NoteToDo.objects.bulk_create([
+            NoteToDo(title=f'{author.username} {i}', author=author, public=True, importance=i % 2 == 0)
+            for i in range(3) for author in (self.even, self.odd)
+        ])
+
+        notes = sorted([*NoteToDo.objects.using('shard_0'), *NoteToDo.objects.using('shard_1')],
+                       key=lambda note: note.pk)
+
+        resp = self.client.get('/api/note/public/')
+        self.assertEqual([note.title for note in notes], [note['title'] for note in json.loads(resp.content)])
+
+        resp = self.client.get('/api/note/filter/', {'importance': True})
+        self.assertEqual(4, len(response_data(resp)))
+        resp = self.client.get('/api/note/sort/')
+        self.assertEqual([True, True, True, True, False, False], [note['importance'] for note in response_data(resp)])
+
+        merged = sharding.scatter(NoteToDo.objects.order_by('-importance', '-pk')[1:4])
+        expected = sorted(notes, key=lambda note: (not note.importance, -note.pk))[1:4]
+        self.assertEqual([note.pk for note in expected], [note.pk for note in merged])
+
+    def test_my_notes_from_one_shard(self):
+        """
+        Функция тестирования ленты пользователя, которая читается только из его шарда
+        """
+        NoteToDo.objects.create(title='mine', author=self.even)
+        NoteToDo.objects.create(title='other', author=self.odd)
+
+        with self.assertNumQueries(1, using='shard_0'), self.assertNumQueries(0, using='shard_1'):
+            resp = self.client.get('/api/note/mine/')
+        self.assertEqual(['mine'], [note['title'] for note in resp.data['results']])
+
+    def test_rebalance_moves_notes_with_comments(self):
+        """
+        Функция тестирования переноса заметок, созданных до шардирования, в шарды их авторов
+        """
+        for author in (self.even, self.odd):
+            note = NoteToDo.objects.using('default').create(title=author.username, author=author)
+            Comment.objects.using('default').create(note_todo=note, author=self.even)
+        created_at = NoteToDo.objects.using('default').get(author=self.odd).created_at
+
+        self.assertEqual({'shard_0': 1, 'shard_1': 1}, sharding.rebalance('default', dry_run=True))
+        self.assertEqual({'shard_0': 1, 'shard_1': 1}, sharding.rebalance('default'))
+
+        self.assertFalse(NoteToDo.objects.using('default').exists())
+        self.assertFalse(Comment.objects.using('default').exists())
+        moved = NoteToDo.objects.using('shard_1').get()
+        self.assertEqual((self.odd.pk, created_at), (moved.author_id, moved.created_at))
+        self.assertEqual(1, moved.comment_set.count())
+        self.assertEqual(self.odd.username, self.client.get(f'/api/note/{moved.pk}/').data['title'])
+        self.assertEqual({}, sharding.rebalance('shard_1'))
+
+    def test_user_delete_removes_shard_data(self):
+        """
+        Функция тестирования удаления пользователя вместе с его копиями и заметками в шардах
+        """
+        NoteToDo.objects.create(title='odd note', author=self.odd)
+        self.odd.delete()
+
+        self.assertFalse(NoteToDo.objects.using('shard_1').exists())
+        for alias in SHARDS:
+            self.assertEqual([self.even.pk], list(User.objects.using(alias).values_list('pk', flat=True)))
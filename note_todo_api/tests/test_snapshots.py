@@ -0,0 +1,172 @@
+import json
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+
+from note_todo.models import NoteToDo, Comment
+from note_todo import purge
+from note_todo_api import serializers, snapshots
+from .base import NoteToDoAPITestCase
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestPublicFeedSnapshots(NoteToDoAPITestCase):
+    """
+    Тестирование ленты публичных заметок из заранее отрендеренных страниц
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.public_note = NoteToDo.objects.create(title="Public_title", author=cls.test_user, public=True)
+        Comment.objects.create(author=cls.test_user, note_todo=cls.public_note, rating=Comment.Rating.GOOD)
+
+    def setUp(self):
+        cache.clear()
+
+    def expected(self):
+        queryset = NoteToDo.objects.filter(public=True).order_by('pk')
+        return json.loads(json.dumps(serializers.NoteToDoDetailSerializer(instance=queryset, many=True).data))
+
+    def test_feed_served_without_queries(self):
+        """
+        Функция тестирования того, что после первого запроса лента отдается без обращений к базе
+        """
+        first = self.client.get('/api/note/public/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/note/public/')
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual('application/json', second['Content-Type'])
+        self.assertEqual(self.expected(), json.loads(second.content))
+
+    def test_only_changed_page_rebuilt(self):
+        """
+        Функция тестирования перестройки только той страницы, где изменилась заметка
+        """
+        self.client.get('/api/note/public/')
+        far_note = NoteToDo.objects.create(pk=snapshots.CHUNK_SIZE * 5, title="Far", author=self.test_user)
+
+        with mock.patch.object(snapshots, 'rebuild_chunks', wraps=snapshots.rebuild_chunks) as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                far_note.public = True
+                far_note.save()
+
+        rebuild.assert_called_once_with({5})
+        self.assertEqual([0, 5], cache.get(snapshots.INDEX_KEY))
+        self.assertEqual(self.expected(), self.client.get('/api/note/public/').json())
+
+    def test_comment_update_and_purge(self):
+        """
+        Функция тестирования того, что комментарии и пакетное удаление обновляют ленту
+        """
+        self.client.get('/api/note/public/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(author=self.test_user, note_todo=self.public_note, rating=Comment.Rating.EXCELLENT)
+        self.assertEqual(2, len(self.client.get('/api/note/public/').json()[0]['comment_set']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            purge.purge_notes(NoteToDo.objects.filter(pk=self.public_note.pk))
+        self.assertEqual([], self.client.get('/api/note/public/').json())
+
+    def test_optimistic_update_rebuilds(self):
+        """
+        Функция тестирования того, что изменение через проверку версии тоже попадает в ленту
+        """
+        self.client.get('/api/note/public/')
+        self.client.force_authenticate(self.test_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/note/{self.public_note.pk}/', data={'title': 'Renamed'})
+
+        self.assertEqual('Renamed', self.client.get('/api/note/public/').json()[0]['title'])
+
+    def test_author_rename_rebuilds(self):
+        """
+        Функция тестирования того, что смена имени автора обновляет его публичные заметки
+        """
+        self.client.get('/api/note/public/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_user.username = 'renamed_user'
+            self.test_user.save()
+
+        self.assertEqual('renamed_user', self.client.get('/api/note/public/').json()[0]['author'])
+
+    def test_stale_full_rebuild_not_written(self):
+        """
+        Функция тестирования того, что полная перестройка, прочитавшая базу до изменения,
+        не записывает поверх страницы, перестроенной после него
+        """
+        render = snapshots.render
+        calls = []
+
+        def render_then_change(notes):
+            blob = render(notes)
+            if not calls:
+                calls.append(notes)
+                NoteToDo.objects.filter(pk=self.public_note.pk).update(title='Changed')
+                snapshots.rebuild_chunks({0})
+            return blob
+
+        with mock.patch.object(snapshots, 'render', side_effect=render_then_change):
+            stale = snapshots.rebuild_all()
+
+        self.assertEqual('Public_title', json.loads(b'[' + stale[0] + b']')[0]['title'])
+        self.assertEqual([0], cache.get(snapshots.INDEX_KEY))
+        self.assertEqual('Changed', self.client.get('/api/note/public/').json()[0]['title'])
+
+    def test_rebuild_before_reset_not_written(self):
+        """
+        Функция тестирования того, что перестройка, начатая до сброса всей ленты, ничего не записывает
+        """
+        self.client.get('/api/note/public/')
+        render = snapshots.render
+
+        def render_then_reset(notes):
+            blob = render(notes)
+            snapshots.invalidate_all()
+            return blob
+
+        with mock.patch.object(snapshots, 'render', side_effect=render_then_reset):
+            snapshots.rebuild_chunks({0})
+
+        self.assertIsNone(cache.get(snapshots.INDEX_KEY))
+        self.assertEqual(self.expected(), self.client.get('/api/note/public/').json())
+        self.assertEqual([0], cache.get(snapshots.INDEX_KEY))
+
+    def test_stale_feed_served_during_refresh(self):
+        """
+        Функция тестирования того, что по истечении PUBLIC_FEED_REFRESH лента отдается из прежних страниц,
+        а полную перестройку запускает один запрос
+        """
+        first = self.client.get('/api/note/public/').content
+        cache.delete(snapshots.FRESH_KEY)
+        NoteToDo.objects.filter(pk=self.public_note.pk).update(title='Changed')
+
+        with mock.patch.object(snapshots, 'refresh_in_background') as refresh:
+            with self.assertNumQueries(0):
+                responses = [self.client.get('/api/note/public/').content for _ in range(3)]
+
+        refresh.assert_called_once_with()
+        self.assertEqual([first] * 3, responses)
+
+    def test_cold_feed_built_once(self):
+        """
+        Функция тестирования того, что без индекса запрос ждет ленту, которую строит другой запрос
+        """
+        cache.add(snapshots.REBUILD_KEY, True)
+        threading.Timer(0.1, lambda: cache.set(snapshots.INDEX_KEY, [])).start()
+
+        with self.assertNumQueries(0):
+            resp = self.client.get('/api/note/public/')
+        self.assertEqual(b'[]', resp.content)
+
+    def test_long_timeout(self):
+        """
+        Функция тестирования того, что страницы живут PUBLIC_FEED_TIMEOUT
+        """
+        with mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            self.client.get('/api/note/public/')
+        self.assertEqual({settings.PUBLIC_FEED_TIMEOUT}, {call.kwargs['timeout'] for call in set_many.call_args_list})
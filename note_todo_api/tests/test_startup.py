@@ -0,0 +1,63 @@
+import os
+import unittest
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.urls import resolve
+
+from examen import startup
+
+ATTEMPTS = 3
+
+
+def imported_modules(tree):
+    for name, _, _, children in tree:
+        yield name
+        yield from imported_modules(children)
+
+
+class TestStartup(SimpleTestCase):
+    """
+    Тестирование времени холодного старта и отложенной загрузки представлений
+    """
+    def test_lazy_view_behaves_like_view(self):
+        """
+        Функция тестирования того, что отложенное представление видно Django как настоящее
+        """
+        match = resolve('/api/note/mine/')
+        self.assertIsInstance(match.func, startup.LazyView)
+        self.assertEqual('note_todo_api.views.MyNoteToDoListAPIView', match._func_path)
+        self.assertTrue(match.func.csrf_exempt)
+
+    def test_views_not_imported_on_check(self):
+        """
+        Функция тестирования того, что manage.py check не импортирует представления и сериализаторы API
+        """
+        _, tree, _ = startup.measure('check', profile=True)
+        modules = set(imported_modules(tree))
+        # URLconf загружен: include() импортирует его без записи в importtime, но видны его импорты
+        self.assertIn('login.views', modules)
+        self.assertFalse({'note_todo_api.views', 'note_todo_api.serializers'} & modules)
+
+    @unittest.skipUnless(os.environ.get('STARTUP_BUDGET_CHECK'),
+                         'Замер по часам зависит от машины: включается STARTUP_BUDGET_CHECK=1')
+    def test_cold_start_within_budget(self):
+        """
+        Функция тестирования бюджета холодного старта STARTUP_BUDGET.
+        Берется лучшая из нескольких попыток, чтобы не падать от случайной нагрузки на машину.
+        Без STARTUP_BUDGET_CHECK тест пропускается: от нагрузки на общей машине он падает случайно,
+        а структуру старта проверяет test_views_not_imported_on_check
+        """
+        for stage, budget in settings.STARTUP_BUDGET.items():
+            with self.subTest(stage=stage):
+                timings = []
+                for _ in range(ATTEMPTS):
+                    elapsed, _, stdout = startup.measure(stage)
+                    timings.append(elapsed)
+                    if elapsed <= budget:
+                        break
+                if stage == 'request':
+                    self.assertIn('403', stdout)
+                self.assertLessEqual(min(timings), budget,
+                                     f'Холодный старт {stage}: {min(timings) * 1000:.0f} мс, '
+                                     f'бюджет {budget * 1000:.0f} мс (manage.py startup_profile {stage})')
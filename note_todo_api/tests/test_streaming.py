@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.handlers.asgi import ASGIHandler
+from django.test import override_settings
+
+from note_todo.models import NoteToDo, Comment
+from note_todo_api import streaming
+from .base import NoteToDoAPITestCase
+
+LIST_URLS = (
+    '/api/note/',
+    '/api/note/?rating_order=desc',
+    '/api/note/filter/?public=True',
+    '/api/note/sort/',
+    '/api/note/filter/status/?note_status=0&note_status=2',
+    '/api/note/filter/comment/',
+    '/api/note/filter/comment/?rating=5',
+)
+
+
+@override_settings(NOTE_LIST_STREAMING=True)
+@mock.patch.object(streaming, 'CHUNK_SIZE', 2)
+class TestStreamingLists(NoteToDoAPITestCase):
+    """
+    Тестирование того, что потоковые списки совпадают по байтам с ответами сериализаторов
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        titles = ('Заметка "в кавычках"', 'back\\slash\tи\nперенос', 'separators    ', 'emoji \U0001F600 line\u2028sep')
+        for index, title in enumerate(titles):
+            note = NoteToDo.objects.create(title=title, content=title[::-1], author=cls.test_user,
+                                           public=bool(index % 2), importance=index < 2,
+                                           note_status=index % 3)
+            for rating in range(index + 1):
+                Comment.objects.create(author=cls.test_user, note_todo=note, rating=rating)
+
+    def test_same_bytes_as_serializer(self):
+        """
+        Функция тестирования побайтового совпадения с обычным рендерингом
+        """
+        for url in LIST_URLS:
+            with self.subTest(url=url):
+                streamed = self.client.get(url)
+                self.assertTrue(streamed.streaming)
+                with override_settings(NOTE_LIST_STREAMING=False):
+                    rendered = self.client.get(url)
+                self.assertFalse(rendered.streaming)
+
+                self.assertEqual(rendered.content, b''.join(streamed.streaming_content))
+                self.assertEqual(rendered['Content-Type'], streamed['Content-Type'])
+
+    async def test_asgi_same_bytes(self):
+        """
+        Функция тестирования списков под ASGI-обработчиком: он читает тело ответа в событийном цикле,
+        где запросы к базе запрещены
+        """
+        handler = ASGIHandler()
+
+        async def get(url):
+            path, _, query = url.partition('?')
+            scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+                     'headers': [(b'host', b'testserver')]}
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await handler(scope, receive, send)
+            return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+        for url in LIST_URLS:
+            with self.subTest(url=url):
+                status, body = await get(url)
+                self.assertEqual(200, status)
+                with override_settings(NOTE_LIST_STREAMING=False):
+                    rendered = await get(url)
+                self.assertEqual(rendered, (status, body))
+
+    def test_browsable_api_not_streamed(self):
+        """
+        Функция тестирования того, что HTML-версия API рендерится как раньше
+        """
+        resp = self.client.get('/api/note/', HTTP_ACCEPT='text/html')
+        self.assertFalse(resp.streaming)
@@ -2,7 +2,9 @@ import unittest
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
-from note_todo.models import NoteToDo
+from note_todo.models import NoteToDo, Comment
+from note_todo_api import filters
+from .base import NoteToDoAPITestCase, response_data
 
 
 class TestNoteToDoListCreateAPIView(APITestCase):
@@ -21,9 +23,8 @@ class TestNoteToDoListCreateAPIView(APITestCase):
         resp = self.client.get(url)
         self.assertEqual(status.HTTP_200_OK, resp.status_code)
 
-        response_data = resp.data
         expected_data = []
-        self.assertEqual(expected_data, response_data)
+        self.assertEqual(expected_data, response_data(resp))
 
     def test_list_object(self):
         """
@@ -38,8 +39,7 @@ class TestNoteToDoListCreateAPIView(APITestCase):
         resp = self.client.get(url)
         self.assertEqual(status.HTTP_200_OK, resp.status_code)
 
-        response_data = resp.data
-        self.assertEqual(1, len(response_data))
+        self.assertEqual(1, len(response_data(resp)))
 
     @unittest.skip("Еще не доработала")
     def test_create_object(self):
@@ -60,15 +60,10 @@ class TestNoteToDoListCreateAPIView(APITestCase):
         self.assertTrue(NoteToDo.objects.exists(title=new_title))
 
 
-class TestNoteToDoDetailAPIView(APITestCase):
+class TestNoteToDoDetailAPIView(NoteToDoAPITestCase):
     """
     Тестирование детальной информации о записях
     """
-    @classmethod
-    def setUpTestData(cls):
-        test_user = User.objects.create(username="test_user")
-        NoteToDo.objects.create(title="Test_title", author=test_user)
-
     @unittest.skip("Ошибка 301")
     def test_retrieve_objects(self):
         note_pk = 6
@@ -94,15 +89,10 @@ class TestNoteToDoDetailAPIView(APITestCase):
         self.assertEqual(status.HTTP_404_NOT_FOUND, resp.status_code)
 
 
-class TestNoteToDoFilterCommentListAPIView(APITestCase):
+class TestNoteToDoFilterCommentListAPIView(NoteToDoAPITestCase):
     """
     Тестирование класса фильтрации комментариев
     """
-    @classmethod
-    def setUpTestData(cls):
-        test_user = User.objects.create(username="test_user")
-        NoteToDo.objects.create(title="Test_title", author=test_user)
-
     def test_does_not_exists_rating(self):
         """
         Функция тестирования несуществующего значения рейтинга
@@ -145,15 +135,10 @@ class TestNoteToDoFilterCommentListAPIView(APITestCase):
         self.assertEqual(status.HTTP_400_BAD_REQUEST, resp.status_code)
 
 
-class TestNoteToDoFilterStatusListAPIView(APITestCase):
+class TestNoteToDoFilterStatusListAPIView(NoteToDoAPITestCase):
     """
     Тестирование класса статуса заметки
     """
-    @classmethod
-    def setUpTestData(cls):
-        test_user = User.objects.create(username="test_user")
-        NoteToDo.objects.create(title="Test_title", author=test_user)
-
     def test_does_not_exists_status(self):
         """
         Функция тестирования несуществующего значения статуса, у нас 0, 1, 2
@@ -194,3 +179,229 @@ class TestNoteToDoFilterStatusListAPIView(APITestCase):
 
         resp = self.client.get(url)
         self.assertEqual(status.HTTP_400_BAD_REQUEST, resp.status_code)
+
+
+class TestNoteToDoRatingFilter(APITestCase):
+    """
+    Тестирование фильтрации и сортировки заметок по рейтингу комментариев
+    """
+    @classmethod
+    def setUpTestData(cls):
+        test_user = User.objects.create(username="test_user")
+        cls.good_note = NoteToDo.objects.create(title="good", author=test_user)
+        cls.bad_note = NoteToDo.objects.create(title="bad", author=test_user)
+        cls.empty_note = NoteToDo.objects.create(title="empty", author=test_user)
+
+        for rating in (Comment.Rating.GOOD, Comment.Rating.EXCELLENT, Comment.Rating.WITHOUT_RATING):
+            Comment.objects.create(author=test_user, note_todo=cls.good_note, rating=rating)
+        for rating in (Comment.Rating.TERRIBLE, Comment.Rating.BADLY):
+            Comment.objects.create(author=test_user, note_todo=cls.bad_note, rating=rating)
+
+    def test_min_rating(self):
+        """
+        Функция тестирования фильтра по минимальному среднему рейтингу
+        """
+        resp = self.client.get('/api/note/filter/?min_rating=4')
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertEqual([self.good_note.pk], [note['id'] for note in response_data(resp)])
+
+    def test_has_rating(self):
+        """
+        Функция тестирования фильтра по наличию комментария с заданным рейтингом
+        """
+        resp = self.client.get('/api/note/filter/?has_rating=1&has_rating=5')
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertEqual({self.good_note.pk, self.bad_note.pk}, {note['id'] for note in response_data(resp)})
+
+    def test_rating_order(self):
+        """
+        Функция тестирования сортировки по среднему рейтингу, заметки без оценок в конце
+        """
+        resp = self.client.get('/api/note/?rating_order=desc')
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertEqual([self.good_note.pk, self.bad_note.pk, self.empty_note.pk],
+                         [note['id'] for note in response_data(resp)])
+
+    def test_invalid_min_rating(self):
+        """
+        Функция тестирования невалидного значения минимального рейтинга
+        """
+        resp = self.client.get('/api/note/filter/?min_rating=100')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, resp.status_code)
+
+    def test_single_query(self):
+        """
+        Функция тестирования того, что все условия по рейтингу выполняются одним запросом
+        """
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/note/filter/status/?note_status=0&min_rating=1&has_rating=5&rating_order=asc')
+            response_data(resp)
+
+    def test_rating_index_used(self):
+        """
+        Функция тестирования того, что подзапросы по комментариям используют индекс (note_todo, rating)
+        """
+        queryset = filters.rating_filter(NoteToDo.objects.all(), {'has_rating': [5], 'min_rating': 1})
+        self.assertIn('comment_note_rating_idx', queryset.explain())
+
+
+class TestNoteToDoOptimisticLocking(NoteToDoAPITestCase):
+    """
+    Тестирование изменения заметки с проверкой версии
+    """
+    def setUp(self):
+        self.client.force_authenticate(self.test_user)
+        self.url = f"/api/note/{self.note.pk}/"
+
+    def test_patch_increments_version(self):
+        """
+        Функция тестирования увеличения версии после изменения
+        """
+        resp = self.client.patch(self.url, data={"title": "new_title", "version": 0})
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertEqual(1, resp.data["version"])
+        self.assertEqual('"1"', resp["ETag"])
+        self.assertEqual("new_title", NoteToDo.objects.get(pk=self.note.pk).title)
+
+    def test_stale_version_conflict(self):
+        """
+        Функция тестирования конфликта при изменении устаревшей версии
+        """
+        self.client.put(self.url, data={"title": "first"}, HTTP_IF_MATCH='"0"')
+        resp = self.client.put(self.url, data={"title": "second"}, HTTP_IF_MATCH='"0"')
+        self.assertEqual(status.HTTP_412_PRECONDITION_FAILED, resp.status_code)
+
+        resp = self.client.put(self.url, data={"title": "second", "version": 0})
+        self.assertEqual(status.HTTP_409_CONFLICT, resp.status_code)
+        self.assertEqual("first", NoteToDo.objects.get(pk=self.note.pk).title)
+
+    def test_if_match_any(self):
+        """
+        Функция тестирования того, что If-Match: * подходит к любой версии
+        """
+        self.client.patch(self.url, data={"title": "first"})
+        resp = self.client.patch(self.url, data={"title": "second"}, HTTP_IF_MATCH='*')
+
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertEqual(2, resp.data["version"])
+
+    def test_if_match_list(self):
+        """
+        Функция тестирования сравнения списка ETag по одному и отказа для слабых ETag
+        """
+        resp = self.client.patch(self.url, data={"title": "first"}, HTTP_IF_MATCH='"5", "0"')
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+
+        resp = self.client.patch(self.url, data={"title": "second"}, HTTP_IF_MATCH='"0", W/"1"')
+        self.assertEqual(status.HTTP_412_PRECONDITION_FAILED, resp.status_code)
+        self.assertEqual("first", NoteToDo.objects.get(pk=self.note.pk).title)
+
+    def test_invalid_version(self):
+        """
+        Функция тестирования невалидного значения версии
+        """
+        resp = self.client.patch(self.url, data={"title": "new_title", "version": "abc"})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, resp.status_code)
+
+
+class TestNoteToDoPurgeAPIView(NoteToDoAPITestCase):
+    """
+    Тестирование быстрого удаления заметок пользователя
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = User.objects.create(username="other_user")
+        cls.other_note = NoteToDo.objects.create(title="Other_title", author=cls.other_user)
+        for _ in range(3):
+            Comment.objects.create(author=cls.other_user, note_todo=cls.note)
+        Comment.objects.create(author=cls.test_user, note_todo=cls.other_note)
+
+    def test_anonymous_forbidden(self):
+        """
+        Функция тестирования запрета удаления без авторизации
+        """
+        resp = self.client.delete('/api/note/purge/')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, resp.status_code)
+        self.assertTrue(NoteToDo.objects.filter(pk=self.note.pk).exists())
+
+    def test_purge_own_notes(self):
+        """
+        Функция тестирования удаления своих заметок вместе с чужими комментариями к ним
+        """
+        self.client.force_authenticate(self.test_user)
+        resp = self.client.delete('/api/note/purge/?comments=true')
+
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        self.assertEqual({'notes': 1, 'comments': 4}, resp.data)
+        self.assertFalse(NoteToDo.objects.filter(author=self.test_user).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertTrue(NoteToDo.objects.filter(pk=self.other_note.pk).exists())
+
+    def test_delete_note_with_comments(self):
+        """
+        Функция тестирования удаления одной заметки с комментариями
+        """
+        self.client.force_authenticate(self.test_user)
+        resp = self.client.delete(f'/api/note/{self.note.pk}/')
+
+        self.assertEqual(status.HTTP_204_NO_CONTENT, resp.status_code)
+        self.assertFalse(Comment.objects.filter(note_todo_id=self.note.pk).exists())
+
+
+class TestMyNoteToDoListAPIView(NoteToDoAPITestCase):
+    """
+    Тестирование ленты заметок текущего пользователя
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        NoteToDo.objects.create(title="Other_title", author=User.objects.create(username="other_user"))
+        for index in range(4):
+            NoteToDo.objects.create(title=f"mine_{index}", author=cls.test_user,
+                                    note_status=NoteToDo.NoteStatus.EXECUTE if index % 2 else NoteToDo.NoteStatus.ACTIVE)
+
+    def setUp(self):
+        self.client.force_authenticate(self.test_user)
+
+    def test_anonymous_forbidden(self):
+        """
+        Функция тестирования запрета ленты без авторизации
+        """
+        self.client.force_authenticate(None)
+        resp = self.client.get('/api/note/mine/')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, resp.status_code)
+
+    def test_only_own_notes_newest_first(self):
+        """
+        Функция тестирования того, что в ленте только свои заметки, новые сверху
+        """
+        resp = self.client.get('/api/note/mine/')
+        self.assertEqual(status.HTTP_200_OK, resp.status_code)
+        titles = [note['title'] for note in resp.data['results']]
+        self.assertEqual(['mine_3', 'mine_2', 'mine_1', 'mine_0', 'Test_title'], titles)
+
+    def test_status_filter_and_cursor(self):
+        """
+        Функция тестирования фильтра по статусу и перехода по курсору
+        """
+        resp = self.client.get('/api/note/mine/?note_status=0&ordering=created_at&page_size=2')
+        self.assertEqual(['Test_title', 'mine_0'], [note['title'] for note in resp.data['results']])
+
+        resp = self.client.get(resp.data['next'])
+        self.assertEqual(['mine_2'], [note['title'] for note in resp.data['results']])
+        self.assertIsNone(resp.data['next'])
+
+    def test_page_is_one_query(self):
+        """
+        Функция тестирования того, что страница ленты читается одним запросом без COUNT
+        """
+        with self.assertNumQueries(1):
+            self.client.get('/api/note/mine/?note_status=1&ordering=-due_to')
+
+    def test_timeline_index_used(self):
+        """
+        Функция тестирования того, что лента читается по индексу (author, note_status, created_at)
+        """
+        queryset = NoteToDo.objects.filter(author=self.test_user, note_status=0).order_by('-created_at', '-pk')
+        self.assertIn('note_author_status_created_idx', queryset.explain())
@@ -1,12 +1,22 @@
 from django.urls import path
-from . import views
+from examen.startup import lazy_view
+
+# Представления (а с ними DRF и сериализаторы) импортируются при первом запросе,
+# а не при загрузке URLconf командами manage.py
+VIEWS = 'note_todo_api.views.'
 
 urlpatterns = [
-    path('note/', views.NoteToDoListCreateAPIView.as_view()),
-    path('note/<int:pk>/', views.NoteToDoDetailAPIView.as_view()),
-    path('note/filter/', views.NoteToDoFilterListAPIView.as_view()),
-    path('note/filter/status/', views.NoteToDoFilterStatusListAPIView.as_view()),
-    path('note/sort/', views.NoteToDoSortListAPIView.as_view()),
-    path('note/filter/comment/', views.NoteToDoFilterCommentListAPIView.as_view()),
-    path('note/public/', views.PublicNoteToDoListAPIView.as_view()),
+    path('note/', lazy_view(VIEWS + 'NoteToDoListCreateAPIView')),
+    path('note/<int:pk>/', lazy_view(VIEWS + 'NoteToDoDetailAPIView')),
+    path('note/filter/', lazy_view(VIEWS + 'NoteToDoFilterListAPIView')),
+    path('note/filter/status/', lazy_view(VIEWS + 'NoteToDoFilterStatusListAPIView')),
+    path('note/sort/', lazy_view(VIEWS + 'NoteToDoSortListAPIView')),
+    path('note/filter/comment/', lazy_view(VIEWS + 'NoteToDoFilterCommentListAPIView')),
+    path('note/mine/', lazy_view(VIEWS + 'MyNoteToDoListAPIView')),
+    path('note/public/', lazy_view(VIEWS + 'PublicNoteToDoListAPIView')),
+    path('note/purge/', lazy_view(VIEWS + 'NoteToDoPurgeAPIView')),
+    path('comment/', lazy_view(VIEWS + 'CommentCreateAPIView')),
+    path('job/', lazy_view(VIEWS + 'JobCreateAPIView')),
+    path('job/<int:pk>/', lazy_view(VIEWS + 'JobDetailAPIView')),
+    path('profiling/', lazy_view(VIEWS + 'ProfilingAPIView')),
 ]
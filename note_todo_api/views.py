@@ -1,14 +1,43 @@
+import os
+from concurrent import futures
+
 from rest_framework.views import APIView
 from note_todo.models import NoteToDo, Comment
+from note_todo import purge, sharding
+from note_todo.signals import notes_changed
 from rest_framework.response import Response
 from rest_framework.request import Request
 from rest_framework.generics import ListAPIView
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from . import batching
+from . import coalescing
 from . import serializers
 from . import filters
+from . import jobs
+from . import profiling
+from . import snapshots
+from . import streaming
+from .pagination import TimelineCursorPagination
+from .models import Job
 from rest_framework import status
+from django.db import IntegrityError, OperationalError
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from django.shortcuts import get_object_or_404
 from django.db.models.functions import Trunc
-from django.db.models import DateField
+from django.db.models import DateField, F
+
+
+class ShardedListMixin:
+    """
+    Примесь к ListAPIView без пагинации, которая при шардировании собирает список из всех шардов
+    """
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None and sharding.is_enabled():
+            queryset = sharding.scatter(self.filter_queryset(self.get_queryset()))
+            return Response(self.get_serializer(queryset, many=True).data)
+        return super().list(request, *args, **kwargs)
 
 
 class NoteToDoListCreateAPIView(APIView):
@@ -17,12 +46,19 @@ class NoteToDoListCreateAPIView(APIView):
     """
     def get(self, request: Request) -> Response:
         """
-        Функция, возвращающая get запрос модели NoteToDo
+        Функция, возвращающая get запрос модели NoteToDo.
+        Принимает фильтры по рейтингу: ?min_rating=4, ?has_rating=5, ?rating_order=desc
         :param request: запрос
         :return: список заметок
         """
-        objects = NoteToDo.objects.all()
-        serializer = serializers.NoteToDoSerializer(instance=objects, many=True)
+        query_params = serializers.QueryParamsRatingFilterSerializer(data=request.query_params)
+        query_params.is_valid(raise_exception=True)
+
+        objects = filters.rating_filter(NoteToDo.objects.all(), query_params.validated_data)
+        response = streaming.stream_response(request, objects, serializers.NoteToDoSerializer)
+        if response is not None:
+            return response
+        serializer = serializers.NoteToDoSerializer(instance=sharding.scatter(objects), many=True)
 
         return Response(data=serializer.data)
 
@@ -44,6 +80,8 @@ class NoteToDoDetailAPIView(APIView):
     """
     Класс, предоставляющий детальную информацию по каждой заметке
     """
+    coalesce_scope = coalescing.PUBLIC
+
     def get(self, request: Request, pk) -> Response:
         """
         Функция, которая возвращает get запрос модели NoteToDo по конкретной записи
@@ -51,10 +89,10 @@ class NoteToDoDetailAPIView(APIView):
         :param pk: id записи
         :return: заметку по ее id
         """
-        note = get_object_or_404(NoteToDo, pk=pk)
+        note = sharding.get_object_or_404(NoteToDo.objects.all(), pk)
         serializer = serializers.NoteToDoDetailSerializer(instance=note)
 
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': f'"{note.version}"'})
 
     def put(self, request: Request, pk) -> Response:
         """
@@ -63,7 +101,7 @@ class NoteToDoDetailAPIView(APIView):
         :param pk: id заметки
         :return: измененную заметку по ее id
         """
-        note = get_object_or_404(NoteToDo, pk=pk)
+        note = sharding.get_object_or_404(NoteToDo.objects.all(), pk)
         serializer = serializers.NoteToDoDetailSerializer(instance=note,
                                                           data=request.data,
                                                           partial=True)
@@ -77,9 +115,8 @@ class NoteToDoDetailAPIView(APIView):
                 data='Вы не можете менять заметку. Ее может изменить только автор',
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer.save(author=request.user)
 
-        return Response(serializer.data)
+        return self.compare_and_swap(request, note, serializer)
 
     def patch(self, request: Request, pk) -> Response:
         """
@@ -89,7 +126,7 @@ class NoteToDoDetailAPIView(APIView):
         :param pk: id заметки
         :return: измененную заметку по ее id
         """
-        note = get_object_or_404(NoteToDo, pk=pk)
+        note = sharding.get_object_or_404(NoteToDo.objects.all(), pk)
         serializer = serializers.NoteToDoDetailSerializer(instance=note,
                                                           data=request.data,
                                                           partial=True)
@@ -101,9 +138,55 @@ class NoteToDoDetailAPIView(APIView):
                 data='Вы не можете изменить заметку. Заметку может менять только автор',
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer.save(author=request.user)
 
-        return Response(serializer.data)
+        return self.compare_and_swap(request, note, serializer)
+
+    def compare_and_swap(self, request: Request, note: NoteToDo, serializer) -> Response:
+        """
+        Функция, сохраняющая изменения заметки, только если ее версия не изменилась с момента чтения.
+        Ожидаемая версия берется из заголовка If-Match или поля version, а если клиент ее не передал -
+        из прочитанной заметки. Блокировки не используются: одновременные изменения не ждут друг друга.
+        If-Match сравнивается по RFC 9110: * подходит к любой версии, список ETag сравнивается
+        по одному, слабые ETag не совпадают ни с чем, а несовпадение дает 412.
+        Несовпадение поля version дает 409
+        :param request: запрос с изменениями
+        :param note: прочитанная заметка
+        :param serializer: провалидированный сериализатор
+        :return: измененную заметку, 412 или 409, если заметку успели изменить
+        """
+        notes = NoteToDo.objects.using(note._state.db).filter(pk=note.pk)
+        if_match = request.headers.get('If-Match')
+        if if_match is not None:
+            etags = parse_etags(if_match)
+            if etags != ['*']:
+                if f'"{note.version}"' not in etags:
+                    return Response(data='Версия заметки не совпадает с If-Match',
+                                    status=status.HTTP_412_PRECONDITION_FAILED)
+                notes = notes.filter(version=note.version)
+            conflict_status = status.HTTP_412_PRECONDITION_FAILED
+        else:
+            try:
+                expected_version = int(request.data.get('version', note.version))
+            except (TypeError, ValueError):
+                return Response(data='Версия заметки должна быть целым числом',
+                                status=status.HTTP_400_BAD_REQUEST)
+            notes = notes.filter(version=expected_version)
+            conflict_status = status.HTTP_409_CONFLICT
+
+        updated = notes.update(version=F('version') + 1, **serializer.validated_data)
+        if not updated:
+            return Response(
+                data='Заметку уже изменили. Получите актуальную версию и повторите изменение',
+                status=conflict_status
+            )
+
+        # update() не отправляет post_save: страница ленты перестраивается по notes_changed,
+        # а объединенные GET, начатые до изменения, больше не принимают новых запросов
+        notes_changed.send(sender=NoteToDo, note_ids=[note.pk], using=note._state.db)
+        note.refresh_from_db()
+        serializer = serializers.NoteToDoDetailSerializer(instance=note)
+
+        return Response(serializer.data, headers={'ETag': f'"{note.version}"'})
 
     def delete(self, request: Request, pk) -> Response:
         """
@@ -112,23 +195,142 @@ class NoteToDoDetailAPIView(APIView):
         :param pk: id заметки
         :return: сообщение об удалении заметки, если ее удалил автор
         """
-        note = get_object_or_404(NoteToDo, pk=pk)
+        note = sharding.get_object_or_404(NoteToDo.objects.all(), pk)
 
         if note.author != request.user:
             return Response(
                 data='Вы не можете удалить заметку. Заметку может удалять только автор',
                 status=status.HTTP_403_FORBIDDEN
             )
-        note.delete()
+        purge.purge_notes(NoteToDo.objects.using(note._state.db).filter(pk=note.pk))
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class PublicNoteToDoListAPIView(ListAPIView):
+class NoteToDoPurgeAPIView(APIView):
     """
-    Класс, который показывает только опубликованные записи
+    Класс, позволяющий пользователю быстро удалить все свои заметки
     """
-    queryset = NoteToDo.objects.all()
+    def delete(self, request: Request) -> Response:
+        """
+        Функция, удаляющая пакетами все заметки пользователя вместе с комментариями к ним.
+        С параметром ?comments=true удаляет и комментарии пользователя к чужим заметкам
+        :param request: запрос
+        :return: количество удаленных заметок и комментариев
+        """
+        if not request.user.is_authenticated:
+            return Response(data='Удалять заметки может только авторизованный пользователь',
+                            status=status.HTTP_403_FORBIDDEN)
+
+        totals = purge.purge_notes(sharding.for_author(NoteToDo.objects.filter(author=request.user), request.user.pk))
+        if request.query_params.get('comments') == 'true':
+            totals['comments'] += purge.purge_author_comments(request.user)
+
+        return Response(data=totals)
+
+
+class CommentCreateAPIView(APIView):
+    """
+    Класс, принимающий оценки заметок. Комментарии записываются пакетами (note_todo_api.batching)
+    """
+    def post(self, request: Request) -> Response:
+        """
+        Функция, которая сохраняет комментарий вместе с другими одновременно пришедшими
+        :param request: запрос с полями note_todo и rating
+        :return: комментарий и средний рейтинг заметки с его учетом
+        """
+        if not request.user.is_authenticated:
+            return Response(data='Оценивать заметки может только авторизованный пользователь',
+                            status=status.HTTP_403_FORBIDDEN)
+
+        serializer = serializers.CommentCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        comment = Comment(author_id=request.user.pk,
+                          note_todo_id=serializer.validated_data['note_todo'],
+                          rating=serializer.validated_data['rating'])
+        try:
+            comment = batching.save_comment(comment)
+        except (NoteToDo.DoesNotExist, IntegrityError):
+            return Response(data={'note_todo': ['Заметка не найдена']}, status=status.HTTP_400_BAD_REQUEST)
+        except (futures.TimeoutError, OperationalError):
+            # Очередь записи не успела или база занята (database is locked): клиент может повторить
+            return Response(data='Не удалось сохранить оценку, повторите позже',
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+
+        data = serializers.CommentSerializer(instance=comment).data
+        data['rating_avg'] = comment.rating_avg
+        return Response(data=data, status=status.HTTP_201_CREATED)
+
+
+class JobCreateAPIView(APIView):
+    """
+    Класс, ставящий долгие операции в очередь фоновых задач
+    """
+    def post(self, request: Request) -> Response:
+        """
+        Функция, которая ставит задачу в очередь и сразу отвечает 202.
+        Повторный запрос с тем же заголовком Idempotency-Key возвращает уже созданную задачу
+        :param request: запрос с полями name и payload
+        :return: задачу и ссылку на ее статус в заголовке Location
+        """
+        if not request.user.is_authenticated:
+            return Response(data='Ставить задачи может только авторизованный пользователь',
+                            status=status.HTTP_403_FORBIDDEN)
+
+        serializer = serializers.JobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key:
+            idempotency_key = f'{request.user.pk}:{idempotency_key}'
+        try:
+            job, created = jobs.enqueue(author=request.user,
+                                        idempotency_key=idempotency_key,
+                                        **serializer.validated_data)
+        except jobs.JobError as exc:
+            return Response(data={'name': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not created and (job.name, job.payload) != (serializer.validated_data['name'],
+                                                       serializer.validated_data.get('payload', {})):
+            return Response(data='Ключ Idempotency-Key уже использован для другой задачи',
+                            status=status.HTTP_409_CONFLICT)
+
+        return Response(data=serializers.JobSerializer(instance=job).data,
+                        status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': f'/api/job/{job.pk}/'})
+
+
+class JobDetailAPIView(APIView):
+    """
+    Класс, показывающий статус и результат фоновой задачи
+    """
+    def get(self, request: Request, pk) -> Response:
+        """
+        Функция, которая возвращает задачу по ее id. Задачу видит только ее автор,
+        а задачи без автора и чужие - только персонал
+        :param request: запрос
+        :param pk: id задачи
+        :return: статус, результат и ошибку задачи
+        """
+        if not request.user.is_authenticated:
+            return Response(data='Задачи может смотреть только авторизованный пользователь',
+                            status=status.HTTP_403_FORBIDDEN)
+        job = get_object_or_404(Job, pk=pk)
+        if job.author_id != request.user.pk and not request.user.is_staff:
+            return Response(data='Задачу может смотреть только ее автор',
+                            status=status.HTTP_403_FORBIDDEN)
+
+        return Response(data=serializers.JobSerializer(instance=job).data)
+
+
+class PublicNoteToDoListAPIView(ShardedListMixin, ListAPIView):
+    """
+    Класс, который показывает только опубликованные записи.
+    JSON отдается готовым из снимков ленты (note_todo_api.snapshots) без запросов к базе
+    """
+    coalesce_scope = coalescing.PUBLIC
+    queryset = NoteToDo.objects.select_related('author').prefetch_related('comment_set').order_by('pk')
     serializer_class = serializers.NoteToDoDetailSerializer
 
     def get_queryset(self):
@@ -136,12 +338,43 @@ class PublicNoteToDoListAPIView(ListAPIView):
 
         return queryset.filter(public=True)
 
+    def list(self, request, *args, **kwargs):
+        if type(request.accepted_renderer) is JSONRenderer:
+            return HttpResponse(snapshots.public_feed(), content_type=request.accepted_media_type)
 
-class NoteToDoFilterListAPIView(ListAPIView):
+        return super().list(request, *args, **kwargs)
+
+
+class MyNoteToDoListAPIView(ListAPIView):
     """
-    Класс, который фильтрует данные по важности и по публичности.
-    Необходимо задать параметр ?importance=True, ?importance=False, ?public=True, ?public=False
-    или комбинацию этих фильтров
+    Класс, который показывает ленту заметок текущего пользователя.
+    Принимает ?note_status=0 (можно несколько), ?ordering=created_at|-created_at|due_to|-due_to
+    и курсор следующей страницы ?cursor=...
+    """
+    serializer_class = serializers.NoteToDoSerializer
+    pagination_class = TimelineCursorPagination
+    permission_classes = [IsAuthenticated]
+    coalesce_scope = coalescing.USER
+
+    def get_queryset(self):
+        return sharding.for_author(NoteToDo.objects.filter(author=self.request.user), self.request.user.pk)
+
+    def filter_queryset(self, queryset):
+        query_params = serializers.QueryParamsStatusFilterSerializer(data=self.request.query_params)
+        query_params.is_valid(raise_exception=True)
+
+        list_status = query_params.data.get('note_status')
+        if list_status:
+            queryset = queryset.filter(note_status__in=list_status)
+
+        return queryset
+
+
+class NoteToDoFilterListAPIView(streaming.StreamingListMixin, ShardedListMixin, ListAPIView):
+    """
+    Класс, который фильтрует данные по важности, по публичности и по рейтингу комментариев.
+    Необходимо задать параметр ?importance=True, ?importance=False, ?public=True, ?public=False,
+    ?min_rating=4, ?has_rating=5, ?rating_order=desc или комбинацию этих фильтров
     """
     queryset = NoteToDo.objects.all()
     serializer_class = serializers.NoteToDoSerializer
@@ -150,10 +383,14 @@ class NoteToDoFilterListAPIView(ListAPIView):
         queryset = filters.importance_filter(queryset, importance=self.request.query_params.get('importance'))
         queryset = filters.public_filter(queryset, public=self.request.query_params.get("public"))
 
+        query_params = serializers.QueryParamsRatingFilterSerializer(data=self.request.query_params)
+        query_params.is_valid(raise_exception=True)
+        queryset = filters.rating_filter(queryset, query_params.validated_data)
+
         return queryset
 
 
-class NoteToDoSortListAPIView(ListAPIView):
+class NoteToDoSortListAPIView(streaming.StreamingListMixin, ShardedListMixin, ListAPIView):
     """
     Класс, который сотрирует заметки сначала по дате, и в разрезе дат по важности
     """
@@ -167,11 +404,12 @@ class NoteToDoSortListAPIView(ListAPIView):
         return queryset
 
 
-class NoteToDoFilterStatusListAPIView(ListAPIView):
+class NoteToDoFilterStatusListAPIView(streaming.StreamingListMixin, ShardedListMixin, ListAPIView):
     """
     Класс, который позволяет вывести отфильтрованные данные по статусам: Активно, Выполнено,
     Отложено. Как по одному, так и любая их комбинация.
     Запрос должен содержать: ?note_status=0, ?note_status=1, ?note_status=2
+    Дополнительно принимает фильтры по рейтингу: ?min_rating=4, ?has_rating=5, ?rating_order=desc
     """
     queryset = NoteToDo.objects.all()
     serializer_class = serializers.NoteToDoSerializer
@@ -184,10 +422,14 @@ class NoteToDoFilterStatusListAPIView(ListAPIView):
         if list_status:
             queryset = queryset.filter(note_status__in=query_params.data['note_status'])
 
+        rating_params = serializers.QueryParamsRatingFilterSerializer(data=self.request.query_params)
+        rating_params.is_valid(raise_exception=True)
+        queryset = filters.rating_filter(queryset, rating_params.validated_data)
+
         return queryset
 
 
-class NoteToDoFilterCommentListAPIView(ListAPIView):
+class NoteToDoFilterCommentListAPIView(streaming.StreamingListMixin, ShardedListMixin, ListAPIView):
     """
     Класс, который позволяет вывести отфильтрованные данные по рейтингу заметок
     Как по одному, так и любая их комбинация.
@@ -205,3 +447,45 @@ class NoteToDoFilterCommentListAPIView(ListAPIView):
             queryset = queryset.filter(rating__in=query_params.data['rating'])
 
         return queryset
+
+
+class ProfilingAPIView(APIView):
+    """
+    Класс, отдающий персоналу собранные профили запросов API
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request) -> HttpResponse:
+        """
+        Функция, возвращающая стеки сэмплера в формате collapsed stacks.
+        ?view=note_todo_api.views.NoteToDoSortListAPIView ограничивает одно представление,
+        ?report=pstats вместо стеков возвращает отчет cProfile по этому представлению
+        :param request: запрос
+        :return: текстовый отчет
+        """
+        view = request.query_params.get('view')
+        if request.query_params.get('report') == 'pstats':
+            report = profiling.store.pstats_text(view)
+        else:
+            report = profiling.store.collapsed(view)
+
+        # Данные собраны только этим процессом, см. note_todo_api.profiling
+        return HttpResponse(report, content_type='text/plain; charset=utf-8',
+                            headers={profiling.WORKER_HEADER: str(os.getpid())})
+
+    def post(self, request: Request) -> Response:
+        """
+        Функция, выдающая подписанный токен, с которым запрос выполняется под cProfile
+        :param request: запрос
+        :return: имя заголовка и токен
+        """
+        return Response(data={'header': profiling.PROFILE_HEADER, 'token': profiling.make_token()})
+
+    def delete(self, request: Request) -> Response:
+        """
+        Функция, очищающая собранные профили
+        :param request: запрос
+        """
+        profiling.store.reset()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)